@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: field-jumping ``CronSchedule.next_fire`` vs the old minute scan.
+
+Run from this directory::
+
+    python3 bench_cron.py [--repeat N]
+
+Also cross-checks that both implementations return the same firing time.
+Not shipped in the add-on image.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from main import CronSchedule
+
+EXPRESSIONS: List[str] = [
+    "0 5 * * *",       # default: daily 05:00
+    "*/15 * * * *",
+    "30 2 * * 1-5",
+    "0 3 1 * *",
+    "0 4 1,15 * 0",    # dom OR dow
+    "0 5 29 2 *",      # leap day only
+    "0 0 31 2 *",      # never fires (exhausts the 4-year window)
+    "@hourly",
+    "@weekly",
+]
+
+START: datetime = datetime(2025, 3, 1, 12, 34, 56)
+
+
+def scan_next_fire(cron: CronSchedule, now: datetime) -> Optional[datetime]:
+    """The previous implementation: step one minute at a time for up to 4 years."""
+    t = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
+    limit = t + timedelta(days=366 * 4)
+    while t < limit:
+        if cron.matches(t):
+            return t
+        t += timedelta(minutes=1)
+    return None
+
+
+def jump_next_fire(cron: CronSchedule, now: datetime) -> Optional[datetime]:
+    try:
+        return cron.next_fire(now)
+    except ValueError:
+        return None
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=3, help="timing repeats (best of N)")
+    args = ap.parse_args()
+
+    print(f"{'expression':<16} {'next fire':<20} {'scan ms':>10} {'jump ms':>10} {'speedup':>9}")
+    for expr in EXPRESSIONS:
+        cron = CronSchedule(expr)
+        expected = scan_next_fire(cron, START)
+        got = jump_next_fire(cron, START)
+        if got != expected:
+            raise SystemExit(f"MISMATCH for {expr!r}: scan={expected} jump={got}")
+
+        scan_s = _time(lambda: scan_next_fire(cron, START), args.repeat)
+        jump_s = _time(lambda: jump_next_fire(cron, START), args.repeat)
+        shown = got.strftime("%Y-%m-%d %H:%M") if got else "never"
+        print(
+            f"{expr:<16} {shown:<20} {scan_s * 1e3:>10.3f} {jump_s * 1e3:>10.3f}"
+            f" {scan_s / max(jump_s, 1e-9):>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
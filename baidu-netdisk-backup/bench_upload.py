@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Upload throughput benchmark against the local mock xpan server.
+
+Sweeps file size × chunk size × workers × simulated RTT / bandwidth and
+reports MB/s, CPU time and peak RSS as JSON, for comparing releases and
+hosts (arm vs x86).  Run from this directory::
+
+    python3 bench_upload.py                                  # default sweep
+    python3 bench_upload.py --sizes 100M,1G,8G --chunks 4M,16M,32M \\
+        --workers 1,2,4 --rtt 0,0.05 --bandwidth 0,20M -o bench.json
+
+Each case runs in fresh subprocesses (so ``ru_maxrss`` is per process) with
+its own mock account and sparse test files — each starts with a few random
+bytes so rapid upload (秒传) never short-cuts it.
+
+Modes:
+
+* ``upload`` — one file per worker, ``BaiduClient.upload_file``.  Each worker
+  is a separate subprocess with its own ``BaiduClient``, token file and
+  upload cache: the client is not thread-safe (``_upload_cache`` is mutated
+  without a lock) and the add-on itself never uploads concurrently, so
+  *workers* > 1 models several uploaders (e.g. add-on instances) sharing one
+  account and uplink, not a parallel mode of a single client.
+* ``sync``   — ``sync.sync_all_backups`` over ``--sync-files`` backups in a
+  temporary ``BACKUP_DIR`` (sequential by design; *workers* is always 1).
+
+``wall_seconds`` spans the first worker's start to the last one's end;
+client CPU and hash time are summed over the workers and peak RSS is the
+largest worker's.  ``server_cpu_seconds`` is the mock server's (this
+process) CPU over the same window.  Chunk sizes
+above 4 MB need a Baidu membership (16 MB 会员 / 32 MB 超级会员) in production.
+
+Not shipped in the add-on image.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from mock_xpan import MockXpanServer, parse_size
+
+MB: float = 1024 * 1024
+REMOTE_DIR: str = "/apps/bench"
+
+
+def _csv(text: str, conv=str) -> List[Any]:
+    return [conv(x) for x in text.split(",") if x.strip()]
+
+
+def _addon_version() -> str:
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")) as f:
+            for line in f:
+                if line.startswith("version:"):
+                    return line.split(":", 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    return "unknown"
+
+
+def _cpu_seconds(who: int) -> float:
+    ru = resource.getrusage(who)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _peak_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # Linux 单位为 KB
+
+
+def _make_sparse(path: str, size: int) -> None:
+    with open(path, "wb") as f:
+        f.write(os.urandom(16))
+        f.truncate(size)
+
+
+# ============================================================================
+# Case (runs in a subprocess)
+# ============================================================================
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    import client
+    import logs
+    import sync
+    from metrics import HASH_SECONDS
+
+    logs.set_level(case.get("log_level", "warning"))
+    workdir = case["workdir"]
+    client.TOKEN_FILE = os.path.join(workdir, "token.json")
+    client.UPLOAD_CACHE_FILE = os.path.join(workdir, "upload_cache.json")
+    client.CHUNK_SIZE = case["chunk_size"]
+    client.set_api_base(case["server"])
+
+    files_dir = os.path.join(workdir, "backup")
+    os.makedirs(files_dir, exist_ok=True)
+    count = case["files"]
+    paths = [os.path.join(files_dir, f"bench_{i}.tar") for i in range(count)]
+    for p in paths:
+        _make_sparse(p, case["size"])
+
+    c = client.BaiduClient(case["account"])
+    c.create_remote_dir(REMOTE_DIR)
+
+    cpu0 = _cpu_seconds(resource.RUSAGE_SELF)
+    hash0 = sum(HASH_SECONDS.totals().values())
+    start = time.time()
+    if case["mode"] == "sync":
+        sync.BACKUP_DIR = files_dir
+        res = sync.sync_all_backups(c, REMOTE_DIR)
+        ok = res["failed_count"] == 0 and res["error"] is None
+    else:
+        ok = all([c.upload_file(p, REMOTE_DIR) for p in paths])
+    end = time.time()
+    logs.flush()
+
+    return {
+        "ok": ok,
+        "bytes": case["size"] * count,
+        "start": start,
+        "end": end,
+        "cpu_seconds": _cpu_seconds(resource.RUSAGE_SELF) - cpu0,
+        "hash_seconds": sum(HASH_SECONDS.totals().values()) - hash0,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def _spawn_case(spec: Dict[str, Any]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--case", json.dumps(spec)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+
+
+def _collect_case(proc: subprocess.Popen) -> Dict[str, Any]:
+    stdout, stderr = proc.communicate()
+    try:
+        return json.loads(stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"ok": False, "error": stderr.strip()[-500:]}
+
+
+def _merge_workers(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-worker results into one case result."""
+    errors = [p["error"] for p in parts if "error" in p]
+    if errors:
+        return {"ok": False, "error": errors[0]}
+    total = sum(p["bytes"] for p in parts)
+    wall = max(p["end"] for p in parts) - min(p["start"] for p in parts)
+    return {
+        "ok": all(p["ok"] for p in parts),
+        "bytes": total,
+        "wall_seconds": round(wall, 4),
+        "mb_per_s": round(total / MB / wall, 2) if wall > 0 else None,
+        "cpu_seconds": round(sum(p["cpu_seconds"] for p in parts), 4),
+        "hash_seconds": round(sum(p["hash_seconds"] for p in parts), 4),
+        "peak_rss_bytes": max(p["peak_rss_bytes"] for p in parts),
+    }
+
+
+# ============================================================================
+# Sweep driver
+# ============================================================================
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="100M,1G", help="file sizes, e.g. 100M,1G,8G")
+    ap.add_argument("--chunks", default="4M,16M", help="chunk sizes, e.g. 4M,16M,32M")
+    ap.add_argument("--workers", default="1,4", help="concurrent uploader processes (upload mode)")
+    ap.add_argument("--rtt", default="0,0.03", help="simulated per-request latency (s)")
+    ap.add_argument("--bandwidth", default="0", help="simulated uplink, e.g. 0,20M (0 = unlimited)")
+    ap.add_argument("--modes", default="upload,sync", help="upload and/or sync")
+    ap.add_argument("--sync-files", type=int, default=3, help="backups per sync case")
+    ap.add_argument("--workdir", default=None, help="where to create sparse files (default: temp)")
+    ap.add_argument("-o", "--output", default=None, help="write JSON here instead of stdout")
+    ap.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    sizes = _csv(args.sizes, parse_size)
+    chunks = _csv(args.chunks, parse_size)
+    workers = _csv(args.workers, int)
+    rtts = _csv(args.rtt, float)
+    bandwidths = _csv(args.bandwidth, parse_size)
+    modes = _csv(args.modes)
+    root = tempfile.mkdtemp(prefix="bench_upload_", dir=args.workdir)
+
+    results: List[Dict[str, Any]] = []
+    n = 0
+    try:
+        for rtt, bw in itertools.product(rtts, bandwidths):
+            with MockXpanServer(latency=rtt, bandwidth=bw) as srv:
+                for mode, size, chunk in itertools.product(modes, sizes, chunks):
+                    for w in (workers if mode == "upload" else [1]):
+                        n += 1
+                        workdir = os.path.join(root, f"case{n}")
+                        case = {
+                            "mode": mode, "size": size, "chunk_size": chunk, "workers": w,
+                            "files": w if mode == "upload" else args.sync_files,
+                            "rtt": rtt, "bandwidth": bw,
+                        }
+                        account = f"bench-{n}"
+                        # 每个 worker 独立进程：独立的 BaiduClient / token / 上传缓存
+                        specs = []
+                        for i in range(w):
+                            wdir = os.path.join(workdir, f"w{i}")
+                            os.makedirs(wdir)
+                            specs.append({
+                                **case, "files": case["files"] // w,
+                                "server": srv.url, "workdir": wdir, "account": account,
+                            })
+                        srv_cpu0 = _cpu_seconds(resource.RUSAGE_SELF)
+                        procs = [_spawn_case(spec) for spec in specs]
+                        out = _merge_workers([_collect_case(proc) for proc in procs])
+                        srv_cpu = _cpu_seconds(resource.RUSAGE_SELF) - srv_cpu0
+                        shutil.rmtree(workdir, ignore_errors=True)
+                        out["server_cpu_seconds"] = round(srv_cpu, 4)
+                        out["api_calls"] = srv.account(account).calls
+                        results.append({**case, **out})
+                        print(
+                            f"[{n}] {mode:<6} size={size / MB:.0f}MB chunk={chunk / MB:.0f}MB "
+                            f"workers={w} rtt={rtt}s bw={bw / MB:.0f}MB/s → "
+                            f"{out.get('mb_per_s')} MB/s ok={out.get('ok')}",
+                            file=sys.stderr, flush=True,
+                        )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "benchmark": "upload",
+        "addon_version": _addon_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Persistent local catalog of remote backups (SQLite in /data).
+
+The catalog mirrors what we know about the remote side — every backup we
+uploaded, listed, moved or deleted — so retention, the manifest and upload
+dedup can work from local data instead of listing every directory each
+cycle.  Each directory is re-listed (full reconcile) once its listing is older
+than ``RECONCILE_INTERVAL`` or after a filemanager call failed.
+
+The Web UI backup browser pages through an in-memory index built from the
+catalog (``browse()``); it is rebuilt after any catalog write or once it is
+``INDEX_TTL`` old, so page loads never list the remote folders.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from client import log
+from retention import BackupRecord, _parent_dir, folder_tier
+
+CATALOG_FILE: str = "/data/catalog.db"
+RECONCILE_INTERVAL: float = 24 * 3600   # full re-list of a directory at least daily
+INDEX_TTL: float = 60.0                 # in-memory browse index lifetime
+
+# browse() 排序键；None 值（无时间戳）总是排在最后
+SORT_KEYS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "time": lambda r: r["ts"] or r["server_mtime"],
+    "size": lambda r: r["size"],
+    "name": lambda r: r["name"],
+    "tier": lambda r: r["tier"],
+    "path": lambda r: r["path"],
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    path         TEXT PRIMARY KEY,
+    dir          TEXT NOT NULL,
+    name         TEXT NOT NULL,
+    fs_id        INTEGER,
+    size         INTEGER NOT NULL DEFAULT 0,
+    md5          TEXT,
+    tier         TEXT,
+    ts           INTEGER,
+    server_mtime INTEGER,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS backups_dir ON backups (dir);
+CREATE INDEX IF NOT EXISTS backups_name ON backups (name, size);
+CREATE TABLE IF NOT EXISTS listings (
+    dir       TEXT PRIMARY KEY,
+    listed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class BackupCatalog:
+    """SQLite-backed catalog; safe to share between threads."""
+
+    def __init__(self, path: str = CATALOG_FILE) -> None:
+        self.path: str = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        self._version: int = 0     # 每次写入递增，browse 索引据此失效
+        self._index: Optional[Dict[str, Any]] = None
+        self._index_lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _upsert(self, rows: Iterable[Dict[str, Any]]) -> None:
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO backups "
+            "(path, dir, name, fs_id, size, md5, tier, ts, server_mtime, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    r["path"], r["dir"], r["name"], r.get("fs_id"), r.get("size", 0),
+                    r.get("md5"), r.get("tier"), r.get("ts"), r.get("server_mtime"), now,
+                )
+                for r in rows
+            ],
+        )
+
+    @staticmethod
+    def _row_from_item(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        rec = BackupRecord.from_item(item)
+        if rec is None:
+            return None
+        remote_dir = _parent_dir(rec.path)
+        return {
+            "path": rec.path,
+            "dir": remote_dir,
+            "name": rec.name,
+            "fs_id": rec.fs_id,
+            "size": rec.size,
+            "md5": rec.md5,
+            "tier": folder_tier(remote_dir),
+            "ts": rec.ts,
+            "server_mtime": item.get("server_mtime"),
+        }
+
+    def record_listing(self, remote_dir: str, items: List[Dict[str, Any]]) -> None:
+        """Replace everything known under *remote_dir* with a complete listing."""
+        rows = [r for r in map(self._row_from_item, items) if r is not None]
+        with self._lock:
+            self._db.execute("DELETE FROM backups WHERE dir = ?", (remote_dir,))
+            self._upsert(rows)
+            self._db.execute(
+                "INSERT OR REPLACE INTO listings (dir, listed_at) VALUES (?, ?)",
+                (remote_dir, time.time()),
+            )
+            self._db.commit()
+            self._version += 1
+
+    def record_upload(self, info: Dict[str, Any]) -> None:
+        """Record a backup from an upload ``create`` response (or precreate info)."""
+        path = info.get("path")
+        if not path:
+            return
+        item = dict(info)
+        item.setdefault("server_filename", path.rsplit("/", 1)[-1])
+        row = self._row_from_item(item)
+        if row is None:
+            return
+        with self._lock:
+            self._upsert([row])
+            self._db.commit()
+            self._version += 1
+
+    def record_moves(self, moves: List[Dict[str, str]]) -> None:
+        """Apply successful filemanager moves (``{"path", "dest"}``)."""
+        now = time.time()
+        with self._lock:
+            for m in moves:
+                src, dest = m.get("path"), (m.get("dest") or "").rstrip("/")
+                if not src or not dest:
+                    continue
+                name = src.rsplit("/", 1)[-1]
+                new_path = f"{dest}/{name}"
+                self._db.execute("DELETE FROM backups WHERE path = ?", (new_path,))
+                self._db.execute(
+                    "UPDATE backups SET path = ?, dir = ?, tier = ?, updated_at = ? "
+                    "WHERE path = ?",
+                    (new_path, dest, folder_tier(dest), now, src),
+                )
+            self._db.commit()
+            self._version += 1
+
+    def record_deletes(self, paths: List[str]) -> None:
+        """Apply successful filemanager deletes (files or whole directories)."""
+        with self._lock:
+            for p in paths:
+                prefix = p.rstrip("/") + "/"
+                self._db.execute(
+                    "DELETE FROM backups WHERE path = ? OR dir = ? OR substr(dir, 1, ?) = ?",
+                    (p, p, len(prefix), prefix),
+                )
+            self._db.commit()
+            self._version += 1
+
+    def set_tiers(self, assignments: Dict[str, str]) -> None:
+        """Store retention's tier assignment (``{path: tier_name}``)."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE backups SET tier = ? WHERE path = ?",
+                [(tier, path) for path, tier in assignments.items()],
+            )
+            self._db.commit()
+            self._version += 1
+
+    def invalidate(self, remote_dirs: Optional[List[str]] = None) -> None:
+        """Force a full re-list of *remote_dirs* (all directories if None)."""
+        with self._lock:
+            if remote_dirs is None:
+                self._db.execute("DELETE FROM listings")
+            else:
+                self._db.executemany(
+                    "DELETE FROM listings WHERE dir = ?", [(d,) for d in remote_dirs]
+                )
+            self._db.commit()
+            self._version += 1
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def is_fresh(self, remote_dir: str) -> bool:
+        """True if *remote_dir* was fully listed within ``RECONCILE_INTERVAL``."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT listed_at FROM listings WHERE dir = ?", (remote_dir,)
+            ).fetchone()
+        return row is not None and time.time() - row["listed_at"] < RECONCILE_INTERVAL
+
+    def items(self, remote_dir: str) -> List[Dict[str, Any]]:
+        """Backups under *remote_dir* shaped like ``list_remote_files`` items."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM backups WHERE dir = ?", (remote_dir,)
+            ).fetchall()
+        return [
+            {
+                "path": r["path"],
+                "server_filename": r["name"],
+                "size": r["size"],
+                "md5": r["md5"],
+                "fs_id": r["fs_id"],
+                "isdir": 0,
+                "server_mtime": r["server_mtime"],
+                "tier": r["tier"],
+            }
+            for r in rows
+        ]
+
+    def _build_index(self, base: str) -> Dict[str, Any]:
+        base = base.rstrip("/") or "/"
+        # 前缀比较用 substr 而不是 LIKE：目录名中的 "_" / "%" 不能当通配符，且区分大小写
+        prefix = base.rstrip("/") + "/"
+        with self._lock:
+            version = self._version
+            rows = self._db.execute(
+                "SELECT path, dir, name, fs_id, size, md5, tier, ts, server_mtime "
+                "FROM backups WHERE dir = ? OR substr(dir, 1, ?) = ?",
+                (base, len(prefix), prefix),
+            ).fetchall()
+            listings = self._db.execute(
+                "SELECT dir, listed_at FROM listings WHERE dir = ? OR substr(dir, 1, ?) = ?",
+                (base, len(prefix), prefix),
+            ).fetchall()
+        return {
+            "base": base,
+            "version": version,
+            "built_at": time.time(),
+            "rows": [dict(r) for r in rows],
+            "listed_at": {r["dir"]: r["listed_at"] for r in listings},
+            "views": {},   # (sort, desc) → 排序后的行
+        }
+
+    def browse(
+        self,
+        base: str,
+        tier: Optional[str] = None,
+        sort: str = "time",
+        desc: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """Paginated backups under *base*, served from the in-memory index.
+
+        *tier* filters by tier name (``"none"`` selects untiered backups).
+        Returns ``{"total", "limit", "offset", "sort", "desc", "tiers",
+        "listed_at", "indexed_at", "backups"}``.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort key: {sort}")
+        limit = max(1, min(int(limit), 500))
+        offset = max(0, int(offset))
+        with self._index_lock:
+            index = self._index
+            if (
+                index is None
+                or index["base"] != (base.rstrip("/") or "/")
+                or index["version"] != self._version
+                or time.time() - index["built_at"] > INDEX_TTL
+            ):
+                index = self._index = self._build_index(base)
+            view = index["views"].get((sort, desc))
+            if view is None:
+                key = SORT_KEYS[sort]
+                present = [r for r in index["rows"] if key(r) is not None]
+                missing = [r for r in index["rows"] if key(r) is None]
+                view = index["views"][(sort, desc)] = (
+                    sorted(present, key=key, reverse=desc) + missing
+                )
+        if tier:
+            want = None if tier == "none" else tier
+            view = [r for r in view if r["tier"] == want]
+        tiers: Dict[str, int] = {}
+        for r in index["rows"]:
+            tiers[r["tier"] or "none"] = tiers.get(r["tier"] or "none", 0) + 1
+        return {
+            "total": len(view),
+            "limit": limit,
+            "offset": offset,
+            "sort": sort,
+            "desc": desc,
+            "tiers": tiers,
+            "listed_at": index["listed_at"],
+            "indexed_at": index["built_at"],
+            "backups": view[offset:offset + limit],
+        }
+
+    def find(self, remote_dir: str, name: str, size: int) -> Optional[Dict[str, Any]]:
+        """The backup *name* with this size in *remote_dir*, if its listing is fresh.
+
+        Rows of a directory not listed within ``RECONCILE_INTERVAL`` are not
+        trusted (the file may have been deleted outside the add-on).
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT b.* FROM backups b JOIN listings l ON l.dir = b.dir"
+                " WHERE b.dir = ? AND b.name = ? AND b.size = ? AND l.listed_at > ?",
+                (remote_dir, name, size, time.time() - RECONCILE_INTERVAL),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+
+def open_catalog(path: str = CATALOG_FILE) -> Optional[BackupCatalog]:
+    """Open the catalog; returns None (and logs) when SQLite is unusable."""
+    try:
+        return BackupCatalog(path)
+    except (sqlite3.Error, OSError) as e:
+        log(f"Backup catalog unavailable, falling back to remote listings: {e}")
+        return None
@@ -4,11 +4,34 @@ import json
 import os
 import time
 import hashlib
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
+from logs import debug, error, log, warning
+from metrics import (
+    API_ERRORS,
+    API_LATENCY,
+    HASH_BYTES,
+    HASH_SECONDS,
+    UPLOADED_BYTES,
+    UPLOADS,
+    UPLOAD_PARTS,
+    UPLOAD_PART_RETRIES,
+)
+from tracing import span
+from progress import (
+    STAGE_DONE,
+    STAGE_FAILED,
+    STAGE_HASHING,
+    STAGE_MERGING,
+    STAGE_PRECREATE,
+    STAGE_RAPID,
+    STAGE_UPLOADING,
+    UploadProgress,
+)
+
 # ============================================================================
 # Module-level constants (Issue 9: extract hard-coded values)
 # ============================================================================
@@ -18,25 +41,64 @@ UPLOAD_TIMEOUT: int = 60                # seconds for precreate / create / batch
 LONG_TIMEOUT: int = 300                 # seconds for single-chunk upload
 MAX_RETRIES: int = 3                    # retries for chunk upload & token refresh
 BATCH_SIZE: int = 100                   # max files per batch filemanager call
+MIN_BATCH_SIZE: int = 10                # batch size floor when shrinking on server errors
+FILEMANAGER_ASYNC: int = 2              # filemanager async mode: 0=sync, 1=adaptive, 2=async
+FILEMANAGER_WORKERS: int = 4            # concurrent filemanager batch submissions (sync mode only)
+FILEMANAGER_BUSY_RETRIES: int = 5       # resubmits of a batch rejected as busy / rate limited
+FILEMANAGER_BACKOFF_MAX: float = 60.0   # cap for the resubmit backoff (seconds)
+TASK_POLL_INTERVAL: float = 1.0         # seconds between async task status queries
+TASK_POLL_TIMEOUT: float = 600.0        # give up waiting for async tasks after this long
 LIST_LIMIT: int = 1000                  # max items per list page
 RETRY_DELAY: float = 3.0                # base delay between retries (seconds)
-TIME_FORMAT: str = "%Y-%m-%d %H:%M:%S"  # cached log timestamp format (Issue 16)
 
 # AList's Client Credentials  (Public, widely used)
 CLIENT_ID: str = "hq9yQ9w9kR4YHj1kyYafLygVocobh7Sf"
 CLIENT_SECRET: str = "YH2VpZcFJHYNnV6vLfHQXDBhcE7ZChyE"
 REDIRECT_URI: str = "https://alistgo.com/tool/baidu/callback"
 
+# API hosts; override with BAIDU_*_BASE (e.g. to point at mock_xpan.py)
+OAUTH_BASE: str = os.environ.get("BAIDU_OAUTH_BASE", "https://openapi.baidu.com").rstrip("/")
+PAN_BASE: str = os.environ.get("BAIDU_PAN_BASE", "https://pan.baidu.com").rstrip("/")
+PCS_BASE: str = os.environ.get("BAIDU_PCS_BASE", "https://d.pcs.baidu.com").rstrip("/")
+
 TOKEN_FILE: str = "/data/baidu_token.json"
 UPLOAD_CACHE_FILE: str = "/data/upload_cache.json"
 
+# filemanager errnos meaning "try the same batch again later"
+# (111: another async task is running, 31034: hit frequency limit)
+_FILEMANAGER_BUSY_ERRNOS = frozenset({111, 31034})
+
 
 # ============================================================================
-# Logger
+# Instrumented HTTP
 # ============================================================================
-def log(msg: str) -> None:
-    """Print a timestamped log message and flush immediately."""
-    print(f"[{datetime.now().strftime(TIME_FORMAT)}] {msg}", flush=True)
+def _api_request(endpoint: str, method: str, url: str, **kwargs: Any) -> requests.Response:
+    """One Baidu API request; records latency and transport / HTTP errors per *endpoint*.
+
+    Callers report ``errno != 0`` responses with :func:`_api_error`.
+    """
+    t0 = time.perf_counter()
+    try:
+        with span(endpoint, cat="api"):
+            resp = requests.request(method, url, **kwargs)
+    except Exception:
+        API_ERRORS.labels(endpoint).inc()
+        raise
+    finally:
+        API_LATENCY.labels(endpoint).observe(time.perf_counter() - t0)
+    if resp.status_code >= 400:
+        API_ERRORS.labels(endpoint).inc()
+    return resp
+
+
+def _api_error(endpoint: str) -> None:
+    API_ERRORS.labels(endpoint).inc()
+
+
+def set_api_base(base: str) -> None:
+    """Send every API call (OAuth, pan and PCS hosts) to *base*, e.g. ``http://127.0.0.1:8210``."""
+    global OAUTH_BASE, PAN_BASE, PCS_BASE
+    OAUTH_BASE = PAN_BASE = PCS_BASE = base.rstrip("/")
 
 
 # ============================================================================
@@ -51,6 +113,10 @@ class BaiduClient:
         self.access_token: Optional[str] = None
         self.token_expires: float = 0.0
 
+        # Local catalog of remote backups (catalog.BackupCatalog); attached by
+        # main.py and kept current from upload / list / filemanager results
+        self.catalog: Optional[Any] = None
+
         # Upload dedup cache  (Issue 12: skip already-uploaded files)
         self._upload_cache: Dict[str, bool] = {}
         self._load_upload_cache()
@@ -136,12 +202,22 @@ class BaiduClient:
         except Exception:
             pass
 
-    def _is_already_uploaded(self, local_path: str) -> bool:
-        """Check whether *local_path* (by name + size + mtime) was already uploaded."""
+    def _is_already_uploaded(self, local_path: str, remote_dir: Optional[str] = None) -> bool:
+        """Check whether *local_path* (by name + size + mtime) was already uploaded.
+
+        With *remote_dir*, falls back to the catalog (same name + size in that
+        freshly listed directory) so a lost upload cache does not trigger
+        re-uploads.
+        """
         try:
             stat = os.stat(local_path)
-            key = f"{os.path.basename(local_path)}:{stat.st_size}:{int(stat.st_mtime)}"
-            return self._upload_cache.get(key, False)
+            name = os.path.basename(local_path)
+            key = f"{name}:{stat.st_size}:{int(stat.st_mtime)}"
+            if self._upload_cache.get(key, False):
+                return True
+            if self.catalog is None or remote_dir is None:
+                return False
+            return self.catalog.find(remote_dir, name, stat.st_size) is not None
         except Exception:
             return False
 
@@ -161,7 +237,7 @@ class BaiduClient:
     def _refresh_access_token(self) -> None:
         """Use refresh_token to obtain a new access_token (with retries)."""
         log("Refreshing access_token...")
-        url = "https://openapi.baidu.com/oauth/2.0/token"
+        url = f"{OAUTH_BASE}/oauth/2.0/token"
         params = {
             "grant_type": "refresh_token",
             "refresh_token": self.refresh_token,
@@ -173,8 +249,8 @@ class BaiduClient:
         last_error: Optional[str] = None
         for attempt in range(1, MAX_RETRIES + 1):
             try:
-                resp = requests.get(
-                    url, params=params, headers=headers, timeout=DEFAULT_TIMEOUT
+                resp = _api_request(
+                    "token", "GET", url, params=params, headers=headers, timeout=DEFAULT_TIMEOUT
                 )
                 data = resp.json()
 
@@ -245,7 +321,7 @@ class BaiduClient:
     def get_quota(self) -> Optional[Dict[str, Any]]:
         """获取网盘容量信息。返回 {total, used, free, expire} (bytes)；失败返回 None。"""
         self._ensure_token()
-        url = "https://pan.baidu.com/api/quota"
+        url = f"{PAN_BASE}/api/quota"
         params = {
             "access_token": self.access_token,
             "checkfree": 1,
@@ -253,9 +329,12 @@ class BaiduClient:
         }
         headers = {"User-Agent": "pan.baidu.com"}
         try:
-            r = requests.get(url, params=params, headers=headers, timeout=DEFAULT_TIMEOUT)
+            r = _api_request(
+                "quota", "GET", url, params=params, headers=headers, timeout=DEFAULT_TIMEOUT
+            )
             data = r.json()
             if data.get("errno", 0) != 0:
+                _api_error("quota")
                 log(f"获取容量失败：{data}")
                 return None
             return {
@@ -271,52 +350,148 @@ class BaiduClient:
     # ------------------------------------------------------------------
     # Upload
     # ------------------------------------------------------------------
-    def upload_file(self, local_path: str, remote_dir: str) -> bool:
-        """Upload a single file to *remote_dir* using the official xpan API."""
-        self._ensure_token()
-
-        filename = os.path.basename(local_path)
+    @staticmethod
+    def _remote_file_path(remote_dir: str, filename: str) -> str:
         if remote_dir.endswith("/"):
             remote_dir = remote_dir[:-1]
         if not remote_dir.startswith("/"):
             remote_dir = "/" + remote_dir
+        return f"{remote_dir}/{filename}"
+
+    def upload_file(self, local_path: str, remote_dir: str) -> bool:
+        """Upload a single file to *remote_dir* using the official xpan API.
+
+        Files smaller than one chunk go through the single-request
+        small-file path; larger ones use the sliced precreate/upload/merge flow.
+        """
+        self._ensure_token()
 
-        full_remote_path = f"{remote_dir}/{filename}"
+        filename = os.path.basename(local_path)
+        full_remote_path = self._remote_file_path(remote_dir, filename)
         log(f"Uploading: {filename} -> {full_remote_path}")
 
         try:
-            if self._do_upload_sliced(local_path, full_remote_path):
+            with span("upload_file", cat="upload", file=filename):
+                if os.path.getsize(local_path) < CHUNK_SIZE:
+                    with open(local_path, "rb") as f:
+                        ok = self._do_upload_small(f.read(), full_remote_path)
+                else:
+                    ok = self._do_upload_sliced(local_path, full_remote_path)
+            if ok:
                 self._mark_uploaded(local_path)  # Issue 12: cache success
                 log(f"Upload SUCCESS: {filename}")
                 return True
             else:
-                log(f"Upload FAILED: {filename}")
+                error("Upload FAILED: %s", filename)
                 return False
         except Exception as e:
-            log(f"Upload error: {e}")
+            error("Upload error: %s", e)
             return False
 
+    def upload_bytes(self, data: bytes, remote_dir: str, filename: str) -> bool:
+        """Upload an in-memory buffer as *remote_dir*/*filename* (overwrites).
+
+        Buffers of at least one chunk are rejected — write them to disk and
+        use :meth:`upload_file` instead.
+        """
+        self._ensure_token()
+
+        full_remote_path = self._remote_file_path(remote_dir, filename)
+        if len(data) >= CHUNK_SIZE:
+            warning("Upload rejected: %s is too large for a buffer upload (%d bytes)",
+                    filename, len(data))
+            return False
+        try:
+            if self._do_upload_small(data, full_remote_path):
+                log("Upload SUCCESS: %s", filename)
+                return True
+            error("Upload FAILED: %s", filename)
+            return False
+        except Exception as e:
+            error("Upload error: %s", e)
+            return False
+
+    def _do_upload_small(self, data: bytes, full_remote_path: str) -> bool:
+        """Single-request upload for files under ``CHUNK_SIZE`` (PCS ``upload``).
+
+        Replaces precreate → superfile2 → create with one POST; the MD5 is
+        taken from the in-memory buffer, so the file is read only once.
+        """
+        headers: Dict[str, str] = {"User-Agent": "pan.baidu.com"}
+        t0 = time.perf_counter()
+        md5 = hashlib.md5(data).hexdigest()
+        HASH_SECONDS.inc(time.perf_counter() - t0)
+        HASH_BYTES.inc(len(data))
+        progress = UploadProgress(full_remote_path.rsplit("/", 1)[-1], len(data))
+        progress.stage(STAGE_UPLOADING)
+        upload_url = (
+            f"{PCS_BASE}/rest/2.0/pcs/file"
+            f"?method=upload&access_token={self.access_token}"
+            f"&path={requests.utils.quote(full_remote_path)}&ondup=overwrite"
+        )
+
+        for attempt in range(MAX_RETRIES):
+            try:
+                r = _api_request(
+                    "upload", "POST",
+                    upload_url,
+                    files={"file": ("blob", data, "application/octet-stream")},
+                    headers=headers,
+                    timeout=LONG_TIMEOUT,
+                )
+                result = r.json()
+                if r.status_code == 200 and result.get("fs_id"):
+                    UPLOAD_PARTS.inc()
+                    UPLOADED_BYTES.inc(len(data))
+                    UPLOADS.labels("ok").inc()
+                    progress.done = len(data)
+                    progress.stage(STAGE_DONE)
+                    log(f"Small-file upload OK ({len(data)} bytes). File ID: {result.get('fs_id')}")
+                    self._catalog_upload(
+                        {"path": full_remote_path, "size": len(data), "md5": md5, **result}
+                    )
+                    return True
+                _api_error("upload")
+                warning("  Small-file upload response: %.100s", r.text)
+            except Exception as e:
+                warning("  Small-file upload error: %s", e)
+            if attempt + 1 < MAX_RETRIES:
+                progress.retries += 1
+                UPLOAD_PART_RETRIES.inc()
+                time.sleep(RETRY_DELAY)
+
+        error("Failed to upload %s after %d retries", full_remote_path, MAX_RETRIES)
+        progress.stage(STAGE_FAILED, error="upload failed")
+        UPLOADS.labels("failed").inc()
+        return False
+
     def _do_upload_sliced(self, local_path: str, full_remote_path: str) -> bool:
         """Sliced upload: precreate → upload chunks → merge."""
         headers: Dict[str, str] = {"User-Agent": "pan.baidu.com"}
         file_size: int = os.path.getsize(local_path)
+        progress = UploadProgress(os.path.basename(local_path), file_size)
 
         # Step 1 — block MD5s
         log("Calculating block MD5s...")
+        progress.stage(STAGE_HASHING)
         block_list: List[str] = []
-        with open(local_path, "rb") as f:
+        t0 = time.perf_counter()
+        with span("hash_blocks", cat="hash", bytes=file_size), open(local_path, "rb") as f:
             while True:
                 chunk = f.read(CHUNK_SIZE)
                 if not chunk:
                     break
                 block_list.append(hashlib.md5(chunk).hexdigest())
+        HASH_SECONDS.inc(time.perf_counter() - t0)
+        HASH_BYTES.inc(file_size)
 
         log(f"File size: {file_size / 1024 / 1024:.1f} MB, Blocks: {len(block_list)}")
 
         # Step 2 — precreate
         log("Step 1/3: Precreate...")
+        progress.stage(STAGE_PRECREATE)
         precreate_url = (
-            f"https://pan.baidu.com/rest/2.0/xpan/file"
+            f"{PAN_BASE}/rest/2.0/xpan/file"
             f"?method=precreate&access_token={self.access_token}"
         )
         precreate_data = {
@@ -327,13 +502,17 @@ class BaiduClient:
             "block_list": json.dumps(block_list),
             "rtype": "3",
         }
-        resp = requests.post(
+        resp = _api_request(
+            "precreate", "POST",
             precreate_url, data=precreate_data, headers=headers, timeout=UPLOAD_TIMEOUT
         )
         pre_json = resp.json()
 
         if pre_json.get("errno") != 0:
+            _api_error("precreate")
+            UPLOADS.labels("failed").inc()
             log(f"Precreate failed: {pre_json}")
+            progress.stage(STAGE_FAILED, error=f"precreate errno {pre_json.get('errno')}")
             return False
 
         uploadid = pre_json.get("uploadid")
@@ -341,31 +520,35 @@ class BaiduClient:
 
         if return_type == 2:
             log("Rapid upload (秒传) successful! File already exists on server.")
+            progress.done = file_size
+            progress.stage(STAGE_RAPID)
+            UPLOADS.labels("rapid").inc()
+            info = pre_json.get("info") or {}
+            self._catalog_upload(
+                {"path": full_remote_path, "size": file_size, **info}
+            )
             return True
 
         log(f"Precreate OK. return_type={return_type}, UploadID: {uploadid}")
 
         # Step 3 — upload chunks
         log("Step 2/3: Uploading chunks...")
+        progress.restart_clock()
+        progress.stage(STAGE_UPLOADING, chunk=0, chunks=len(block_list))
         with open(local_path, "rb") as f:
             for i in range(len(block_list)):
                 chunk = f.read(CHUNK_SIZE)
 
                 for attempt in range(MAX_RETRIES):
                     try:
-                        progress = ((i + 1) / len(block_list)) * 100
-                        if i % 5 == 0 or attempt > 0:
-                            log(
-                                f"  Chunk {i + 1}/{len(block_list)} ({progress:.0f}%)"
-                                + (
-                                    f" retry {attempt + 1}"
-                                    if attempt > 0
-                                    else ""
-                                )
-                            )
+                        if attempt > 0:
+                            warning("  Chunk %d/%d retry %d", i + 1, len(block_list), attempt + 1)
+                        else:
+                            debug("  Chunk %d/%d (%.0f%%)", i + 1, len(block_list),
+                                  (i + 1) * 100 / len(block_list))
 
                         upload_url = (
-                            f"https://d.pcs.baidu.com/rest/2.0/pcs/superfile2"
+                            f"{PCS_BASE}/rest/2.0/pcs/superfile2"
                             f"?method=upload&access_token={self.access_token}"
                             f"&type=tmpfile&path={requests.utils.quote(full_remote_path)}"
                             f"&uploadid={uploadid}&partseq={i}"
@@ -373,7 +556,8 @@ class BaiduClient:
                         files = {
                             "file": ("blob", chunk, "application/octet-stream")
                         }
-                        r = requests.post(
+                        r = _api_request(
+                            "superfile2", "POST",
                             upload_url,
                             files=files,
                             headers=headers,
@@ -385,19 +569,30 @@ class BaiduClient:
                         if r.status_code == 200 and "md5" in data:
                             break
                         else:
-                            log(f"  Chunk {i} response: {r.text[:100]}")
+                            _api_error("superfile2")
+                            warning("  Chunk %d response: %.100s", i, r.text)
                     except Exception as e:
-                        log(f"  Chunk {i} error: {e}")
+                        warning("  Chunk %d error: %s", i, e)
 
+                    progress.retries += 1
+                    UPLOAD_PART_RETRIES.inc()
                     time.sleep(RETRY_DELAY)
                 else:
-                    log(f"Failed to upload chunk {i} after {MAX_RETRIES} retries")
+                    error("Failed to upload chunk %d after %d retries", i, MAX_RETRIES)
+                    progress.stage(STAGE_FAILED, error=f"chunk {i} failed")
+                    UPLOADS.labels("failed").inc()
                     return False
 
+                UPLOAD_PARTS.inc()
+                UPLOADED_BYTES.inc(len(chunk))
+                progress.done += len(chunk)
+                progress.stage(STAGE_UPLOADING, chunk=i + 1, chunks=len(block_list))
+
         # Step 4 — merge
         log("Step 3/3: Merging...")
+        progress.stage(STAGE_MERGING)
         create_url = (
-            f"https://pan.baidu.com/rest/2.0/xpan/file"
+            f"{PAN_BASE}/rest/2.0/xpan/file"
             f"?method=create&access_token={self.access_token}"
         )
         create_data = {
@@ -408,29 +603,65 @@ class BaiduClient:
             "uploadid": uploadid,
             "rtype": "3",
         }
-        resp = requests.post(
+        resp = _api_request(
+            "create", "POST",
             create_url, data=create_data, headers=headers, timeout=UPLOAD_TIMEOUT
         )
         result = resp.json()
 
         if result.get("errno") == 0:
             log(f"Merge OK. File ID: {result.get('fs_id')}")
+            progress.stage(STAGE_DONE)
+            UPLOADS.labels("ok").inc()
+            self._catalog_upload(result)
             return True
         else:
+            _api_error("create")
+            UPLOADS.labels("failed").inc()
             log(f"Merge failed: {result}")
+            progress.stage(STAGE_FAILED, error=f"create errno {result.get('errno')}")
             return False
 
+    def _catalog_upload(self, info: Dict[str, Any]) -> None:
+        """Record an uploaded file in the catalog (never fails the upload)."""
+        if self.catalog is None:
+            return
+        if "server_mtime" not in info and info.get("mtime"):
+            info = {**info, "server_mtime": info["mtime"]}
+        try:
+            self.catalog.record_upload(info)
+        except Exception as e:
+            log(f"Catalog update failed: {e}")
+
     # ------------------------------------------------------------------
     # Remote file listing
     # ------------------------------------------------------------------
+    def list_backup_files(self, remote_dir: str) -> List[Dict[str, Any]]:
+        """Backups in *remote_dir*, served from the catalog while it is fresh.
+
+        Falls back to (and reconciles the catalog with) a full remote listing
+        when there is no catalog or the directory is due for a re-list.
+        """
+        if self.catalog is not None:
+            try:
+                if self.catalog.is_fresh(remote_dir):
+                    return self.catalog.items(remote_dir)
+            except Exception as e:
+                log(f"Catalog read failed, listing remotely: {e}")
+        return self.list_remote_files(remote_dir)
+
     def list_remote_files(self, remote_dir: str) -> List[Dict[str, Any]]:
-        """List files in *remote_dir* (paginated)."""
+        """List files in *remote_dir* (paginated).
+
+        A complete listing also reconciles the catalog for *remote_dir*.
+        """
         self._ensure_token()
         log(f"Listing files in remote dir: {remote_dir}")
-        url = "https://pan.baidu.com/rest/2.0/xpan/file"
+        url = f"{PAN_BASE}/rest/2.0/xpan/file"
 
         all_items: List[Dict[str, Any]] = []
         start: int = 0
+        complete = False
         while True:
             params = {
                 "method": "list",
@@ -440,13 +671,14 @@ class BaiduClient:
                 "start": start,
             }
             try:
-                resp = requests.get(url, params=params, timeout=DEFAULT_TIMEOUT)
+                resp = _api_request("list", "GET", url, params=params, timeout=DEFAULT_TIMEOUT)
                 data = resp.json()
             except Exception as e:
                 log(f"Error listing remote files: {e}")
                 break
 
             if data.get("errno") != 0:
+                _api_error("list")
                 log(f"Failed to list remote files: {data}")
                 break
 
@@ -455,78 +687,256 @@ class BaiduClient:
 
             # Issue 13: guard against missing has_more (None → don't loop forever)
             has_more = data.get("has_more")
-            if has_more is not True:
-                break
-
-            if len(items) < LIST_LIMIT:
+            if has_more is not True or len(items) < LIST_LIMIT:
+                complete = True
                 break
 
             start += len(items)
 
-        log(f"--- Remote Directory Content ({len(all_items)} files) ---")
+        log("Listed %d items in %s", len(all_items), remote_dir)
         for f in all_items:
-            tag = "DIR" if f.get("isdir") == 1 else "FILE"
-            log(
-                f"[{tag}] {f.get('server_filename')} ({f.get('size')} bytes)"
+            debug(
+                "  [%s] %s (%s bytes)",
+                "DIR" if f.get("isdir") == 1 else "FILE", f.get("server_filename"), f.get("size"),
             )
-        log("------------------------------------------------")
+
+        if complete and self.catalog is not None:
+            try:
+                self.catalog.record_listing(remote_dir, all_items)
+            except Exception as e:
+                log(f"Catalog update failed: {e}")
         return all_items
 
     # ------------------------------------------------------------------
     # Batch filemanager  (Issue 6: deduplicate delete / move)
     # ------------------------------------------------------------------
-    def _batch_filemanager(
+    def _submit_filemanager_batch(
         self,
-        remote_paths: List[Any],
+        batch: List[Any],
         opera: str,
-        action_name: str,
-    ) -> bool:
-        """Generic batched filemanager call (delete / move / copy etc.)."""
-        self._ensure_token()
-        if not remote_paths:
-            return True
-
-        url = "https://pan.baidu.com/rest/2.0/xpan/file"
+        async_mode: int,
+    ) -> Tuple[str, Any]:
+        """Submit one filemanager batch.
+
+        Returns ``(status, payload)`` where *status* is ``"ok"`` (payload is the
+        taskid or None), ``"busy"`` (another async task is running or the rate
+        limit was hit), ``"retry"`` (HTTP 5xx / timeout / transport error,
+        payload is the error) or ``"fail"`` (permanent error).
+        """
+        url = f"{PAN_BASE}/rest/2.0/xpan/file"
         params = {
             "method": "filemanager",
             "access_token": self.access_token,
             "opera": opera,
         }
         headers: Dict[str, str] = {"User-Agent": "pan.baidu.com"}
-
+        form_data = {"async": str(async_mode), "filelist": json.dumps(batch)}
+        try:
+            resp = _api_request(
+                "filemanager", "POST",
+                url,
+                params=params,
+                data=form_data,
+                headers=headers,
+                timeout=UPLOAD_TIMEOUT,
+            )
+            if resp.status_code >= 500:
+                return "retry", f"HTTP {resp.status_code}"
+            data = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            return "retry", e
+
+        errno = data.get("errno")
+        if errno == 0:
+            taskid = data.get("taskid")
+            return "ok", str(taskid) if taskid else None
+        _api_error("filemanager")
+        if errno in _FILEMANAGER_BUSY_ERRNOS:
+            return "busy", data
+        return "fail", data
+
+    def submit_filemanager(
+        self,
+        remote_paths: List[Any],
+        opera: str,
+        action_name: str,
+        async_mode: int = FILEMANAGER_ASYNC,
+    ) -> Tuple[bool, List[str]]:
+        """Submit filemanager batches of ``BATCH_SIZE`` items.
+
+        Async batches go out one at a time, each after the previous batch's
+        task has finished — Baidu runs one async task per account and answers
+        concurrent submissions with errno 111 — while sync batches
+        (``async_mode=0``) are sent ``FILEMANAGER_WORKERS`` at a time.  A batch
+        rejected as busy (111 / 31034, e.g. another client's task) is
+        resubmitted unchanged with exponential backoff.  A batch hitting a server / timeout error is split in half
+        (down to ``MIN_BATCH_SIZE``, and later batches use the reduced size),
+        then retried as is.
+
+        Returns:
+            (ok, taskids) — *taskids* are the async tasks still running on the
+            server (at most the last batch's; empty for ``async_mode=0``); poll them with
+            :meth:`wait_filemanager_tasks`.
+        """
+        if not remote_paths:
+            return True, []
+
+        batch_size = BATCH_SIZE
+        # (batch, attempt)
+        pending: List[Tuple[List[Any], int]] = [
+            (remote_paths[i : i + batch_size], 0)
+            for i in range(0, len(remote_paths), batch_size)
+        ]
         ok = True
-        for i in range(0, len(remote_paths), BATCH_SIZE):
-            batch = remote_paths[i : i + BATCH_SIZE]
-            form_data = {"async": "0", "filelist": json.dumps(batch)}
-            try:
-                resp = requests.post(
-                    url,
-                    params=params,
-                    data=form_data,
-                    headers=headers,
-                    timeout=UPLOAD_TIMEOUT,
+        taskids: List[str] = []
+        workers = 1 if async_mode else FILEMANAGER_WORKERS
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending:
+                if taskids:
+                    # 上一批异步任务结束后再提交下一批，避免 errno 111
+                    ok = self.wait_filemanager_tasks(taskids) and ok
+                    taskids = []
+                self._ensure_token()
+                current, pending = pending[:workers], pending[workers:]
+                results = list(
+                    pool.map(
+                        lambda item: self._submit_filemanager_batch(item[0], opera, async_mode),
+                        current,
+                    )
                 )
-                data = resp.json()
-                if data.get("errno") == 0:
-                    log(f"{action_name} {len(batch)} remote files")
-                else:
-                    ok = False
-                    log(
-                        f"Failed to {action_name.lower()} remote files: {data}"
+                again: List[Tuple[List[Any], int]] = []
+                delay = 0.0
+                for (batch, attempt), (status, payload) in zip(current, results):
+                    if status == "ok":
+                        if payload:
+                            taskids.append(payload)
+                        suffix = f" (task {payload})" if payload else ""
+                        log(f"{action_name} {len(batch)} remote files{suffix}")
+                        continue
+                    if status == "retry" and len(batch) > MIN_BATCH_SIZE:
+                        batch_size = max(MIN_BATCH_SIZE, min(batch_size, len(batch) // 2))
+                        warning(
+                            "%s batch of %d hit server error (%s); retrying with batch size %d",
+                            action_name, len(batch), payload, batch_size,
+                        )
+                        again.extend(
+                            (batch[j : j + batch_size], attempt)
+                            for j in range(0, len(batch), batch_size)
+                        )
+                        delay = max(delay, RETRY_DELAY)
+                        continue
+                    limit = FILEMANAGER_BUSY_RETRIES if status == "busy" else MAX_RETRIES
+                    if status == "fail" or attempt >= limit:
+                        ok = False
+                        error("Failed to %s remote files: %s", action_name.lower(), payload)
+                        continue
+                    backoff = min(RETRY_DELAY * 2 ** attempt, FILEMANAGER_BACKOFF_MAX)
+                    warning(
+                        "%s batch of %d rejected (%s); resubmitting in %.0fs",
+                        action_name, len(batch), payload, backoff,
                     )
-            except Exception as e:
+                    again.append((batch, attempt + 1))
+                    delay = max(delay, backoff)
+                pending = again + pending
+                if again:
+                    time.sleep(delay)
+
+        return ok, taskids
+
+    def wait_filemanager_tasks(
+        self,
+        taskids: List[str],
+        timeout: float = TASK_POLL_TIMEOUT,
+    ) -> bool:
+        """Poll async filemanager *taskids* until all finish; True if all succeeded."""
+        if not taskids:
+            return True
+
+        url = f"{PAN_BASE}/share/taskquery"
+        headers: Dict[str, str] = {"User-Agent": "pan.baidu.com"}
+        remaining: List[str] = list(taskids)
+        ok = True
+        deadline = time.time() + timeout
+
+        while remaining:
+            self._ensure_token()
+            still_running: List[str] = []
+            for taskid in remaining:
+                params = {"access_token": self.access_token, "taskid": taskid}
+                try:
+                    resp = _api_request(
+                        "taskquery", "GET",
+                        url, params=params, headers=headers, timeout=DEFAULT_TIMEOUT
+                    )
+                    data = resp.json()
+                except (requests.RequestException, ValueError) as e:
+                    log(f"Task {taskid} query error: {e}")
+                    still_running.append(taskid)
+                    continue
+
+                status = data.get("status")
+                if status == "success":
+                    continue
+                if status in ("running", "pending"):
+                    still_running.append(taskid)
+                    continue
                 ok = False
-                log(f"Error {action_name.lower()} remote files: {e}")
+                log(f"Async task {taskid} failed: {data}")
+
+            remaining = still_running
+            if not remaining:
+                break
+            if time.time() >= deadline:
+                log(f"Timed out waiting for {len(remaining)} async tasks: {remaining}")
+                return False
+            time.sleep(TASK_POLL_INTERVAL)
         return ok
 
-    def delete_remote_files(self, remote_paths: List[str]) -> bool:
+    def _batch_filemanager(
+        self,
+        remote_paths: List[Any],
+        opera: str,
+        action_name: str,
+        async_mode: int = FILEMANAGER_ASYNC,
+    ) -> bool:
+        """Generic batched filemanager call (delete / move / copy etc.).
+
+        Submits all batches (see :meth:`submit_filemanager`) and, for async
+        modes, blocks until the server-side tasks have finished so callers can
+        rely on the result.
+        """
+        ok, taskids = self.submit_filemanager(
+            remote_paths, opera, action_name, async_mode
+        )
+        if taskids:
+            ok = self.wait_filemanager_tasks(taskids) and ok
+
+        if self.catalog is not None and remote_paths:
+            try:
+                if not ok:
+                    # 部分批次失败时无法确定远端状态，下次强制全量重新列举
+                    self.catalog.invalidate()
+                elif opera == "move":
+                    self.catalog.record_moves(remote_paths)
+                elif opera == "delete":
+                    self.catalog.record_deletes(remote_paths)
+            except Exception as e:
+                log(f"Catalog update failed: {e}")
+        return ok
+
+    def delete_remote_files(
+        self, remote_paths: List[str], async_mode: int = FILEMANAGER_ASYNC
+    ) -> bool:
         """Delete *remote_paths* on Baidu Netdisk (batched)."""
-        return self._batch_filemanager(remote_paths, "delete", "Deleted")
+        return self._batch_filemanager(remote_paths, "delete", "Deleted", async_mode)
 
-    def move_remote_files(self, moves: List[Dict[str, str]]) -> bool:
+    def move_remote_files(
+        self, moves: List[Dict[str, str]], async_mode: int = FILEMANAGER_ASYNC
+    ) -> bool:
         """Move files on Baidu Netdisk (batched).  *moves*: list of
         ``{"path": src, "dest": dst_dir, "ondup": "overwrite"}``."""
-        return self._batch_filemanager(moves, "move", "Moved")
+        return self._batch_filemanager(moves, "move", "Moved", async_mode)
 
     # ------------------------------------------------------------------
     # Directory management
@@ -536,7 +946,7 @@ class BaiduClient:
         self._ensure_token()
         log(f"Ensuring remote directory exists: {remote_dir}")
 
-        url = "https://pan.baidu.com/rest/2.0/xpan/file"
+        url = f"{PAN_BASE}/rest/2.0/xpan/file"
         params = {"method": "create", "access_token": self.access_token}
         headers: Dict[str, str] = {"User-Agent": "pan.baidu.com"}
         form_data = {
@@ -547,7 +957,8 @@ class BaiduClient:
         }
 
         try:
-            resp = requests.post(
+            resp = _api_request(
+                "mkdir", "POST",
                 url,
                 params=params,
                 data=form_data,
@@ -567,6 +978,7 @@ class BaiduClient:
                 log(f"Directory exists (non-standard response): {remote_dir}")
                 return True
             else:
+                _api_error("mkdir")
                 log(f"Failed to create directory: {res}")
                 return False
         except Exception as e:
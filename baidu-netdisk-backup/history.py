@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Run history: one SQLite row per scheduler job in /data.
+
+Each full sync cycle (and each upload-only job triggered by the backup
+watcher) records its timing, upload volume and throughput, file counts, Baidu
+API call counts, retention operations and the quota after the run, so the
+Web UI can chart trends across upgrades or network changes.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from client import log
+
+HISTORY_FILE: str = "/data/history.db"
+MAX_ROWS: int = 5000          # 超出后删除最旧的记录
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind             TEXT NOT NULL,
+    reason           TEXT,
+    started_at       REAL NOT NULL,
+    finished_at      REAL NOT NULL,
+    duration         REAL NOT NULL,
+    success          INTEGER NOT NULL,
+    files_total      INTEGER NOT NULL DEFAULT 0,
+    files_uploaded   INTEGER NOT NULL DEFAULT 0,
+    files_skipped    INTEGER NOT NULL DEFAULT 0,
+    files_failed     INTEGER NOT NULL DEFAULT 0,
+    bytes_uploaded   INTEGER NOT NULL DEFAULT 0,
+    throughput       REAL,
+    api_calls        INTEGER NOT NULL DEFAULT 0,
+    api_errors       INTEGER NOT NULL DEFAULT 0,
+    api_detail       TEXT,
+    retention_moves  INTEGER NOT NULL DEFAULT 0,
+    retention_deletes INTEGER NOT NULL DEFAULT 0,
+    quota_used       INTEGER,
+    quota_total      INTEGER,
+    error            TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+"""
+
+_COLUMNS: Tuple[str, ...] = (
+    "kind", "reason", "started_at", "finished_at", "duration", "success",
+    "files_total", "files_uploaded", "files_skipped", "files_failed",
+    "bytes_uploaded", "throughput", "api_calls", "api_errors", "api_detail",
+    "retention_moves", "retention_deletes", "quota_used", "quota_total", "error",
+)
+
+
+def _delta(after: Dict[Tuple[str, ...], float], before: Dict[Tuple[str, ...], float]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for labels, value in after.items():
+        n = int(value - before.get(labels, 0))
+        if n:
+            out["/".join(labels) or "total"] = n
+    return out
+
+
+def build_run_row(
+    kind: str,
+    reason: str,
+    started_at: float,
+    finished_at: float,
+    result: Optional[Dict[str, Any]],
+    api_before: Tuple[Dict, Dict],
+    api_after: Tuple[Dict, Dict],
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Flatten a job result (see ``main.run_sync_cycle``) into a history row.
+
+    *api_before* / *api_after* are ``(calls, errors)`` snapshots of the API
+    metrics (``metrics.API_LATENCY.totals()``, ``metrics.API_ERRORS.totals()``).
+    """
+    result = result or {}
+    sync = result.get("sync") or {}
+    plan = result.get("plan") or {}
+    quota = result.get("quota") or {}
+    calls = _delta(api_after[0], api_before[0])
+    errors = _delta(api_after[1], api_before[1])
+
+    succeeded = int(sync.get("success_count", 0))
+    skipped = int(sync.get("skipped_count", 0))
+    uploaded_bytes = int(sync.get("uploaded_bytes", 0))
+    duration = max(finished_at - started_at, 0.0)
+    error = error or sync.get("error")
+    executed = bool(plan) and not result.get("dry_run")
+    return {
+        "kind": kind,
+        "reason": reason,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "duration": duration,
+        "success": int(error is None and not sync.get("failed_count")),
+        "files_total": int(sync.get("total_count", 0)),
+        "files_uploaded": succeeded - skipped,
+        "files_skipped": skipped,
+        "files_failed": int(sync.get("failed_count", 0)),
+        "bytes_uploaded": uploaded_bytes,
+        "throughput": uploaded_bytes / duration if uploaded_bytes and duration > 0 else None,
+        "api_calls": sum(calls.values()),
+        "api_errors": sum(errors.values()),
+        "api_detail": json.dumps({"calls": calls, "errors": errors}),
+        "retention_moves": len(plan.get("moves") or []) if executed else 0,
+        "retention_deletes": len(plan.get("deletes") or []) if executed else 0,
+        "quota_used": quota.get("used"),
+        "quota_total": quota.get("total"),
+        "error": error,
+    }
+
+
+class HistoryStore:
+    """SQLite-backed run history; safe to share between threads."""
+
+    def __init__(self, path: str = HISTORY_FILE) -> None:
+        self.path: str = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def record(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO runs ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                [row.get(c) for c in _COLUMNS],
+            )
+            self._db.execute(
+                "DELETE FROM runs WHERE id <= (SELECT MAX(id) FROM runs) - ?", (MAX_ROWS,)
+            )
+            self._db.commit()
+
+    def page(self, limit: int = 50, offset: int = 0, kind: Optional[str] = None) -> Dict[str, Any]:
+        """Newest-first page of runs: ``{"total", "limit", "offset", "runs"}``."""
+        limit = max(1, min(int(limit), 500))
+        offset = max(0, int(offset))
+        where, args = ("WHERE kind = ?", [kind]) if kind else ("", [])
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM runs {where}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT * FROM runs {where} ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                args + [limit, offset],
+            ).fetchall()
+        runs: List[Dict[str, Any]] = []
+        for r in rows:
+            run = dict(r)
+            run["success"] = bool(run["success"])
+            try:
+                run["api_detail"] = json.loads(run["api_detail"] or "{}")
+            except ValueError:
+                run["api_detail"] = {}
+            runs.append(run)
+        return {"total": total, "limit": limit, "offset": offset, "runs": runs}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+_store_failed: bool = False
+
+
+def get_history() -> Optional[HistoryStore]:
+    """Shared store (opened on first use); None when SQLite is unusable."""
+    global _store, _store_failed
+    with _store_lock:
+        if _store is None and not _store_failed:
+            try:
+                _store = HistoryStore(HISTORY_FILE)
+            except (sqlite3.Error, OSError) as e:
+                _store_failed = True
+                log(f"Run history unavailable: {e}")
+        return _store
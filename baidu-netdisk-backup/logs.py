@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Leveled, buffered logging with an in-memory tail for the Web UI.
+
+``log(msg)`` keeps the historical one-argument call style and logs at INFO
+(it is re-exported as ``client.log``).  ``debug()`` / ``info()`` /
+``warning()`` / ``error()`` take ``%``-style arguments that are only
+formatted when the level is enabled, so disabled per-item / per-chunk debug
+lines cost a single comparison.
+
+Enabled lines go to a ring buffer (``tail()``, served at ``/api/logs``) and
+to an output buffer that a background thread writes to stdout every
+``FLUSH_INTERVAL`` — or right away for WARNING and above or when
+``MAX_BUFFERED`` lines are waiting — instead of one flushed ``print`` per
+line.  The timestamp prefix is formatted once per second.
+"""
+import atexit
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+DEBUG: int = 10
+INFO: int = 20
+WARNING: int = 30
+ERROR: int = 40
+
+LEVEL_NAMES: Dict[int, str] = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+_LEVELS_BY_NAME: Dict[str, int] = {v: k for k, v in LEVEL_NAMES.items()}
+
+TIME_FORMAT: str = "%Y-%m-%d %H:%M:%S"
+RING_SIZE: int = 1000            # Web UI 可查看的最近日志行数
+FLUSH_INTERVAL: float = 0.5      # stdout 批量写出间隔（秒）
+MAX_BUFFERED: int = 256          # 缓冲行数达到此值时立即写出
+
+_level: int = INFO
+_lock = threading.Lock()
+_ring: Deque[Tuple[int, float, int, str]] = deque(maxlen=RING_SIZE)
+_seq: int = 0
+_pending: List[str] = []
+_wakeup = threading.Event()
+_flusher: Optional[threading.Thread] = None
+_ts_second: int = -1
+_ts_prefix: str = ""
+
+
+def parse_level(value: Union[str, int, None], default: int = INFO) -> int:
+    """``"debug"`` / ``"INFO"`` / ``30`` → level number (*default* if unknown)."""
+    if isinstance(value, int):
+        return value
+    return _LEVELS_BY_NAME.get(str(value or "").strip().lower(), default)
+
+
+def set_level(level: Union[str, int, None]) -> None:
+    global _level
+    _level = parse_level(level)
+
+
+def get_level() -> int:
+    return _level
+
+
+def is_enabled(level: int) -> bool:
+    return level >= _level
+
+
+def _prefix(now: float) -> str:
+    global _ts_second, _ts_prefix
+    second = int(now)
+    if second != _ts_second:
+        _ts_prefix = "[" + time.strftime(TIME_FORMAT, time.localtime(second)) + "] "
+        _ts_second = second
+    return _ts_prefix
+
+
+def _emit(level: int, msg: str, args: Tuple[Any, ...]) -> None:
+    global _seq
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = f"{msg} {args!r}"
+    now = time.time()
+    with _lock:
+        _seq += 1
+        _ring.append((_seq, now, level, msg))
+        tag = "" if level == INFO else f"[{LEVEL_NAMES.get(level, level)}] "
+        _pending.append(_prefix(now) + tag + msg + "\n")
+        urgent = level >= WARNING or len(_pending) >= MAX_BUFFERED
+    _ensure_flusher()
+    if urgent:
+        _wakeup.set()
+
+
+def log(msg: str, *args: Any) -> None:
+    """INFO-level log line (the add-on's historical logging entry point)."""
+    if INFO >= _level:
+        _emit(INFO, msg, args)
+
+
+info = log
+
+
+def debug(msg: str, *args: Any) -> None:
+    if DEBUG >= _level:
+        _emit(DEBUG, msg, args)
+
+
+def warning(msg: str, *args: Any) -> None:
+    if WARNING >= _level:
+        _emit(WARNING, msg, args)
+
+
+def error(msg: str, *args: Any) -> None:
+    if ERROR >= _level:
+        _emit(ERROR, msg, args)
+
+
+def flush() -> None:
+    """Write buffered lines to stdout now."""
+    with _lock:
+        if not _pending:
+            return
+        text = "".join(_pending)
+        _pending.clear()
+    try:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    except (OSError, ValueError):
+        pass
+
+
+def _run_flusher() -> None:
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush()
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is None:
+        with _lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_run_flusher, name="log-flusher", daemon=True)
+                _flusher.start()
+
+
+atexit.register(flush)
+
+
+def tail(since: int = 0, min_level: int = DEBUG, limit: int = 200) -> Dict[str, Any]:
+    """Buffered lines with ``seq`` > *since*: ``{"last_seq", "lines": [...]}``.
+
+    At most the newest *limit* lines are returned; ``lines`` entries are
+    ``{"seq", "time", "level", "msg"}``.
+    """
+    with _lock:
+        last_seq = _seq
+        rows = [r for r in _ring if r[0] > since and r[2] >= min_level]
+    rows = rows[-max(1, limit):]
+    return {
+        "last_seq": last_seq,
+        "level": LEVEL_NAMES.get(_level, str(_level)),
+        "lines": [
+            {"seq": s, "time": t, "level": LEVEL_NAMES.get(lv, str(lv)), "msg": m}
+            for s, t, lv, m in rows
+        ],
+    }
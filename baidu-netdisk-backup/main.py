@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 """Entry point & scheduling loop for the Baidu Netdisk Backup add-on."""
+import bisect
 import json
 import os
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+from catalog import open_catalog
+from history import build_run_row, get_history
+from metrics import API_ERRORS, API_LATENCY, CYCLE_STAGE_SECONDS, timed
 from client import BaiduClient, log
-from notifier import notify_event
+from logs import set_level as set_log_level
+from notifier import dispatcher as notify_dispatcher, notification_digest, notify_event
 from retention import (
     cleanup_remote_backups,
     generate_manifest,
@@ -15,10 +21,19 @@ from retention import (
     retention_folder_mode,
     _join_remote_dir,
 )
-from sync import sync_all_backups
-from web import start_web_server, register_config_reload_callback
+from scheduler import REASON_NEW_BACKUP, REASON_STARTUP, Scheduler
+from sync import find_pending_backups, sync_all_backups
+from tracing import span, trace_cycle
+from watcher import BackupWatcher
+from web import (
+    register_catalog,
+    register_config_reload_callback,
+    register_scheduler,
+    start_web_server,
+)
 
 CONFIG_PATH: str = "/data/options.json"
+LAST_RUN_FILE: str = "/data/last_run.json"
 
 
 # ============================================================================
@@ -29,8 +44,19 @@ class CronSchedule:
 
     dow / dom 使用经典 cron 的"OR"语义：仅当两者都不是 `*` 时取并集；都是 `*`
     时为 AND（即不限制）。dow 0=Sunday，与 crontab(5) 一致。
+    另支持 `@yearly`/`@annually`/`@monthly`/`@weekly`/`@daily`/`@midnight`/`@hourly`。
     """
 
+    _MACROS: Dict[str, str] = {
+        "@yearly": "0 0 1 1 *",
+        "@annually": "0 0 1 1 *",
+        "@monthly": "0 0 1 * *",
+        "@weekly": "0 0 * * 0",
+        "@daily": "0 0 * * *",
+        "@midnight": "0 0 * * *",
+        "@hourly": "0 * * * *",
+    }
+
     _FIELD_RANGES = [
         (0, 59),   # minute
         (0, 23),   # hour
@@ -41,7 +67,7 @@ class CronSchedule:
 
     def __init__(self, expr: str) -> None:
         self.expr: str = expr
-        parts = expr.split()
+        parts = self._MACROS.get(expr.strip().lower(), expr).split()
         if len(parts) != 5:
             raise ValueError(f"cron expression must have 5 fields, got: {expr!r}")
         self.fields = [
@@ -53,6 +79,10 @@ class CronSchedule:
         )
         self.dom_restricted: bool = parts[2] != "*"
         self.dow_restricted: bool = parts[4] != "*"
+        # 有序列表，供 next_fire 二分查找下一个合法值
+        self._minutes: List[int] = sorted(self.minute_set)
+        self._hours: List[int] = sorted(self.hour_set)
+        self._months: List[int] = sorted(self.mon_set)
 
     @staticmethod
     def _parse_field(spec: str, lo: int, hi: int) -> set:
@@ -78,31 +108,70 @@ class CronSchedule:
             out.update(range(start, end + 1, step))
         return out
 
-    def matches(self, dt: datetime) -> bool:
+    def _day_matches(self, dt: datetime) -> bool:
         # cron 中 weekday 0 / 7 都表示周日；Python weekday(): Mon=0..Sun=6
         cron_dow = (dt.weekday() + 1) % 7  # → Sun=0..Sat=6
+        dom_ok = dt.day in self.dom_set
+        dow_ok = cron_dow in self.dow_set
+        if self.dom_restricted and self.dow_restricted:
+            return dom_ok or dow_ok
+        return dom_ok and dow_ok
+
+    def matches(self, dt: datetime) -> bool:
         if dt.minute not in self.minute_set:
             return False
         if dt.hour not in self.hour_set:
             return False
         if dt.month not in self.mon_set:
             return False
-        dom_ok = dt.day in self.dom_set
-        dow_ok = cron_dow in self.dow_set
-        if self.dom_restricted and self.dow_restricted:
-            return dom_ok or dow_ok
-        return dom_ok and dow_ok
+        return self._day_matches(dt)
 
     def next_fire(self, now: datetime) -> datetime:
-        # 从 now+1min 起按分钟扫描；上限 4 年防止表达式无解时死循环
+        """First firing time strictly after *now* (minute precision).
+
+        逐字段跳跃：月份不合法 → 跳到下一个合法月份 1 日 00:00；日期不合法 →
+        跳到次日 00:00；小时/分钟不合法 → 跳到下一个合法值。最多跨 ~48 个月、
+        每月 ≤31 天，与表达式多稀有无关。上限 4 年防止表达式无解时死循环。
+        """
         t = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
         limit = t + timedelta(days=366 * 4)
         while t < limit:
-            if self.matches(t):
-                return t
-            t += timedelta(minutes=1)
+            if t.month not in self.mon_set:
+                i = bisect.bisect_right(self._months, t.month)
+                if i < len(self._months):
+                    t = t.replace(month=self._months[i], day=1, hour=0, minute=0)
+                else:
+                    t = t.replace(year=t.year + 1, month=self._months[0], day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if t.hour not in self.hour_set:
+                i = bisect.bisect_right(self._hours, t.hour)
+                if i < len(self._hours):
+                    t = t.replace(hour=self._hours[i], minute=0)
+                else:
+                    t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if t.minute not in self.minute_set:
+                i = bisect.bisect_right(self._minutes, t.minute)
+                if i < len(self._minutes):
+                    t = t.replace(minute=self._minutes[i])
+                else:
+                    t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            return t
         raise ValueError(f"cron expression has no firing within 4 years: {self.expr!r}")
 
+    def next_fires(self, now: datetime, n: int) -> List[datetime]:
+        """The next *n* firing times after *now* (e.g. for previews in the Web UI)."""
+        out: List[datetime] = []
+        t = now
+        for _ in range(n):
+            t = self.next_fire(t)
+            out.append(t)
+        return out
+
 
 def parse_cron(schedule_str: str) -> CronSchedule:
     """解析 cron；解析失败时回退到默认 `0 5 * * *` 并打日志。"""
@@ -130,15 +199,19 @@ def load_config() -> Tuple[str, str, Dict[str, Any], bool, CronSchedule, Dict[st
         "refresh_token", os.environ.get("REFRESH_TOKEN", "")
     )
     upload_path: str = options.get("upload_path", "/HomeAssistant/Backup")
+    set_log_level(options.get("log_level", "info"))
 
     # 嵌套 retention 配置（v1.1.0 起仅支持嵌套写法）
     retention_raw = options.get("retention") or {}
     if not isinstance(retention_raw, dict):
         retention_raw = {}
     retention: Dict[str, Any] = {
+        "hourly": retention_raw.get("hourly", 0),
         "daily": retention_raw.get("daily", 7),
         "weekly": retention_raw.get("weekly", 4),
         "monthly": retention_raw.get("monthly", 12),
+        "yearly": retention_raw.get("yearly", 0),
+        "dry_run": bool(retention_raw.get("dry_run", False)),
     }
     retention_use_folders: bool = bool(retention_raw.get("use_folders", True))
 
@@ -161,72 +234,121 @@ def init_client(refresh_token: str) -> BaiduClient:
         raise
 
 
-def run_sync_cycle(
+@contextmanager
+def _stage(name: str) -> Iterator[None]:
+    """Cycle stage: timed into the stage histogram and traced as a span."""
+    with timed(CYCLE_STAGE_SECONDS.labels(name)), span(name, cat="stage"):
+        yield
+
+
+def _upload_target(upload_path: str, retention_use_folders: bool) -> str:
+    """Remote directory new backups are uploaded to."""
+    return _join_remote_dir(upload_path, "每日") if retention_use_folders else upload_path
+
+
+def run_upload_only(
     client: BaiduClient,
     upload_path: str,
-    retention: Dict[str, Any],
     retention_use_folders: bool,
     notifications: Dict[str, Any],
-) -> None:
-    """Execute one full synchronisation cycle with notification integration."""
-    if retention_use_folders:
-        daily_dir = _join_remote_dir(upload_path, "每日")
-        sync_result = sync_all_backups(client, daily_dir)
-
-        # 通知：备份成功 / 失败
-        if sync_result["success"] and sync_result.get("success_count", 0) > 0:
-            sync_result["upload_path"] = daily_dir
-            notify_event(notifications, "backup_success", sync_result)
-        elif sync_result.get("error"):
-            sync_result["upload_path"] = daily_dir
-            notify_event(notifications, "backup_failure", sync_result)
+) -> Dict[str, Any]:
+    """Upload local backups only (no retention / manifest / quota check).
 
-        try:
-            # 迁移旧英文目录到新中文目录（仅首次执行）
-            migrated = migrate_old_dirs(client, upload_path)
-            for info in migrated:
-                notify_event(notifications, "migration_done", info)
-            retention_folder_mode(client, upload_path, retention)
-        except Exception as e:
-            log(f"Remote retention error: {e}")
+    Used on its own when the backup watcher reports a new file, and as the
+    first step of :func:`run_sync_cycle`.
+    """
+    target_dir = _upload_target(upload_path, retention_use_folders)
+    sync_result = sync_all_backups(client, target_dir)
 
-        # 每次 retention 完成后生成备份清单文件
-        try:
-            manifest_info = generate_manifest(client, upload_path)
-            if manifest_info:
-                notify_event(notifications, "manifest_generated", manifest_info)
-        except Exception as e:
-            log(f"Generate manifest error: {e}")
+    # 通知：备份成功 / 失败
+    if sync_result["success"] and sync_result.get("success_count", 0) > 0:
+        sync_result["upload_path"] = target_dir
+        notify_event(notifications, "backup_success", sync_result)
+    elif sync_result.get("error"):
+        sync_result["upload_path"] = target_dir
+        notify_event(notifications, "backup_failure", sync_result)
+    return sync_result
 
-        # 存储空间检查
-        _check_storage_warning(client, notifications)
-    else:
-        sync_result = sync_all_backups(client, upload_path)
-
-        # 通知：备份成功 / 失败
-        if sync_result["success"] and sync_result.get("success_count", 0) > 0:
-            sync_result["upload_path"] = upload_path
-            notify_event(notifications, "backup_success", sync_result)
-        elif sync_result.get("error"):
-            sync_result["upload_path"] = upload_path
-            notify_event(notifications, "backup_failure", sync_result)
 
-        try:
-            cleanup_remote_backups(client, upload_path, retention)
-        except Exception as e:
-            log(f"Remote retention error: {e}")
+def run_sync_cycle(
+    client: BaiduClient,
+    upload_path: str,
+    retention: Dict[str, Any],
+    retention_use_folders: bool,
+    notifications: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Execute one full synchronisation cycle with notification integration.
+
+    Returns:
+        {
+            "sync": dict,             # sync_all_backups 结果
+            "plan": dict | None,      # retention 计划（见 retention._make_plan）
+            "dry_run": bool,          # 计划是否仅打印未执行
+            "manifest": dict | None,  # 清单上传信息（未变化 / 失败时为 None）
+            "quota": dict | None,     # 运行结束后的网盘容量
+        }
+    """
+    result: Dict[str, Any] = {
+        "sync": None,
+        "plan": None,
+        "dry_run": bool(retention.get("dry_run")),
+        "manifest": None,
+        "quota": None,
+    }
+    with timed(CYCLE_STAGE_SECONDS.labels("total")):
+        with _stage("upload"):
+            result["sync"] = run_upload_only(
+                client, upload_path, retention_use_folders, notifications
+            )
+        if retention_use_folders:
+            plan = None
+            try:
+                # 迁移旧英文目录到新中文目录（仅首次执行）
+                with _stage("migration"):
+                    migrated = migrate_old_dirs(client, upload_path)
+                for info in migrated:
+                    notify_event(notifications, "migration_done", info)
+                with _stage("retention"):
+                    plan = result["plan"] = retention_folder_mode(
+                        client, upload_path, retention
+                    )
+            except Exception as e:
+                log(f"Remote retention error: {e}")
+
+            # 每次 retention 完成后生成备份清单文件（复用 retention 计划中的最终状态）
+            try:
+                entries, listed_dirs = None, ()
+                if plan is not None and not retention.get("dry_run"):
+                    entries, listed_dirs = plan["entries"], plan["dirs"]
+                with _stage("manifest"):
+                    manifest_info = result["manifest"] = generate_manifest(
+                        client, upload_path, entries, listed_dirs
+                    )
+                if manifest_info:
+                    notify_event(notifications, "manifest_generated", manifest_info)
+            except Exception as e:
+                log(f"Generate manifest error: {e}")
+        else:
+            try:
+                with _stage("retention"):
+                    result["plan"] = cleanup_remote_backups(client, upload_path, retention)
+            except Exception as e:
+                log(f"Remote retention error: {e}")
 
         # 存储空间检查
-        _check_storage_warning(client, notifications)
+        with _stage("quota"):
+            result["quota"] = _check_storage_warning(client, notifications)
+    return result
 
 
 def _check_storage_warning(
     client: BaiduClient,
     notifications: Dict[str, Any],
-) -> None:
+) -> Optional[Dict[str, Any]]:
     """检查网盘容量，达到阈值时触发 storage_warning 通知。
 
     阈值取 notifications.storage_warning_threshold（0-1 之间小数；默认 0.9）。
+    返回 get_quota() 的结果（失败时为 None）。
     """
     try:
         threshold = float(notifications.get("storage_warning_threshold", 0.9))
@@ -239,9 +361,9 @@ def _check_storage_warning(
         quota = client.get_quota()
     except Exception as e:
         log(f"Storage warning check error: {e}")
-        return
+        return None
     if not quota or quota.get("total", 0) <= 0:
-        return
+        return quota
 
     used = quota["used"]
     total = quota["total"]
@@ -256,37 +378,128 @@ def _check_storage_warning(
             "storage_warning",
             {"used": used, "total": total, "free": quota.get("free", 0)},
         )
+    return quota
 
 
-def schedule_loop(
-    client: BaiduClient,
-    cfg: Dict[str, Any],
+# ============================================================================
+# 上次运行状态（/data/last_run.json）— 避免每次重启都跑完整周期
+# ============================================================================
+def load_last_run() -> Dict[str, Any]:
+    try:
+        with open(LAST_RUN_FILE, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_last_run(
+    started_at: float,
+    reason: str,
+    upload_path: str,
+    sync_result: Optional[Dict[str, Any]],
+    error: Optional[str] = None,
 ) -> None:
-    """Main scheduling loop — wakes at every cron-matched minute."""
-    log(f"Entering scheduled mode. Cron: {cfg['cron'].expr!r}")
+    """Persist the outcome of a full cycle; ``last_success_at`` only moves on success."""
+    state = load_last_run()
+    success = error is None and not (sync_result or {}).get("error")
+    state["last_run"] = {
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "reason": reason,
+        "upload_path": upload_path,
+        "success": success,
+        "uploaded": (sync_result or {}).get("success_count", 0),
+        "total": (sync_result or {}).get("total_count", 0),
+        "error": error or (sync_result or {}).get("error"),
+    }
+    if success:
+        state["last_success_at"] = state["last_run"]["finished_at"]
+        state["upload_path"] = upload_path
+    try:
+        os.makedirs(os.path.dirname(LAST_RUN_FILE), exist_ok=True)
+        tmp = LAST_RUN_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, LAST_RUN_FILE)
+    except OSError as e:
+        log(f"Failed to save last run state: {e}")
+
 
-    while True:
-        now = datetime.now()
-        target = cfg["cron"].next_fire(now)
+def startup_job(
+    client: BaiduClient,
+    cron: CronSchedule,
+    upload_path: str,
+    retention_use_folders: bool,
+) -> Optional[str]:
+    """Decide what (if anything) to run at startup.
 
-        seconds_to_wait = (target - now).total_seconds()
+    Returns ``REASON_STARTUP`` (full cycle) when there is no successful run on
+    record, the upload path changed, or a cron fire was missed while the
+    add-on was down; ``REASON_NEW_BACKUP`` (upload only) when only new local
+    backups exist; otherwise None.
+    """
+    state = load_last_run()
+    last_ok = state.get("last_success_at")
+    if not last_ok:
+        log("Startup: no successful run on record — running full sync")
+        return REASON_STARTUP
+    if state.get("upload_path") != upload_path:
+        log("Startup: upload_path changed since last run — running full sync")
+        return REASON_STARTUP
+
+    last_dt = datetime.fromtimestamp(last_ok)
+    try:
+        missed = cron.next_fire(last_dt) <= datetime.now()
+    except ValueError:
+        missed = False
+    if missed:
         log(
-            f"Next run: {target.strftime('%Y-%m-%d %H:%M')} "
-            f"(in {seconds_to_wait / 3600:.2f}h)"
+            f"Startup: scheduled run missed since {last_dt.strftime('%Y-%m-%d %H:%M')}"
+            " — running full sync"
         )
-        time.sleep(max(seconds_to_wait, 1))
+        return REASON_STARTUP
+
+    pending = find_pending_backups(client, _upload_target(upload_path, retention_use_folders))
+    if pending:
+        log(f"Startup: {len(pending)} new local backup(s) — uploading")
+        return REASON_NEW_BACKUP
+
+    log(
+        f"Startup: last sync at {last_dt.strftime('%Y-%m-%d %H:%M')} is current,"
+        " skipping initial sync"
+    )
+    return None
+
+
+def _record_run(
+    kind: str,
+    reason: str,
+    started_at: float,
+    result: Optional[Dict[str, Any]],
+    api_before: Tuple[Dict, Dict],
+    error: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """Append the job to the run history (never fails the job).
 
-        log("Scheduled execution started")
+    Returns the history row, which doubles as the job summary polled by the
+    Web UI (``GET /api/jobs/<id>``).
+    """
+    try:
+        row = build_run_row(
+            kind, reason, started_at, time.time(), result,
+            api_before, (API_LATENCY.totals(), API_ERRORS.totals()), error,
+        )
+    except Exception as e:
+        log(f"Failed to summarise run: {e}")
+        return None
+    store = get_history()
+    if store is not None:
         try:
-            run_sync_cycle(
-                client, cfg["upload_path"], cfg["retention"],
-                cfg["retention_use_folders"], cfg["notifications"],
-            )
+            store.record(row)
         except Exception as e:
-            log(f"Scheduled upload error: {e}")
-
-        # 防止同一分钟内重入（next_fire 从 now+1min 起算，仍兜底 sleep 60s）
-        time.sleep(60)
+            log(f"Failed to record run history: {e}")
+    return row
 
 
 # ============================================================================
@@ -326,6 +539,7 @@ def main() -> None:
             time.sleep(3600)
 
     client = init_client(refresh_token)
+    client.catalog = open_catalog()
 
     # 可变配置容器 — Web UI 热加载时原地更新此 dict
     cfg: Dict[str, Any] = {
@@ -336,8 +550,41 @@ def main() -> None:
         "notifications": notifications,
     }
 
+    def _run_job(reason: str) -> Optional[Dict[str, Any]]:
+        # 每次运行时读取 cfg，热加载的配置从下一次运行起生效
+        kind = "upload_only" if reason == REASON_NEW_BACKUP else "sync_cycle"
+        api_before = (API_LATENCY.totals(), API_ERRORS.totals())
+        started_at = time.time()
+        result: Optional[Dict[str, Any]] = None
+        error: Optional[str] = None
+        summary: Optional[Dict[str, Any]] = None
+        try:
+            with trace_cycle(kind, reason=reason), notification_digest(cfg["notifications"]):
+                if kind == "upload_only":
+                    # 新备份写完后立即上传；retention 仍按 cron 计划执行
+                    result = {"sync": run_upload_only(
+                        client, cfg["upload_path"],
+                        cfg["retention_use_folders"], cfg["notifications"],
+                    )}
+                else:
+                    result = run_sync_cycle(
+                        client, cfg["upload_path"], cfg["retention"],
+                        cfg["retention_use_folders"], cfg["notifications"],
+                    )
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            summary = _record_run(kind, reason, started_at, result, api_before, error)
+            if kind == "sync_cycle":
+                save_last_run(started_at, reason, cfg["upload_path"],
+                              (result or {}).get("sync"), error)
+        return summary
+
+    scheduler = Scheduler(lambda: cfg["cron"], _run_job)
+
     def _reload_config() -> None:
-        """Web UI 保存配置后被调用，原地更新 cfg。"""
+        """Web UI 保存配置后被调用，原地更新 cfg 并立即重新计算下次运行时间。"""
         try:
             _, new_up, new_ret, new_uf, new_cron, new_notif = load_config()
             cfg["upload_path"] = new_up
@@ -345,19 +592,30 @@ def main() -> None:
             cfg["retention_use_folders"] = new_uf
             cfg["cron"] = new_cron
             cfg["notifications"] = new_notif
+            notify_dispatcher.configure(new_notif)
             log(f"配置已热加载（cron: {new_cron.expr!r}）")
         except Exception as e:
             log(f"配置热加载失败: {e}")
+        scheduler.wake()
+
+    # 继续投递上次运行未送达的通知
+    notify_dispatcher.configure(cfg["notifications"])
 
     # Web UI（Ingress 通道）— 后台线程，失败不影响主流程
     start_web_server(port=8099)
     register_config_reload_callback(_reload_config)
+    register_scheduler(scheduler)
+    register_catalog(client.catalog, lambda: cfg["upload_path"])
 
-    log("Running initial sync...")
-    run_sync_cycle(client, cfg["upload_path"], cfg["retention"],
-                   cfg["retention_use_folders"], cfg["notifications"])
+    # 监听 /backup：HA 写完新备份后立即排队上传
+    BackupWatcher(lambda names: scheduler.trigger(REASON_NEW_BACKUP)).start()
 
-    schedule_loop(client, cfg)
+    initial = startup_job(
+        client, cfg["cron"], cfg["upload_path"], cfg["retention_use_folders"]
+    )
+    if initial is not None:
+        scheduler.trigger(initial)
+    scheduler.run_forever()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""In-process metrics registry with Prometheus text exposition (``/metrics``).
+
+Counters and histograms keep one small child object per label combination.
+Children are created once and cached; afterwards a hot-path update is one
+dict lookup plus a short per-child lock (no global lock, no allocation).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认桶：API 延迟 / 阶段耗时（秒）
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+STAGE_BUCKETS: Tuple[float, ...] = (
+    0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0,
+)
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value: float = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)   # 最后一个为 +Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Metric:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        kind: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Tuple[float, ...]] = None,
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self.buckets: Tuple[float, ...] = tuple(buckets or LATENCY_BUCKETS)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = (
+                        _HistogramChild(self.buckets) if self.kind == "histogram"
+                        else _CounterChild()
+                    )
+                    self._children[values] = child
+        return child
+
+    def totals(self) -> Dict[Tuple[str, ...], float]:
+        """``{label values: value}`` (counters) or ``{label values: count}`` (histograms)."""
+        with self._lock:
+            children = list(self._children.items())
+        return {
+            values: (child.count if isinstance(child, _HistogramChild) else child.value)
+            for values, child in children
+        }
+
+    # 无标签指标的便捷方法
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [
+            f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            if isinstance(child, _HistogramChild):
+                counts, total, count = child.snapshot()
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = self._label_str(values, 'le="%g"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = self._label_str(values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{self._label_str(values)} {total:.6f}")
+                lines.append(f"{self.name}_count{self._label_str(values)} {count}")
+            else:
+                lines.append(f"{self.name}{self._label_str(values)} {_fmt(child.value)}")
+        return lines
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> _Metric:
+        return self._add(_Metric(name, help_text, "counter", labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Tuple[float, ...]] = None,
+    ) -> _Metric:
+        return self._add(_Metric(name, help_text, "histogram", labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def timed(child) -> Iterator[None]:
+    """Observe the duration of the ``with`` block into a histogram child."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        child.observe(time.perf_counter() - t0)
+
+
+# ============================================================================
+# 指标定义
+# ============================================================================
+UPLOADED_BYTES = REGISTRY.counter(
+    "baidu_backup_uploaded_bytes_total", "Bytes sent to Baidu Netdisk (chunks and small files)")
+UPLOADS = REGISTRY.counter(
+    "baidu_backup_uploads_total", "Finished file uploads by result (ok/rapid/failed)", ["result"])
+UPLOAD_PARTS = REGISTRY.counter(
+    "baidu_backup_upload_parts_total", "Upload parts (chunks) sent successfully")
+UPLOAD_PART_RETRIES = REGISTRY.counter(
+    "baidu_backup_upload_part_retries_total", "Upload part attempts that had to be retried")
+API_LATENCY = REGISTRY.histogram(
+    "baidu_backup_api_request_seconds", "Baidu API request latency by endpoint", ["endpoint"],
+    LATENCY_BUCKETS)
+API_ERRORS = REGISTRY.counter(
+    "baidu_backup_api_errors_total",
+    "Baidu API failures by endpoint (transport, HTTP >= 400 or errno != 0)", ["endpoint"])
+HASH_BYTES = REGISTRY.counter(
+    "baidu_backup_hashed_bytes_total", "Bytes hashed (MD5) before upload")
+HASH_SECONDS = REGISTRY.counter(
+    "baidu_backup_hash_seconds_total", "Time spent hashing (throughput = bytes / seconds)")
+CYCLE_STAGE_SECONDS = REGISTRY.histogram(
+    "baidu_backup_cycle_stage_seconds", "Sync cycle duration per stage", ["stage"],
+    STAGE_BUCKETS)
+NOTIFY_SECONDS = REGISTRY.histogram(
+    "baidu_backup_notification_seconds", "Notification send latency per channel", ["channel"],
+    LATENCY_BUCKETS)
+NOTIFY_FAILURES = REGISTRY.counter(
+    "baidu_backup_notification_failures_total", "Failed notification sends per channel",
+    ["channel"])
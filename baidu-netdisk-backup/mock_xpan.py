@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""Local mock of the Baidu xpan endpoints used by ``client.BaiduClient``.
+
+Implements OAuth token refresh, quota, precreate / superfile2 / create
+(sliced upload, rapid upload and mkdir), single-request ``pcs/file``
+upload, paginated ``list`` with ``has_more``, ``filemanager`` move / copy /
+delete (sync or async with ``taskquery``; like Baidu, a second async task
+while one is still running is rejected with errno 111).  Storage is in memory and per
+account (one account per refresh_token, each with its own quota); only file
+metadata and block MD5s are kept, so multi-GB uploads cost no memory.
+
+Optional simulated network: *latency* seconds are added to every request
+and request bodies are read at most at *bandwidth* bytes/s, shared by all
+connections (one uplink).
+
+Run from this directory and point the add-on at it::
+
+    python3 mock_xpan.py --port 8210 --latency 0.05 --bandwidth 20M
+    BAIDU_OAUTH_BASE=http://127.0.0.1:8210 BAIDU_PAN_BASE=http://127.0.0.1:8210 \\
+        BAIDU_PCS_BASE=http://127.0.0.1:8210 python3 main.py
+
+or in-process (benchmarks)::
+
+    with MockXpanServer(latency=0.02) as srv:
+        client.set_api_base(srv.url)
+
+Not shipped in the add-on image.
+"""
+import argparse
+import hashlib
+import json
+import posixpath
+import secrets
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_QUOTA: int = 2 * 1024 ** 4      # 每个账号 2 TB
+TOKEN_EXPIRES_IN: int = 2592000         # 与百度一致：30 天
+READ_PIECE: int = 64 * 1024             # 限速时每次读取的字节数
+_SIZE_UNITS: Dict[str, int] = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+# xpan errnos returned by the mock
+ERRNO_AUTH: int = -6            # access_token 无效
+ERRNO_EXISTS: int = -8          # 文件或目录已存在
+ERRNO_NOT_FOUND: int = -9       # 文件或目录不存在
+ERRNO_QUOTA: int = -10          # 云端容量已满
+ERRNO_PARAM: int = 2            # 参数错误
+ERRNO_BATCH: int = 12           # 批量操作部分失败
+ERRNO_TASK_RUNNING: int = 111   # 已有异步任务在执行
+ERRNO_BLOCK_MISS: int = 31363   # 分片缺失
+
+
+def parse_size(text: str) -> int:
+    """``"20M"`` / ``"1.5G"`` / ``"4096"`` → bytes."""
+    text = str(text).strip().upper().rstrip("B").rstrip("I")
+    unit = text[-1:] if text[-1:] in _SIZE_UNITS else ""
+    return int(float(text[: len(text) - len(unit)] or 0) * _SIZE_UNITS[unit])
+
+
+# ============================================================================
+# Per-account storage
+# ============================================================================
+class MockAccount:
+    """Files, directories, pending sliced uploads and async tasks of one account."""
+
+    def __init__(self, name: str, quota: int) -> None:
+        self.name: str = name
+        self.quota: int = quota
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {}
+        self._next_fs_id: int = 1
+        self._ensure_dir("/")
+
+    # ------------------------------------------------------------------
+    @property
+    def used(self) -> int:
+        return sum(e["size"] for e in self.entries.values() if not e["isdir"])
+
+    def _entry(self, path: str, size: int, isdir: bool, md5: str = "") -> Dict[str, Any]:
+        now = int(time.time())
+        entry = {
+            "fs_id": self._next_fs_id,
+            "path": path,
+            "server_filename": posixpath.basename(path) or "/",
+            "size": size,
+            "isdir": int(isdir),
+            "md5": md5,
+            "category": 6,
+            "server_ctime": now,
+            "server_mtime": now,
+            "local_ctime": now,
+            "local_mtime": now,
+        }
+        self._next_fs_id += 1
+        return entry
+
+    def _ensure_dir(self, path: str) -> None:
+        if path in self.entries:
+            return
+        parent = posixpath.dirname(path)
+        if parent != path:
+            self._ensure_dir(parent)
+        self.entries[path] = self._entry(path, 0, True)
+
+    def mkdir(self, path: str) -> Tuple[int, Dict[str, Any]]:
+        if path in self.entries:
+            return ERRNO_EXISTS, {}
+        self._ensure_dir(path)
+        return 0, self.entries[path]
+
+    def put_file(
+        self, path: str, size: int, md5: str, blocks: List[str], overwrite: bool = True
+    ) -> Tuple[int, Dict[str, Any]]:
+        old = self.entries.get(path)
+        if old is not None and (old["isdir"] or not overwrite):
+            return ERRNO_EXISTS, {}
+        if self.used - (old["size"] if old else 0) + size > self.quota:
+            return ERRNO_QUOTA, {}
+        self._ensure_dir(posixpath.dirname(path))
+        entry = self._entry(path, size, False, md5)
+        entry["block_list"] = blocks
+        self.entries[path] = entry
+        return 0, entry
+
+    def find_blocks(self, size: int, blocks: List[str]) -> Optional[Dict[str, Any]]:
+        """An existing file with the same content (for rapid upload)."""
+        for e in self.entries.values():
+            if not e["isdir"] and e["size"] == size and e.get("block_list") == blocks:
+                return e
+        return None
+
+    def children(self, path: str) -> List[Dict[str, Any]]:
+        prefix = path.rstrip("/") + "/"
+        return sorted(
+            (e for p, e in self.entries.items()
+             if p != "/" and p.startswith(prefix) and "/" not in p[len(prefix):]),
+            key=lambda e: (-e["isdir"], e["server_filename"]),
+        )
+
+    def _subtree(self, path: str) -> List[str]:
+        prefix = path.rstrip("/") + "/"
+        return [p for p in self.entries if p == path or p.startswith(prefix)]
+
+    def remove(self, path: str) -> int:
+        if path not in self.entries or path == "/":
+            return ERRNO_NOT_FOUND
+        for p in self._subtree(path):
+            del self.entries[p]
+        return 0
+
+    def transfer(self, src: str, dest_dir: str, newname: str, ondup: str, keep: bool) -> int:
+        """Move (``keep=False``) or copy *src* into *dest_dir* / *newname*."""
+        if src not in self.entries or src == "/":
+            return ERRNO_NOT_FOUND
+        dst = posixpath.join(dest_dir, newname or posixpath.basename(src))
+        if dst == src:
+            return 0
+        if dst in self.entries:
+            if ondup != "overwrite":
+                return ERRNO_EXISTS
+            self.remove(dst)
+        self._ensure_dir(dest_dir)
+        for p in sorted(self._subtree(src)):
+            new_path = dst + p[len(src):]
+            entry = dict(self.entries[p] if keep else self.entries.pop(p))
+            entry["path"] = new_path
+            entry["server_filename"] = posixpath.basename(new_path)
+            if keep:
+                entry["fs_id"] = self._next_fs_id
+                self._next_fs_id += 1
+            self.entries[new_path] = entry
+        return 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "quota": self.quota,
+            "used": self.used,
+            "files": sum(1 for e in self.entries.values() if not e["isdir"]),
+            "dirs": sum(1 for e in self.entries.values() if e["isdir"]) - 1,
+            "pending_uploads": len(self.uploads),
+            "calls": dict(self.calls),
+        }
+
+
+# ============================================================================
+# HTTP server
+# ============================================================================
+class MockXpanServer:
+    """Threaded mock server; ``start()`` / ``stop()`` or use as a context manager."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        bandwidth: float = 0.0,
+        quota: int = DEFAULT_QUOTA,
+        task_delay: float = 0.0,
+    ) -> None:
+        self.latency: float = latency          # 每个请求额外的往返延迟（秒）
+        self.bandwidth: float = bandwidth      # 上行带宽（字节/秒），0 表示不限速
+        self.quota: int = quota
+        self.task_delay: float = task_delay    # 异步 filemanager 任务的完成耗时（秒）
+        self.accounts: Dict[str, MockAccount] = {}
+        self._tokens: Dict[str, MockAccount] = {}
+        self.lock = threading.RLock()
+        self._link_lock = threading.Lock()
+        self._link_free_at: float = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self  # type: ignore[attr-defined]
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockXpanServer":
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="mock-xpan", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockXpanServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # ------------------------------------------------------------------
+    def account(self, name: str) -> MockAccount:
+        with self.lock:
+            acct = self.accounts.get(name)
+            if acct is None:
+                acct = self.accounts[name] = MockAccount(name, self.quota)
+            return acct
+
+    def issue_token(self, refresh_token: str) -> Dict[str, Any]:
+        access = "mock." + secrets.token_hex(16)
+        with self.lock:
+            self._tokens[access] = self.account(refresh_token)
+        return {
+            "access_token": access,
+            "refresh_token": refresh_token,
+            "expires_in": TOKEN_EXPIRES_IN,
+            "scope": "basic netdisk",
+        }
+
+    def by_token(self, access_token: str) -> Optional[MockAccount]:
+        with self.lock:
+            return self._tokens.get(access_token)
+
+    def throttle(self, nbytes: int) -> None:
+        """Block until *nbytes* have "crossed" the shared simulated uplink."""
+        if self.bandwidth <= 0 or nbytes <= 0:
+            return
+        with self._link_lock:
+            start = max(time.monotonic(), self._link_free_at)
+            self._link_free_at = start + nbytes / self.bandwidth
+            until = self._link_free_at
+        delay = until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _multipart_file(body: bytes, content_type: str) -> memoryview:
+    """Payload of the first (only) part of a multipart/form-data body."""
+    boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip('"').encode()
+    start = body.index(b"\r\n\r\n") + 4
+    end = body.rindex(b"\r\n--" + boundary)
+    return memoryview(body)[start:end]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock(self) -> MockXpanServer:
+        return self.server.mock  # type: ignore[attr-defined]
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, code: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        remaining = int(self.headers.get("Content-Length") or 0)
+        if self.mock.bandwidth <= 0:
+            return self.rfile.read(remaining)
+        pieces: List[bytes] = []
+        while remaining > 0:
+            piece = self.rfile.read(min(READ_PIECE, remaining))
+            if not piece:
+                break
+            self.mock.throttle(len(piece))
+            pieces.append(piece)
+            remaining -= len(piece)
+        return b"".join(pieces)
+
+    def _handle(self) -> None:
+        body = self._read_body()
+        if self.mock.latency > 0:
+            time.sleep(self.mock.latency)
+        route, _, query = self.path.partition("?")
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(query).items()}
+        ctype = self.headers.get("Content-Type", "")
+        form: Dict[str, str] = {}
+        if ctype.startswith("application/x-www-form-urlencoded"):
+            form = {k: v[-1] for k, v in urllib.parse.parse_qs(body.decode("utf-8")).items()}
+
+        if route == "/oauth/2.0/token":
+            args = {**params, **form}
+            if args.get("grant_type") != "refresh_token" or not args.get("refresh_token"):
+                self._send_json(400, {"error": "invalid_request",
+                                      "error_description": "refresh_token missing"})
+                return
+            self._send_json(200, self.mock.issue_token(args["refresh_token"]))
+            return
+
+        acct = self.mock.by_token(params.get("access_token", ""))
+        if acct is None:
+            self._send_json(200 if route.startswith("/rest/2.0/xpan") else 401,
+                            {"errno": ERRNO_AUTH, "error_code": 111,
+                             "error_msg": "Access token invalid or no longer valid"})
+            return
+        method = params.get("method", "")
+        key = {"/rest/2.0/pcs/superfile2": "superfile2", "/rest/2.0/pcs/file": "upload",
+               "/rest/2.0/xpan/file": method}.get(route) or route.rsplit("/", 1)[-1]
+        with self.mock.lock:
+            acct.calls[key] = acct.calls.get(key, 0) + 1
+            if route == "/api/quota":
+                used = acct.used
+                payload: Dict[str, Any] = {"errno": 0, "total": acct.quota, "used": used,
+                                           "free": acct.quota - used, "expire": False}
+            elif route == "/rest/2.0/xpan/file":
+                payload = self._xpan(acct, method, params, form)
+            elif route == "/share/taskquery":
+                payload = self._taskquery(acct, params.get("taskid", ""))
+            elif route == "/rest/2.0/pcs/superfile2" and method == "upload":
+                payload = self._superfile2(acct, params, _multipart_file(body, ctype))
+            elif route == "/rest/2.0/pcs/file" and method == "upload":
+                payload = self._small_upload(acct, params, _multipart_file(body, ctype))
+            else:
+                self._send_json(404, {"errno": ERRNO_PARAM, "error_msg": f"unknown {key}"})
+                return
+        code = int(payload.pop("_status", 200))
+        self._send_json(code, payload)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    # ------------------------------------------------------------------
+    def _xpan(
+        self, acct: MockAccount, method: str, params: Dict[str, str], form: Dict[str, str]
+    ) -> Dict[str, Any]:
+        if method == "list":
+            path = params.get("dir", "/")
+            if not acct.entries.get(path, {}).get("isdir"):
+                return {"errno": ERRNO_NOT_FOUND, "list": []}
+            start = max(0, int(params.get("start", 0)))
+            limit = max(1, min(int(params.get("limit", 1000)), 1000))
+            items = acct.children(path)
+            page = [{k: v for k, v in e.items() if k != "block_list"}
+                    for e in items[start:start + limit]]
+            return {"errno": 0, "list": page, "has_more": start + limit < len(items)}
+
+        if method == "precreate":
+            blocks = json.loads(form.get("block_list") or "[]")
+            size = int(form.get("size", 0))
+            if form.get("isdir") == "1":
+                return {"errno": 0, "return_type": 1, "path": form.get("path")}
+            if not blocks:
+                return {"errno": ERRNO_PARAM}
+            same = acct.find_blocks(size, blocks)
+            if same is not None:
+                errno, entry = acct.put_file(form["path"], size, same["md5"], blocks)
+                if errno:
+                    return {"errno": errno}
+                return {"errno": 0, "return_type": 2, "info": entry}
+            if acct.used + size > acct.quota:
+                return {"errno": ERRNO_QUOTA}
+            uploadid = "N1-" + secrets.token_hex(12)
+            acct.uploads[uploadid] = {"path": form["path"], "size": size,
+                                      "block_list": blocks, "parts": {}}
+            return {"errno": 0, "return_type": 1, "uploadid": uploadid,
+                    "block_list": list(range(len(blocks))), "path": form["path"]}
+
+        if method == "create":
+            path = form.get("path", "")
+            if form.get("isdir") == "1":
+                errno, entry = acct.mkdir(path)
+                return {"errno": errno, **entry}
+            upload = acct.uploads.get(form.get("uploadid", ""))
+            blocks = json.loads(form.get("block_list") or "[]")
+            if upload is None or upload["path"] != path:
+                return {"errno": ERRNO_PARAM}
+            parts = upload["parts"]
+            if any(parts.get(i) != md5 for i, md5 in enumerate(blocks)):
+                return {"errno": ERRNO_BLOCK_MISS}
+            md5 = hashlib.md5(json.dumps(blocks).encode()).hexdigest()
+            errno, entry = acct.put_file(path, int(form.get("size", 0)), md5, blocks,
+                                         overwrite=form.get("rtype") == "3")
+            if errno:
+                return {"errno": errno}
+            del acct.uploads[form["uploadid"]]
+            return {"errno": 0, **{k: v for k, v in entry.items() if k != "block_list"},
+                    "ctime": entry["server_ctime"], "mtime": entry["server_mtime"]}
+
+        if method == "filemanager":
+            return self._filemanager(acct, params.get("opera", ""), form)
+        return {"errno": ERRNO_PARAM}
+
+    def _filemanager(self, acct: MockAccount, opera: str, form: Dict[str, str]) -> Dict[str, Any]:
+        try:
+            items = json.loads(form.get("filelist") or "[]")
+        except ValueError:
+            return {"errno": ERRNO_PARAM}
+        is_async = form.get("async", "0") != "0"
+        now = time.monotonic()
+        if is_async and any(t["done_at"] > now for t in acct.tasks.values()):
+            return {"errno": ERRNO_TASK_RUNNING}
+        info: List[Dict[str, Any]] = []
+        for item in items:
+            if opera == "delete":
+                path = item if isinstance(item, str) else item.get("path", "")
+                errno = acct.remove(path)
+            elif opera in ("move", "copy"):
+                path = item.get("path", "")
+                errno = acct.transfer(path, item.get("dest", "/"), item.get("newname", ""),
+                                      item.get("ondup", "fail"), keep=opera == "copy")
+            elif opera == "rename":
+                path = item.get("path", "")
+                errno = acct.transfer(path, posixpath.dirname(path), item.get("newname", ""),
+                                      item.get("ondup", "fail"), keep=False)
+            else:
+                return {"errno": ERRNO_PARAM}
+            info.append({"errno": errno, "path": path})
+        failed = any(i["errno"] for i in info)
+        if is_async:
+            taskid = str(int(time.time() * 1000)) + secrets.token_hex(4)
+            acct.tasks[taskid] = {"done_at": time.monotonic() + self.mock.task_delay,
+                                  "failed": failed, "info": info}
+            return {"errno": 0, "taskid": taskid, "info": []}
+        return {"errno": ERRNO_BATCH if failed else 0, "info": info}
+
+    def _taskquery(self, acct: MockAccount, taskid: str) -> Dict[str, Any]:
+        task = acct.tasks.get(taskid)
+        if task is None:
+            return {"errno": ERRNO_PARAM, "status": "failed"}
+        if time.monotonic() < task["done_at"]:
+            return {"errno": 0, "status": "running"}
+        return {"errno": 0, "status": "failed" if task["failed"] else "success",
+                "list": task["info"]}
+
+    def _superfile2(self, acct: MockAccount, params: Dict[str, str], data: memoryview) -> Dict[str, Any]:
+        upload = acct.uploads.get(params.get("uploadid", ""))
+        if upload is None:
+            return {"_status": 404, "error_code": 31363, "error_msg": "upload id not found"}
+        md5 = hashlib.md5(data).hexdigest()
+        upload["parts"][int(params.get("partseq", 0))] = md5
+        return {"md5": md5, "request_id": secrets.randbits(63)}
+
+    def _small_upload(self, acct: MockAccount, params: Dict[str, str], data: memoryview) -> Dict[str, Any]:
+        md5 = hashlib.md5(data).hexdigest()
+        errno, entry = acct.put_file(params.get("path", ""), len(data), md5, [md5],
+                                     overwrite=params.get("ondup") == "overwrite")
+        if errno:
+            return {"_status": 400, "error_code": 31061 if errno == ERRNO_EXISTS else 31112,
+                    "error_msg": "file already exists" if errno == ERRNO_EXISTS else "quota"}
+        return {"fs_id": entry["fs_id"], "md5": md5, "size": entry["size"],
+                "path": entry["path"], "ctime": entry["server_ctime"],
+                "mtime": entry["server_mtime"], "isdir": 0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8210)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added per request")
+    parser.add_argument("--bandwidth", default="0", help="uplink bytes/s, e.g. 20M (0 = unlimited)")
+    parser.add_argument("--quota", default="2T", help="per-account quota, e.g. 100G")
+    parser.add_argument("--task-delay", type=float, default=0.0,
+                        help="seconds before async filemanager tasks report success")
+    args = parser.parse_args()
+
+    srv = MockXpanServer(args.host, args.port, args.latency, parse_size(args.bandwidth),
+                         parse_size(args.quota), args.task_delay)
+    print(f"Mock xpan server listening on {srv.url}", flush=True)
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for acct in srv.accounts.values():
+            print(json.dumps(acct.snapshot(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,30 +11,47 @@
 特性：
     - per-channel 异常隔离（一个渠道崩溃不影响其他渠道）
     - 全局 / 事件级开关
-    - 重试机制（3 次，间隔 2 秒）
+    - 单次请求不重试；失败的消息留在发件箱中按指数退避重新投递
+      （outbox.BACKOFF_BASE 起步、上限 BACKOFF_MAX，最多 MAX_ATTEMPTS 次，
+      超过 MAX_AGE 仍未送达则丢弃）
     - 超时 15 秒
+    - 连接复用：每个 Webhook 渠道一个 requests.Session（keep-alive），
+      邮箱复用已登录的 SMTP 连接（失效时自动重连）
+    - 后台投递：notify_event 只负责写入 /data 中的持久化发件箱并立即返回；
+      每个渠道一个后台线程按平台频率限制（令牌桶）发送，失败后退避重试，
+      重启后继续投递；重复/过时的消息会合并，结果写入日志并供 Web UI 查询
+    - 汇总模式（notifications.digest）：一个同步周期内的事件先缓存，周期结束时
+      每个渠道只发送一条合并消息；CRITICAL_EVENTS 中的事件仍立即发送
 """
 import base64
 import hashlib
 import hmac
+import itertools
 import json
 import smtplib
+import threading
 import time
 import urllib.parse
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 from email.mime.text import MIMEText
-from typing import Any, Callable, Dict, Optional, Union
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
 
 import requests
 
+from logs import log as _log
+from metrics import NOTIFY_FAILURES, NOTIFY_SECONDS
+from outbox import RATE_LIMITS, NotificationOutbox, TokenBucket, open_outbox
+from tracing import span, traced
 
 # ============================================================================
 # 常量
 # ============================================================================
-MAX_RETRIES: int = 3                # 最大重试次数
-RETRY_DELAY: float = 2.0            # 重试间隔（秒）
 TIMEOUT: int = 15                   # HTTP 请求超时（秒）
 TIME_FORMAT: str = "%Y-%m-%d %H:%M:%S"
+RECENT_DELIVERIES: int = 50         # Web UI 可查询的最近投递记录数
+SMTP_IDLE_TIMEOUT: float = 120.0    # SMTP 连接空闲超过此时间后重新建立（服务器多在数分钟后断开）
 
 # 通知渠道列表（供外部引用）
 AVAILABLE_CHANNELS: list = ["email", "wechat", "dingtalk", "feishu"]
@@ -48,65 +65,125 @@ EVENT_TYPES: list = [
     "storage_warning",
 ]
 
+# 汇总模式下不进入缓存、立即发送的事件
+CRITICAL_EVENTS: frozenset = frozenset({"backup_failure"})
+
 
 # ============================================================================
-# 日志
+# 连接复用
 # ============================================================================
-def _log(msg: str) -> None:
-    """输出带时间戳的日志消息。"""
-    print(f"[{datetime.now().strftime(TIME_FORMAT)}] {msg}", flush=True)
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _session(channel: str) -> requests.Session:
+    """Pooled (keep-alive) HTTP session for *channel*, created on first use."""
+    sess = _sessions.get(channel)
+    if sess is None:
+        with _sessions_lock:
+            sess = _sessions.get(channel)
+            if sess is None:
+                sess = _sessions[channel] = requests.Session()
+    return sess
+
+
+class _SmtpConnection:
+    """One logged-in SMTP connection reused across emails.
+
+    The connection is keyed by server + credentials, so a config change logs
+    in again.  A send on a reused connection that fails (server dropped it,
+    idle timeout...) transparently reconnects once before reporting an error.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._server: Optional[smtplib.SMTP] = None
+        self._key: Optional[tuple] = None
+        self._last_used: float = 0.0
+
+    def _close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+        self._server = None
+        self._key = None
+
+    def send(
+        self,
+        key: tuple,
+        connect: Callable[[], smtplib.SMTP],
+        from_addr: str,
+        to_addrs: List[str],
+        message: str,
+    ) -> None:
+        with self._lock:
+            if self._server is not None and (
+                self._key != key or time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT
+            ):
+                self._close()
+            if self._server is not None:
+                try:
+                    self._server.sendmail(from_addr, to_addrs, message)
+                    self._last_used = time.monotonic()
+                    return
+                except Exception as e:
+                    _log(f"复用的 SMTP 连接不可用，重新连接：{e}")
+                    self._close()
+            server = connect()
+            try:
+                server.sendmail(from_addr, to_addrs, message)
+            except Exception:
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+                raise
+            self._server, self._key = server, key
+            self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+_smtp = _SmtpConnection()
 
 
 # ============================================================================
 # 工具函数
 # ============================================================================
-def _retry_request(
-    method: str,
+def _post_json(
     url: str,
     payload: Dict[str, Any],
     headers: Optional[Dict[str, str]] = None,
-    retries: int = MAX_RETRIES,
-    delay: float = RETRY_DELAY,
     timeout: int = TIMEOUT,
+    session: Optional[requests.Session] = None,
 ) -> requests.Response:
-    """带重试的 HTTP 请求，返回最后一次响应对象。
+    """发送一次 JSON POST 请求（不在此重试）。
+
+    失败的消息由发件箱按退避策略重新投递，每次尝试都经过渠道限速，
+    因此这里只发一次，网络异常时返回 status_code=0 的错误响应。
 
     Args:
-        method: HTTP 方法（"POST" / "GET"）
         url: 请求地址
         payload: JSON 请求体
         headers: 请求头
-        retries: 最大重试次数
-        delay: 重试间隔（秒）
         timeout: 超时时间（秒）
+        session: 复用连接的会话（见 _session()；为空时新建连接）
 
     Returns:
         requests.Response 对象（可能为失败响应）
     """
-    last_resp: Optional[requests.Response] = None
-    for attempt in range(1, retries + 1):
-        try:
-            if method.upper() == "POST":
-                resp = requests.post(
-                    url, json=payload, headers=headers or {}, timeout=timeout
-                )
-            else:
-                resp = requests.get(
-                    url, json=payload, headers=headers or {}, timeout=timeout
-                )
-            if resp.status_code < 500:
-                return resp
-            last_resp = resp
-        except requests.RequestException as e:
-            _log(f"请求异常（第 {attempt}/{retries} 次）：{e}")
-        if attempt < retries:
-            time.sleep(delay)
-    if last_resp is not None:
-        return last_resp
-    # 全部网络异常，返回一个假的 error response
+    http = session or requests
+    try:
+        return http.post(url, json=payload, headers=headers or {}, timeout=timeout)
+    except requests.RequestException as e:
+        _log(f"请求异常：{e}")
     resp = requests.Response()
     resp.status_code = 0
-    resp._content = b'{"errcode": -1, "errmsg": "network error after retries"}'
+    resp._content = b'{"errcode": -1, "errmsg": "network error"}'
     return resp
 
 
@@ -160,30 +237,27 @@ def _send_email(config: Dict[str, Any], title: str, content: str) -> bool:
     msg["From"] = username
     msg["To"] = ", ".join(to_emails)
 
-    for attempt in range(1, MAX_RETRIES + 1):
-        server = None
+    def _connect() -> smtplib.SMTP:
+        if use_ssl:
+            server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=TIMEOUT)
+        else:
+            server = smtplib.SMTP(smtp_host, smtp_port, timeout=TIMEOUT)
+            server.starttls()
         try:
-            if use_ssl:
-                server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=TIMEOUT)
-            else:
-                server = smtplib.SMTP(smtp_host, smtp_port, timeout=TIMEOUT)
-                server.starttls()
             server.login(username, password)
-            server.sendmail(username, to_emails, msg.as_string())
-            server.quit()
-            _log(f"邮件通知发送成功 → {', '.join(to_emails)}")
-            return True
-        except Exception as e:
-            _log(f"邮件发送失败（第 {attempt}/{MAX_RETRIES} 次）：{e}")
-            if server:
-                try:
-                    server.quit()
-                except Exception:
-                    pass
-            if attempt < MAX_RETRIES:
-                time.sleep(RETRY_DELAY)
-    _log(f"邮件通知最终失败")
-    return False
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    key = (smtp_host, smtp_port, use_ssl, username, hashlib.sha256(password.encode()).hexdigest())
+    try:
+        _smtp.send(key, _connect, username, to_emails, msg.as_string())
+    except Exception as e:
+        _log(f"邮件发送失败：{e}")
+        return False
+    _log(f"邮件通知发送成功 → {', '.join(to_emails)}")
+    return True
 
 
 # ============================================================================
@@ -226,7 +300,7 @@ def _send_wechat(config: Dict[str, Any], title: str, content: str) -> bool:
         "text": {"content": full_content},
     }
 
-    resp = _retry_request("POST", url, payload)
+    resp = _post_json(url, payload, session=_session("wechat"))
     try:
         data = resp.json()
         if data.get("errcode") == 0:
@@ -290,7 +364,7 @@ def _send_dingtalk(config: Dict[str, Any], title: str, content: str) -> bool:
         sep = "&" if "?" in url else "?"
         url = f"{url}{sep}timestamp={timestamp}&sign={sign}"
 
-    resp = _retry_request("POST", url, payload, headers=headers)
+    resp = _post_json(url, payload, headers=headers, session=_session("dingtalk"))
     try:
         data = resp.json()
         if data.get("errcode") == 0:
@@ -339,7 +413,7 @@ def _send_feishu(config: Dict[str, Any], title: str, content: str) -> bool:
         payload["timestamp"] = timestamp
         payload["sign"] = sign
 
-    resp = _retry_request("POST", webhook_url, payload)
+    resp = _post_json(webhook_url, payload, session=_session("feishu"))
     try:
         data = resp.json()
         # 飞书成功返回 code=0 或 StatusCode=0
@@ -458,7 +532,16 @@ def send_notification(
     if sender is None:
         _log(f"不支持的通知渠道：{channel}")
         return False
-    return sender(config, title, content)
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        with span(f"send:{channel}", cat="notify"):
+            ok = sender(config, title, content)
+        return ok
+    finally:
+        NOTIFY_SECONDS.labels(channel).observe(time.perf_counter() - t0)
+        if not ok:
+            NOTIFY_FAILURES.labels(channel).inc()
 
 
 def test_notification(channel: str, config: Dict[str, Any]) -> bool:
@@ -476,12 +559,16 @@ def test_notification(channel: str, config: Dict[str, Any]) -> bool:
     return send_notification(channel, config, test_title, test_content)
 
 
+@traced("notify_event", cat="notify")
 def notify_event(
     notifications: Dict[str, Any],
     event_type: str,
     event_data: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    """统一通知入口 — 遍历所有已启用的通知渠道，向每个渠道发送事件通知。
+    """统一通知入口 — 将事件排队，由后台线程并行发送到所有已启用的通知渠道。
+
+    立即返回，不等待发送结果（消息先写入持久化发件箱）；投递结果写入日志，并可通过
+    ``dispatcher.recent()``（Web UI ``/api/notifications``）查询。
 
     配置结构：
         notifications = {
@@ -507,58 +594,289 @@ def notify_event(
         event_data: 事件数据
 
     Returns:
-        {"sent": int, "failed": int, "skipped": int, "results": dict}
+        {"queued": int, "skipped": int, "id": int | None}   # id 见 dispatcher.recent()
+        汇总模式下被缓存的事件返回 {"queued": 0, "skipped": 0, "id": None, "digest": True}
     """
     if not isinstance(notifications, dict):
         _log("通知配置缺失，跳过通知发送")
-        return {"sent": 0, "failed": 0, "skipped": 0, "results": {}}
+        return {"queued": 0, "skipped": 0, "id": None}
     notif = notifications
 
     # 全局开关
     if not notif.get("enabled", True):
         _log("全局通知已禁用，跳过通知发送")
-        return {"sent": 0, "failed": 0, "skipped": 0, "results": {}}
+        return {"queued": 0, "skipped": 0, "id": None}
 
     # 事件级开关
     events_cfg = notif.get("events", {})
     if isinstance(events_cfg, dict) and not events_cfg.get(event_type, True):
         _log(f"事件类型 {event_type} 的通知已禁用，跳过")
-        return {"sent": 0, "failed": 0, "skipped": 0, "results": {}}
+        return {"queued": 0, "skipped": 0, "id": None}
 
     # 格式化消息
     msg = _format_event_message(event_type, event_data)
     title = msg["title"]
     content = msg["content"]
 
-    # 遍历渠道
+    # 汇总模式：缓存到周期结束（关键事件除外）
+    if event_type not in CRITICAL_EVENTS:
+        with _digest_lock:
+            if _digest is not None:
+                _digest.append((event_type, msg))
+                return {"queued": 0, "skipped": 0, "id": None, "digest": True}
+
+    return _dispatch(notif, event_type, title, content)
+
+
+def _dispatch(notif: Dict[str, Any], event_type: str, title: str, content: str) -> Dict[str, Any]:
+    """把一条消息排队发送到所有已启用渠道。"""
     channels_cfg = notif.get("channels", {})
     if not isinstance(channels_cfg, dict):
-        return {"sent": 0, "failed": 0, "skipped": 0, "results": {}}
+        return {"queued": 0, "skipped": 0, "id": None}
 
-    sent = 0
-    failed = 0
+    targets: Dict[str, Dict[str, Any]] = {}
     skipped = 0
-    results: Dict[str, str] = {}
-
     for channel_name, chan_cfg in channels_cfg.items():
         if not isinstance(chan_cfg, dict):
             continue
         if not chan_cfg.get("enabled", False):
             skipped += 1
             continue
+        targets[channel_name] = chan_cfg
+    if not targets:
+        return {"queued": 0, "skipped": skipped, "id": None}
+
+    delivery_id = dispatcher.submit(event_type, title, content, targets)
+    _log(f"{event_type} 通知已排队 → {', '.join(targets)}")
+    return {"queued": len(targets), "skipped": skipped, "id": delivery_id}
+
+
+# ============================================================================
+# 汇总模式
+# ============================================================================
+_digest: Optional[List[Tuple[str, Dict[str, str]]]] = None   # 周期内缓存的 (事件, 消息)
+_digest_lock = threading.Lock()
+
 
-        _log(f"发送 {event_type} 通知 → {channel_name} 渠道")
+@contextmanager
+def notification_digest(notifications: Dict[str, Any]) -> Iterator[None]:
+    """Buffer ``notify_event`` calls made in the ``with`` block (one sync cycle).
+
+    Only active when ``notifications.digest`` is enabled.  On exit the
+    buffered events are merged into a single message per channel; events in
+    ``CRITICAL_EVENTS`` are never buffered.
+    """
+    global _digest
+    if not (isinstance(notifications, dict) and notifications.get("digest")):
+        yield
+        return
+    with _digest_lock:
+        _digest = []
+    try:
+        yield
+    finally:
+        with _digest_lock:
+            buffered, _digest = _digest or [], None
+        if buffered:
+            msg = _format_digest(buffered)
+            _dispatch(notifications, "digest", msg["title"], msg["content"])
+
+
+def _format_digest(buffered: List[Tuple[str, Dict[str, str]]]) -> Dict[str, str]:
+    """合并周期内的事件：同类事件归为一节，各节省略重复的时间行。"""
+    if len(buffered) == 1:
+        return buffered[0][1]
+    groups: Dict[str, List[Dict[str, str]]] = {}
+    for event_type, msg in buffered:
+        groups.setdefault(event_type, []).append(msg)
+
+    sections: List[str] = []
+    for msgs in groups.values():
+        header = msgs[0]["title"] + (f"（{len(msgs)} 条）" if len(msgs) > 1 else "")
+        bodies = [
+            "\n".join(
+                line for line in m["content"].splitlines() if not line.startswith("时间：")
+            )
+            for m in msgs
+        ]
+        sections.append(f"【{header}】\n" + "\n---\n".join(bodies))
+
+    title = f"📬 HA 备份周期汇总（{len(buffered)} 条通知）"
+    content = f"时间：{datetime.now().strftime(TIME_FORMAT)}\n\n" + "\n\n".join(sections)
+    return {"title": title, "content": content}
+
+
+# ============================================================================
+# 后台投递
+# ============================================================================
+class NotificationDispatcher:
+    """Delivers notifications from the durable outbox, one worker per channel.
+
+    ``submit()`` stores one message per target channel in the outbox and
+    returns at once.  Each channel's worker thread sends its due messages in
+    order, paced by the channel's token bucket (``outbox.RATE_LIMITS``);
+    failed sends are retried with backoff in later cycles and after restarts.
+    A slow or unreachable channel never holds up the others.
+
+    Each attempt is a single request (senders do not retry internally), so
+    every HTTP / SMTP attempt takes one bucket token and is bounded by
+    ``TIMEOUT``; the outbox's backoff is the only retry path.  No caller
+    waits on a delivery, so there is no per-dispatch deadline — use
+    ``flush(timeout)`` to wait for the backlog.
+    """
+
+    def __init__(self) -> None:
+        self._outbox: Optional[NotificationOutbox] = None
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wakeups: Dict[str, threading.Event] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._inflight: int = 0
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_DELIVERIES)
+        self._ids = itertools.count(int(time.time()))
+
+    def _box(self) -> NotificationOutbox:
+        with self._lock:
+            if self._outbox is None:
+                self._outbox = open_outbox()
+                dropped = self._outbox.drop_stale()
+                if dropped:
+                    _log(f"丢弃 {dropped} 条过期的待发送通知")
+            return self._outbox
+
+    def configure(self, notifications: Dict[str, Any]) -> None:
+        """Use the current channel configs and resume delivery of stored messages.
+
+        Call at startup and after every config reload; messages for channels
+        that are no longer enabled are dropped when they come up.
+        """
+        channels = (notifications or {}).get("channels") or {}
+        with self._lock:
+            self._configs = {k: v for k, v in channels.items() if isinstance(v, dict)}
+        for channel in self._box().channels():
+            self._wake(channel)
+
+    def submit(
+        self, event_type: str, title: str, content: str, targets: Dict[str, Dict[str, Any]]
+    ) -> int:
+        """Store one event for *targets* (``{channel: config}``); returns its id."""
+        box = self._box()
+        delivery = {
+            "id": next(self._ids),
+            "event": event_type,
+            "title": title,
+            "queued_at": time.time(),
+            "results": {name: "pending" for name in targets},
+        }
+        with self._lock:
+            self._configs.update(targets)
+            self._recent.append(delivery)
+        for name in targets:
+            _, superseded = box.enqueue(name, event_type, title, content, delivery["id"])
+            if superseded is not None:
+                self._set_result(superseded, name, "collapsed")
+                _log(f"{name} 渠道已有相同的待发送通知，已合并（{event_type}）")
+            self._wake(name)
+        return delivery["id"]
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Recent deliveries (newest first) with per-channel results."""
+        with self._lock:
+            return [dict(d, results=dict(d["results"])) for d in reversed(self._recent)]
+
+    def pending(self) -> Dict[str, Dict[str, Any]]:
+        """Outbox backlog per channel (see ``NotificationOutbox.pending``)."""
+        return self._box().pending()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no message is due or being sent (True) or *timeout*."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.time()
+            with self._lock:
+                idle = self._inflight == 0
+            if idle and all(p["next_attempt"] > now for p in self.pending().values()):
+                return True
+            if end is not None and time.monotonic() >= end:
+                return False
+            time.sleep(0.05)
+
+    def _wake(self, channel: str) -> None:
+        with self._lock:
+            event = self._wakeups.get(channel)
+            if event is None:
+                event = self._wakeups[channel] = threading.Event()
+                self._buckets[channel] = TokenBucket(*RATE_LIMITS.get(channel, (3, 10 / 60)))
+                threading.Thread(
+                    target=self._run, args=(channel,), name=f"notify-{channel}", daemon=True
+                ).start()
+        event.set()
+
+    def _set_result(self, delivery_id: Optional[int], channel: str, result: str) -> None:
+        with self._lock:
+            for d in self._recent:
+                if d["id"] == delivery_id:
+                    d["results"][channel] = result
+
+    def _run(self, channel: str) -> None:
+        wakeup = self._wakeups[channel]
+        bucket = self._buckets[channel]
+        box = self._box()
+        while True:
+            wakeup.clear()
+            try:
+                msg, wait_s = box.next_due(channel)
+            except Exception as e:
+                _log(f"读取 {channel} 待发送通知失败：{e}")
+                msg, wait_s = None, 60.0
+            if msg is None:
+                wakeup.wait(wait_s)
+                continue
+            delay = bucket.wait_time()
+            if delay > 0:
+                time.sleep(delay)
+            bucket.take()
+            with self._lock:
+                cfg = self._configs.get(channel)
+                self._inflight += 1
+            try:
+                self._deliver(channel, cfg, msg, box)
+            except Exception as e:
+                _log(f"通知投递异常（{channel}）：{e}")
+            finally:
+                with self._lock:
+                    self._inflight -= 1
+
+    def _deliver(
+        self,
+        channel: str,
+        cfg: Optional[Dict[str, Any]],
+        msg: Dict[str, Any],
+        box: NotificationOutbox,
+    ) -> None:
+        if not cfg or not cfg.get("enabled", False):
+            box.delete(msg["id"])
+            self._set_result(msg["delivery_id"], channel, "dropped")
+            _log(f"{channel} 渠道已停用，丢弃待发送的 {msg['event']} 通知")
+            return
         try:
-            ok = send_notification(channel_name, chan_cfg, title, content)
-            if ok:
-                sent += 1
-                results[channel_name] = "success"
-            else:
-                failed += 1
-                results[channel_name] = "failed"
+            ok = send_notification(channel, cfg, msg["title"], msg["content"])
+            error = "" if ok else "failed"
         except Exception as e:
-            _log(f"渠道 {channel_name} 发送异常：{e}")
-            failed += 1
-            results[channel_name] = f"error: {e}"
-
-    return {"sent": sent, "failed": failed, "skipped": skipped, "results": results}
\ No newline at end of file
+            _log(f"渠道 {channel} 发送异常：{e}")
+            ok, error = False, f"error: {e}"
+        if ok:
+            box.delivered(msg)
+            self._set_result(msg["delivery_id"], channel, "success")
+            _log(f"{msg['event']} 通知已送达 {channel}")
+            return
+        retry_in = box.fail(msg, error)
+        if retry_in is None:
+            self._set_result(msg["delivery_id"], channel, "dropped")
+            _log(f"{msg['event']} 通知发送到 {channel} 多次失败，已放弃")
+        else:
+            self._set_result(msg["delivery_id"], channel, "retrying")
+            _log(f"{msg['event']} 通知发送到 {channel} 失败，{retry_in:.0f} 秒后重试")
+
+
+dispatcher = NotificationDispatcher()
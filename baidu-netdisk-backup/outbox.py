@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Durable notification outbox (SQLite in /data) and per-channel rate limits.
+
+Every queued notification is stored per channel until it is delivered, so a
+webhook that is down during a cycle is retried with exponential backoff in
+later cycles and after restarts.  Messages older than ``MAX_AGE`` or failing
+``MAX_ATTEMPTS`` times are dropped.
+
+Duplicates collapse on enqueue: a pure status event (manifest generated,
+storage warning) replaces the pending message of the same type for that
+channel — only the newest state is worth sending — and other events replace
+a pending message only when the content is identical.  Digests are never
+collapsed: each one carries events (failures, migrations...) of its own cycle.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from client import log
+
+OUTBOX_FILE: str = "/data/notify_outbox.db"
+MAX_ATTEMPTS: int = 10
+MAX_AGE: float = 24 * 3600          # 超过 24 小时仍未送达的消息直接丢弃
+BACKOFF_BASE: float = 30.0          # 第 n 次失败后等待 BACKOFF_BASE * 2^(n-1) 秒
+BACKOFF_MAX: float = 3600.0
+
+# 只保留最新一条的“状态类”事件
+COLLAPSE_BY_EVENT: frozenset = frozenset({"manifest_generated", "storage_warning"})
+# 从不合并的事件（每条内容都不同且都需要送达）
+NEVER_COLLAPSE: frozenset = frozenset({"digest"})
+
+# 各平台文档中的频率限制 → (桶容量, 每秒补充令牌数)
+#   企业微信群机器人：每个机器人 20 条/分钟
+#   钉钉自定义机器人：20 条/分钟（超限后限流 10 分钟）
+#   飞书自定义机器人：100 次/分钟，5 次/秒
+#   邮件：无统一限制，按 10 封/分钟保守处理
+# 容量 + 60 秒补充量不超过每分钟上限，任意 60 秒窗口内都不会超限
+RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "wechat": (5, 15 / 60),
+    "dingtalk": (5, 15 / 60),
+    "feishu": (3, 1.5),
+    "email": (3, 7 / 60),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel      TEXT NOT NULL,
+    event        TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    content      TEXT NOT NULL,
+    dedup_key    TEXT NOT NULL,
+    delivery_id  INTEGER,
+    created_at   REAL NOT NULL,
+    next_attempt REAL NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    collapsed    INTEGER NOT NULL DEFAULT 0,
+    last_error   TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (channel, next_attempt);
+CREATE INDEX IF NOT EXISTS outbox_dedup ON outbox (channel, dedup_key);
+"""
+
+
+class TokenBucket:
+    """Classic token bucket; ``wait_time()`` is 0 when a token is available."""
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        self.capacity: float = capacity
+        self.rate: float = rate
+        self._tokens: float = capacity
+        self._updated: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        with self._lock:
+            self._refill()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+
+
+def dedup_key(event: str, content: str) -> str:
+    """Collapse key: the event type, or a hash of the content (time lines ignored).
+
+    Events in ``NEVER_COLLAPSE`` get a unique key.
+    """
+    if event in COLLAPSE_BY_EVENT:
+        return event
+    if event in NEVER_COLLAPSE:
+        return f"{event}:{uuid.uuid4().hex}"
+    body = "\n".join(l for l in content.splitlines() if not l.startswith("时间："))
+    return event + ":" + hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+class NotificationOutbox:
+    """SQLite-backed per-channel message queue; safe to share between threads."""
+
+    def __init__(self, path: str = OUTBOX_FILE) -> None:
+        self.path: str = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def enqueue(
+        self, channel: str, event: str, title: str, content: str, delivery_id: Optional[int]
+    ) -> Tuple[int, Optional[int]]:
+        """Store a message; returns ``(row id, superseded delivery id)``.
+
+        The second item is the ``delivery_id`` of the pending message that was
+        collapsed into this one (None when a new row was inserted).
+        """
+        key = dedup_key(event, content)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, delivery_id FROM outbox WHERE channel = ? AND dedup_key = ?",
+                (channel, key),
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE outbox SET title = ?, content = ?, delivery_id = ?, "
+                    "collapsed = collapsed + 1 WHERE id = ?",
+                    (title, content, delivery_id, row["id"]),
+                )
+                self._db.commit()
+                return row["id"], row["delivery_id"]
+            cur = self._db.execute(
+                "INSERT INTO outbox (channel, event, title, content, dedup_key, delivery_id, "
+                "created_at, next_attempt) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (channel, event, title, content, key, delivery_id, now, now),
+            )
+            self._db.commit()
+            return cur.lastrowid, None
+
+    def next_due(self, channel: str) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """``(message due now, None)`` or ``(None, seconds until the next one)``."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM outbox WHERE channel = ? ORDER BY next_attempt, id LIMIT 1",
+                (channel,),
+            ).fetchone()
+        if row is None:
+            return None, None
+        wait = row["next_attempt"] - time.time()
+        if wait > 0:
+            return None, wait
+        return dict(row), None
+
+    def delete(self, msg_id: int) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (msg_id,))
+            self._db.commit()
+
+    def delivered(self, msg: Dict[str, Any]) -> None:
+        """Remove a sent message, unless a newer event was collapsed into it meanwhile."""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM outbox WHERE id = ? AND delivery_id IS ?",
+                (msg["id"], msg["delivery_id"]),
+            )
+            self._db.commit()
+
+    def fail(self, msg: Dict[str, Any], error: str) -> Optional[float]:
+        """Record a failed attempt; returns the retry delay, or None if dropped."""
+        attempts = msg["attempts"] + 1
+        if attempts >= MAX_ATTEMPTS or time.time() - msg["created_at"] > MAX_AGE:
+            self.delete(msg["id"])
+            return None
+        delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, error, msg["id"]),
+            )
+            self._db.commit()
+        return delay
+
+    def drop_stale(self) -> int:
+        """Delete messages older than ``MAX_AGE``; returns how many."""
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM outbox WHERE created_at < ?", (time.time() - MAX_AGE,)
+            )
+            self._db.commit()
+            return cur.rowcount
+
+    def channels(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT DISTINCT channel FROM outbox")]
+
+    def pending(self) -> Dict[str, Dict[str, Any]]:
+        """``{channel: {"count", "oldest", "next_attempt", "last_error"}}``."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT channel, COUNT(*) AS count, MIN(created_at) AS oldest, "
+                "MIN(next_attempt) AS next_attempt, MAX(last_error) AS last_error "
+                "FROM outbox GROUP BY channel"
+            ).fetchall()
+        return {r["channel"]: {k: r[k] for k in r.keys() if k != "channel"} for r in rows}
+
+
+def open_outbox(path: str = OUTBOX_FILE) -> NotificationOutbox:
+    """Open the outbox; falls back to an in-memory queue when /data is unusable."""
+    try:
+        return NotificationOutbox(path)
+    except (sqlite3.Error, OSError) as e:
+        log(f"Notification outbox unavailable, queued messages will not survive restarts: {e}")
+        return NotificationOutbox(":memory:")
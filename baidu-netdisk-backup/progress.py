@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""In-memory feed of structured upload progress events.
+
+The upload engine publishes events (file, stage, bytes done, throughput,
+ETA, retries) into a bounded ring buffer; the Web UI streams them to the
+browser via Server-Sent Events.  Publishing never blocks on readers: old
+events simply fall off the ring, and a reader that lagged behind resumes from
+the oldest event still buffered.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+RING_SIZE: int = 512
+
+# 上传阶段
+STAGE_HASHING: str = "hashing"
+STAGE_PRECREATE: str = "precreate"
+STAGE_UPLOADING: str = "uploading"
+STAGE_MERGING: str = "merging"
+STAGE_DONE: str = "done"
+STAGE_RAPID: str = "rapid"       # 秒传，无需上传数据
+STAGE_FAILED: str = "failed"
+
+
+class ProgressFeed:
+    """Bounded ring buffer of events with monotonically increasing ``seq``."""
+
+    def __init__(self, size: int = RING_SIZE) -> None:
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self._cond = threading.Condition()
+        self._seq: int = 0
+        self._latest: Optional[Dict[str, Any]] = None
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        with self._cond:
+            self._seq += 1
+            event = {"seq": self._seq, "time": time.time(), **event}
+            self._events.append(event)
+            self._latest = event
+            self._cond.notify_all()
+            return self._seq
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            return self._latest
+
+    def wait_since(self, seq: int, timeout: float) -> Tuple[List[Dict[str, Any]], int]:
+        """Events with ``seq`` > *seq*, waiting up to *timeout* for the first one.
+
+        Returns ``(events, last_seq)``; *events* is empty on timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > seq, timeout=timeout)
+            if self._seq <= seq:
+                return [], seq
+            events = [e for e in self._events if e["seq"] > seq]
+            return events, self._seq
+
+
+feed = ProgressFeed()
+
+
+class UploadProgress:
+    """Per-file helper that turns byte counts into feed events."""
+
+    def __init__(self, file: str, total: int) -> None:
+        self.file: str = file
+        self.total: int = total
+        self.done: int = 0
+        self.retries: int = 0
+        self._started: float = time.monotonic()
+
+    def stage(self, stage: str, **extra: Any) -> None:
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        speed = self.done / elapsed
+        remaining = self.total - self.done
+        feed.publish({
+            "file": self.file,
+            "stage": stage,
+            "bytes_done": self.done,
+            "bytes_total": self.total,
+            "percent": round(self.done * 100 / self.total, 1) if self.total else 100.0,
+            "speed": round(speed),                                  # bytes/s
+            "eta": round(remaining / speed, 1) if speed > 0 and remaining > 0 else None,
+            "retries": self.retries,
+            **extra,
+        })
+
+    def restart_clock(self) -> None:
+        """Measure throughput from now on (e.g. after hashing)."""
+        self._started = time.monotonic()
@@ -2,14 +2,15 @@
 """Backup retention policy — keep / prune logic for remote backup files."""
 import re
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional, Set, TYPE_CHECKING
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from client import BaiduClient  # noqa: F401  (used only as type hint)
 else:
     BaiduClient = object
 
-from client import log
+from client import BATCH_SIZE, log
+from tracing import span, traced
 
 # ============================================================================
 # Regex for Home Assistant backup naming convention
@@ -63,354 +64,431 @@ def _join_remote_dir(base_dir: str, name: str) -> str:
     return f"{base_dir}/{name}"
 
 
-def _paths_to_delete(
-    items: List[Dict[str, Any]], keep_set: Set[str]
-) -> List[str]:
-    """Return paths in *items* that are NOT in *keep_set*."""
-    out: List[str] = []
-    for item in items:
+# ============================================================================
+# Pre-parsed backup records
+# ============================================================================
+class BackupRecord:
+    """A remote ``.tar`` backup parsed once per listing.
+
+    Bucket keys are plain ints so tier passes only compare attributes:
+    ``hour`` = date ordinal * 24 + hour, ``day`` = date ordinal,
+    ``week`` = ISO year * 100 + ISO week, ``month`` = year * 100 + month,
+    ``year`` = year.  Undated items have ``ts`` and all keys set to None
+    (they are never kept by a bucket, only deleted).
+    """
+
+    __slots__ = (
+        "path", "name", "size", "ts",
+        "hour", "day", "week", "month", "year",
+        "fs_id", "md5",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        size: int,
+        dt: Optional[datetime],
+        fs_id: Optional[int] = None,
+        md5: Optional[str] = None,
+    ) -> None:
+        self.path: str = path
+        self.name: str = name
+        self.size: int = size
+        self.fs_id: Optional[int] = fs_id
+        self.md5: Optional[str] = md5
+        if dt is None:
+            self.ts: Optional[int] = None
+            self.hour: Optional[int] = None
+            self.day: Optional[int] = None
+            self.week: Optional[int] = None
+            self.month: Optional[int] = None
+            self.year: Optional[int] = None
+        else:
+            iso = dt.isocalendar()
+            self.ts = int(dt.timestamp())
+            self.day = dt.toordinal()
+            self.hour = self.day * 24 + dt.hour
+            self.week = iso[0] * 100 + iso[1]
+            self.month = dt.year * 100 + dt.month
+            self.year = dt.year
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> Optional["BackupRecord"]:
+        """Build a record from a remote list item; None for dirs / non-tar / pathless."""
         if item.get("isdir") == 1:
-            continue
+            return None
         name = item.get("server_filename") or ""
-        if not name.endswith(".tar"):
-            continue
         path = item.get("path")
-        if path and path not in keep_set:
-            out.append(path)
-    return out
+        if not name.endswith(".tar") or not path:
+            return None
+        try:
+            size = int(item.get("size") or 0)
+        except (TypeError, ValueError):
+            size = 0
+        return cls(
+            path,
+            name,
+            size,
+            _infer_backup_datetime(item),
+            fs_id=item.get("fs_id"),
+            md5=item.get("md5"),
+        )
+
+    @property
+    def dt(self) -> Optional[datetime]:
+        return datetime.fromtimestamp(self.ts) if self.ts is not None else None
+
+    def __repr__(self) -> str:
+        return f"BackupRecord({self.path!r}, ts={self.ts})"
+
+
+def build_records(items: Iterable[Dict[str, Any]]) -> List[BackupRecord]:
+    """Parse a remote listing into records, newest first (undated last).
+
+    All bucket selection below relies on this order, so each listing is
+    parsed and sorted exactly once.
+    """
+    records = [r for r in map(BackupRecord.from_item, items) if r is not None]
+    records.sort(key=lambda r: (r.ts is not None, r.ts or 0), reverse=True)
+    return records
+
+
+def _parent_dir(path: str) -> str:
+    """Remote directory containing *path*."""
+    return path.rsplit("/", 1)[0] or "/"
 
 
 # ============================================================================
-# Time-bucket selection  (Issue 5: unified via existing_keep parameter)
+# Tier engine
 # ============================================================================
-def _select_bucket_keep_paths(
-    remote_items: List[Dict[str, Any]],
-    bucket_key_fn: Callable[[datetime], Any],
-    keep_count: int,
-    existing_keep: Optional[Set[str]] = None,
-) -> Set[str]:
-    """Select newest *keep_count* files per time bucket.
-
-    When *existing_keep* is provided, paths already kept by a higher-priority
-    bucket are counted toward the limit but not re-added.
-
-    若 *keep_count* <= 0，直接返回空集（语义：未启用 = 不保留）。
+# (name, bucket attribute, folder) — coarsest first; this is also the priority
+# order when several tiers want the same backup.  ``每日/`` is the entry folder
+# new uploads land in; tiers without a folder live there too in folder mode.
+TIER_DEFS: List[Tuple[str, str, Optional[str]]] = [
+    ("yearly", "year", "每年"),
+    ("monthly", "month", "每月"),
+    ("weekly", "week", "每周"),
+    ("daily", "day", "每日"),
+    ("hourly", "hour", None),
+]
+ENTRY_FOLDER: str = "每日"
+_FOLDER_TIERS: Dict[str, str] = {folder: name for name, _, folder in TIER_DEFS if folder}
+
+
+def folder_tier(remote_dir: str) -> Optional[str]:
+    """Default tier of backups stored in *remote_dir* (by folder name)."""
+    return _FOLDER_TIERS.get(remote_dir.rsplit("/", 1)[-1])
+
+
+class Tier:
+    """One retention tier: keep the newest backup of each of the newest
+    *count* buckets (hour / day / week / month / year).
+
+    *home* is the remote directory the tier's backups live in (None in flat
+    mode, where every tier shares the upload directory).
     """
-    if keep_count is None or keep_count <= 0:
-        return set()
 
-    files: List[tuple] = []
-    for item in remote_items:
-        if item.get("isdir") == 1:
-            continue
-        name = item.get("server_filename") or ""
-        if not name.endswith(".tar"):
-            continue
-        path = item.get("path")
-        dt = _infer_backup_datetime(item)
-        if not path or not dt:
+    __slots__ = ("name", "attr", "count", "home")
+
+    def __init__(self, name: str, attr: str, count: int, home: Optional[str] = None) -> None:
+        self.name: str = name
+        self.attr: str = attr
+        self.count: int = count
+        self.home: Optional[str] = home
+
+    def __repr__(self) -> str:
+        return f"Tier({self.name!r}, count={self.count}, home={self.home!r})"
+
+
+def build_tiers(
+    base_upload_path: str,
+    retention: Dict[str, Any],
+    use_folders: bool,
+) -> List[Tier]:
+    """Enabled tiers (count > 0) for *retention*, coarsest first."""
+    entry_dir = _join_remote_dir(base_upload_path, ENTRY_FOLDER)
+    tiers: List[Tier] = []
+    for name, attr, folder in TIER_DEFS:
+        count = int(retention.get(name, 0) or 0)
+        if count <= 0:
             continue
-        files.append((path, dt))
+        home = None
+        if use_folders:
+            home = _join_remote_dir(base_upload_path, folder) if folder else entry_dir
+        tiers.append(Tier(name, attr, count, home))
+    return tiers
+
+
+def _location(
+    parent: str, homes: Set[Optional[str]], entry_dir: Optional[str]
+) -> Optional[str]:
+    """Tier home a backup in *parent* belongs to (None in flat mode)."""
+    if entry_dir is None:
+        return None
+    return parent if parent in homes else entry_dir
 
-    files.sort(key=lambda x: x[1], reverse=True)  # newest first
 
-    keep: Set[str] = set()
-    seen: Set[Any] = set()
-    for path, dt in files:
-        key = bucket_key_fn(dt)
-        if key in seen:
+def resolve_tiers(
+    records: List[BackupRecord],
+    tiers: List[Tier],
+    entry_dir: Optional[str] = None,
+) -> Dict[str, Tier]:
+    """Assign backups to tiers in one newest-first pass.
+
+    *records* are all managed backups, newest first (see :func:`build_records`).
+    Each tier keeps the newest backup of each of its newest ``count`` buckets.
+
+    Flat mode (*entry_dir* None): tiers select independently and a backup is
+    kept if any tier selects it (credited to the coarsest one).
+
+    Folder mode: a tier only keeps backups already in its home directory plus
+    backups *promoted* from *entry_dir*.  A bucket already present in the
+    tier's home is never promoted again, and a promoted backup is not also
+    counted by tiers living elsewhere (cross-tier dedup).  Backups outside
+    every tier home are treated as living in *entry_dir*.
+
+    Returns:
+        {path: tier} for every backup to keep; the tier's home is its target.
+    """
+    homes = {t.home for t in tiers}
+    chosen: Dict[str, Set[int]] = {t.name: set() for t in tiers}
+
+    # Buckets already represented in each promotion tier's home (linear scan).
+    occupied: Dict[str, Set[int]] = {}
+    if entry_dir is not None:
+        for t in tiers:
+            if t.home != entry_dir:
+                occupied[t.name] = {
+                    getattr(r, t.attr) for r in records
+                    if _parent_dir(r.path) == t.home
+                }
+
+    keep: Dict[str, Tier] = {}
+    for r in records:
+        if r.ts is None:
             continue
-        if existing_keep is not None and path in existing_keep:
+        loc = _location(_parent_dir(r.path), homes, entry_dir)
+        claimed: Optional[Tier] = None
+        for t in tiers:
+            if claimed is not None and t.home != claimed.home:
+                continue
+            key = getattr(r, t.attr)
+            seen = chosen[t.name]
+            if loc != t.home:
+                # promotion candidate from the entry directory
+                if loc != entry_dir or key in occupied.get(t.name, ()):
+                    continue
+            if key in seen or len(seen) >= t.count:
+                continue
             seen.add(key)
-            if len(seen) >= keep_count:
-                break
-            continue
-        keep.add(path)
-        seen.add(key)
-        if len(seen) >= keep_count:
-            break
+            if claimed is None:
+                claimed = t
+        if claimed is not None:
+            keep[r.path] = claimed
     return keep
 
 
-# ============================================================================
-# Flat retention (single directory)
-# ============================================================================
-def _compute_retention_keep_paths(
-    remote_items: List[Dict[str, Any]],
-    daily: int,
-    weekly: int,
-    monthly: int,
-) -> Set[str]:
-    """Compute set of remote paths to retain under daily/weekly/monthly policy.
-
-    Issue 5 fix: delegates all three tiers to ``_select_bucket_keep_paths``
-    with cross-tier dedup via ``existing_keep``.
-    """
-    keep: Set[str] = set()
+@traced("plan_retention", cat="retention")
+def plan_retention(
+    records: List[BackupRecord],
+    tiers: List[Tier],
+    entry_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Pure planner — decide every backup's final location up front.
 
-    if daily and daily > 0:
-        keep |= _select_bucket_keep_paths(
-            remote_items, lambda dt: dt.date(), daily
-        )
+    Only the *final* location matters: a top-level backup promoted to a tier
+    folder is moved there directly, and a backup that would be pruned is
+    deleted where it is instead of being moved first.  Backups in a directory
+    no enabled tier lives in are left alone (retention for that tier is off),
+    except that stray top-level backups still sink into *entry_dir*.
 
-    if weekly and weekly > 0:
-        keep |= _select_bucket_keep_paths(
-            remote_items,
-            lambda dt: (dt.isocalendar().year, dt.isocalendar().week),
-            weekly,
-            existing_keep=keep,
+    Callers pass only backups from the upload root, *entry_dir* and enabled
+    tier homes, so disabled tiers' folders are never touched.
+    """
+    keep = resolve_tiers(records, tiers, entry_dir)
+    homes = {t.home for t in tiers}
+
+    moves: List[Dict[str, str]] = []
+    deletes: List[str] = []
+    kept: Dict[str, int] = {}
+    assigned: Dict[str, str] = {}
+    entries: List[Dict[str, Any]] = []
+    for r in records:
+        parent = _parent_dir(r.path)
+        loc = _location(parent, homes, entry_dir)
+        tier = keep.get(r.path)
+        if tier is None and loc in homes:
+            deletes.append(r.path)
+            continue
+        if entry_dir is None:
+            target = parent
+        else:
+            target = tier.home if tier is not None else loc
+        kept[target] = kept.get(target, 0) + 1
+        final_path = _join_remote_dir(target, r.name)
+        if tier is not None:
+            assigned[final_path] = tier.name
+        entries.append(
+            _manifest_entry(r, final_path, tier.name if tier else folder_tier(target))
         )
+        if target != parent:
+            moves.append({"path": r.path, "dest": target, "ondup": "overwrite"})
+    return _make_plan(moves, deletes, kept, assigned, entries)
 
-    if monthly and monthly > 0:
-        keep |= _select_bucket_keep_paths(
-            remote_items,
-            lambda dt: (dt.year, dt.month),
-            monthly,
-            existing_keep=keep,
-        )
 
-    return keep
+def _make_plan(
+    moves: List[Dict[str, str]],
+    deletes: List[str],
+    kept: Dict[str, int],
+    tiers: Optional[Dict[str, str]] = None,
+    entries: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Build a plan dict; all moves go in one batched call, all deletes in another.
 
+    Returns:
+        {
+            "moves": [{"path", "dest", "ondup"}, ...],
+            "deletes": [path, ...],
+            "kept": {dir: count},   # 执行后各目录保留的备份数
+            "tiers": {path: tier},  # 执行后各备份所属层级（按最终路径）
+            "entries": [...],       # 执行后保留的备份（清单条目，见 _manifest_entry）
+            "api_calls": int,       # 执行所需的 filemanager 请求数
+        }
+    """
+    api_calls = -(-len(moves) // BATCH_SIZE) + -(-len(deletes) // BATCH_SIZE)
+    return {
+        "moves": moves,
+        "deletes": deletes,
+        "kept": kept,
+        "tiers": tiers or {},
+        "entries": entries or [],
+        "api_calls": api_calls,
+    }
 
-def cleanup_remote_backups(
-    client: "BaiduClient",  # type: ignore[valid-type]
-    upload_path: str,
-    retention: Dict[str, Any],
-) -> None:
-    """Apply flat retention policy — keep newest N per day/week/month."""
-    if not retention:
+
+def describe_plan(plan: Dict[str, Any], prefix: str) -> None:
+    """Log what *plan* will do (or would do, in dry-run mode)."""
+    moves = plan["moves"]
+    deletes = plan["deletes"]
+    if not moves and not deletes:
+        log(f"{prefix}: nothing to do")
         return
 
-    daily = int(retention.get("daily", 0) or 0)
-    weekly = int(retention.get("weekly", 0) or 0)
-    monthly = int(retention.get("monthly", 0) or 0)
+    per_dest: Dict[str, int] = {}
+    for m in moves:
+        per_dest[m["dest"]] = per_dest.get(m["dest"], 0) + 1
+    for dest, n in sorted(per_dest.items()):
+        log(f"{prefix}: move {n} backups → {dest}")
 
-    if daily <= 0 and weekly <= 0 and monthly <= 0:
-        return
+    per_dir: Dict[str, int] = {}
+    for p in deletes:
+        d = _parent_dir(p)
+        per_dir[d] = per_dir.get(d, 0) + 1
+    for d, n in sorted(per_dir.items()):
+        log(f"{prefix}: delete {n} backups from {d}")
 
-    remote_items = client.list_remote_files(upload_path) or []
-    keep = _compute_retention_keep_paths(
-        remote_items, daily=daily, weekly=weekly, monthly=monthly
-    )
+    kept = ", ".join(f"{d}={n}" for d, n in sorted(plan["kept"].items()))
+    log(f"{prefix}: keep {kept}; {plan['api_calls']} filemanager call(s)")
 
-    candidates: List[str] = []
-    for item in remote_items:
-        if item.get("isdir") == 1:
-            continue
-        name = item.get("server_filename") or ""
-        if not name.endswith(".tar"):
-            continue
-        path = item.get("path")
-        if path and path not in keep:
-            candidates.append(path)
 
-    if not candidates:
-        log("Remote retention: nothing to delete")
-        return
+@traced("execute_plan", cat="retention")
+def execute_plan(
+    client: "BaiduClient",  # type: ignore[valid-type]
+    plan: Dict[str, Any],
+) -> bool:
+    """Run *plan*: one batched move call, then one batched delete call."""
+    ok = True
+    if plan["moves"]:
+        with span("moves", cat="retention", count=len(plan["moves"])):
+            ok = client.move_remote_files(plan["moves"]) and ok
+    if plan["deletes"]:
+        with span("deletes", cat="retention", count=len(plan["deletes"])):
+            ok = client.delete_remote_files(plan["deletes"]) and ok
+    catalog = getattr(client, "catalog", None)
+    if ok and catalog is not None and plan["tiers"]:
+        try:
+            catalog.set_tiers(plan["tiers"])
+        except Exception as e:
+            log(f"Catalog update failed: {e}")
+    return ok
 
-    log(
-        f"Remote retention: keeping {len(keep)} backups, "
-        f"deleting {len(candidates)} backups"
-    )
-    client.delete_remote_files(candidates)
+
+def _apply_plan(
+    client: "BaiduClient",  # type: ignore[valid-type]
+    plan: Dict[str, Any],
+    retention: Dict[str, Any],
+    prefix: str,
+) -> None:
+    dry_run = bool(retention.get("dry_run"))
+    describe_plan(plan, prefix + (" [dry-run]" if dry_run else ""))
+    if not dry_run:
+        execute_plan(client, plan)
 
 
 # ============================================================================
-# Folder-mode retention (daily / weekly / monthly sub-directories)
+# Flat retention (single directory)
 # ============================================================================
-def retention_folder_mode(
+@traced("cleanup_remote_backups", cat="retention")
+def cleanup_remote_backups(
     client: "BaiduClient",  # type: ignore[valid-type]
-    base_upload_path: str,
+    upload_path: str,
     retention: Dict[str, Any],
-) -> None:
-    """Apply folder-mode retention with promotion between tiers.
+) -> Optional[Dict[str, Any]]:
+    """Apply flat retention policy — every tier shares *upload_path*.
 
-    Issue 4 fix: initial listing results are cached in dicts keyed by path.
-    After move operations the caches are updated manually, eliminating 4 of
-    the original 7 ``list_remote_files`` calls.
+    With ``retention["dry_run"]`` the plan is only logged, not executed.
+    Returns the plan (None when no tier is enabled).
     """
-    daily_n = int(retention.get("daily", 0) or 0)
-    weekly_n = int(retention.get("weekly", 0) or 0)
-    monthly_n = int(retention.get("monthly", 0) or 0)
-
-    daily_dir = _join_remote_dir(base_upload_path, "每日")
-    weekly_dir = _join_remote_dir(base_upload_path, "每周")
-    monthly_dir = _join_remote_dir(base_upload_path, "每月")
-
-    client.create_remote_dir(base_upload_path)
-    client.create_remote_dir(daily_dir)
-    client.create_remote_dir(weekly_dir)
-    client.create_remote_dir(monthly_dir)
-
-    # ── Phase 0: 将 base_upload_path 顶层遗留的 .tar 下沉到 每日/ ─────────
-    # （flat → folder 模式切换后会有这种残留；清单文件.txt 留在顶层不动）
-    top_items = client.list_remote_files(base_upload_path) or []
-    moves_top_to_daily: List[Dict[str, str]] = []
-    for item in top_items:
-        if item.get("isdir") == 1:
-            continue
-        name = item.get("server_filename") or ""
-        if not name.endswith(".tar"):
-            continue
-        p = item.get("path")
-        if p:
-            moves_top_to_daily.append(
-                {"path": p, "dest": daily_dir, "ondup": "overwrite"}
-            )
-    if moves_top_to_daily:
-        log(
-            f"Retention folders: 将 {len(moves_top_to_daily)} 个顶层备份下沉到 每日/"
-        )
-        client.move_remote_files(moves_top_to_daily)
-
-    # ── Phase 1: list once per directory (3 API calls) ──────────────────
-    daily_items = client.list_remote_files(daily_dir) or []
-    weekly_items = client.list_remote_files(weekly_dir) or []
-    monthly_items = client.list_remote_files(monthly_dir) or []
-
-    # Build path → item caches for manual update after moves
-    daily_cache: Dict[str, Dict[str, Any]] = {}
-    for item in daily_items:
-        p = item.get("path")
-        if p:
-            daily_cache[p] = item
-
-    weekly_cache: Dict[str, Dict[str, Any]] = {}
-    for item in weekly_items:
-        p = item.get("path")
-        if p:
-            weekly_cache[p] = item
-
-    monthly_cache: Dict[str, Dict[str, Any]] = {}
-    for item in monthly_items:
-        p = item.get("path")
-        if p:
-            monthly_cache[p] = item
-
-    # ── Phase 2: promote daily → monthly ────────────────────────────────
-    monthly_keep_from_daily = _select_bucket_keep_paths(
-        daily_items,
-        bucket_key_fn=lambda dt: (dt.year, dt.month),
-        keep_count=monthly_n,
-    )
-
-    existing_month_keys: Set[tuple] = set()
-    for item in monthly_items:
-        if item.get("isdir") == 1:
-            continue
-        dt = _infer_backup_datetime(item)
-        if not dt:
-            continue
-        existing_month_keys.add((dt.year, dt.month))
+    tiers = build_tiers(upload_path, retention or {}, use_folders=False)
+    if not tiers:
+        return None
 
-    moves_to_monthly: List[Dict[str, str]] = []
-    for path in monthly_keep_from_daily:
-        item = daily_cache.get(path, {})
-        dt = _infer_backup_datetime(item)
-        if not dt:
-            continue
-        key = (dt.year, dt.month)
-        if key in existing_month_keys:
-            continue
-        moves_to_monthly.append(
-            {"path": path, "dest": monthly_dir, "ondup": "overwrite"}
-        )
+    records = build_records(client.list_backup_files(upload_path) or [])
+    plan = plan_retention(records, tiers)
+    _apply_plan(client, plan, retention, "Remote retention")
+    return plan
 
-    if moves_to_monthly:
-        log(
-            f"Retention folders: promoting {len(moves_to_monthly)} "
-            f"backups to monthly"
-        )
-        client.move_remote_files(moves_to_monthly)
-        # Update caches instead of re-listing
-        for m in moves_to_monthly:
-            item = daily_cache.pop(m["path"], None)
-            if item is not None:
-                monthly_cache[m["path"]] = item
-
-    # ── Phase 3: promote daily → weekly (from remaining daily cache) ────
-    weekly_keep_from_daily = _select_bucket_keep_paths(
-        list(daily_cache.values()),
-        bucket_key_fn=lambda dt: (dt.isocalendar().year, dt.isocalendar().week),
-        keep_count=weekly_n,
-    )
 
-    existing_week_keys: Set[tuple] = set()
-    for item in weekly_cache.values():
-        if item.get("isdir") == 1:
-            continue
-        dt = _infer_backup_datetime(item)
-        if not dt:
-            continue
-        existing_week_keys.add((dt.isocalendar().year, dt.isocalendar().week))
+# ============================================================================
+# Folder-mode retention (每年 / 每月 / 每周 / 每日 sub-directories)
+# ============================================================================
+@traced("retention_folder_mode", cat="retention")
+def retention_folder_mode(
+    client: "BaiduClient",  # type: ignore[valid-type]
+    base_upload_path: str,
+    retention: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Apply folder-mode retention with promotion between tiers.
 
-    moves_to_weekly: List[Dict[str, str]] = []
-    for path in weekly_keep_from_daily:
-        item = daily_cache.get(path, {})
-        dt = _infer_backup_datetime(item)
-        if not dt:
-            continue
-        key = (dt.isocalendar().year, dt.isocalendar().week)
-        if key in existing_week_keys:
-            continue
-        moves_to_weekly.append(
-            {"path": path, "dest": weekly_dir, "ondup": "overwrite"}
-        )
+    Lists the upload root and each enabled tier's folder once (served from
+    the catalog while it is fresh, see ``BaiduClient.list_backup_files``), plans all
+    moves / deletes with :func:`plan_retention`, then executes the plan in at
+    most one batched move and one batched delete call.  With
+    ``retention["dry_run"]`` the plan is only logged.  Returns the plan, with
+    the listed directories under ``plan["dirs"]``.
+    """
+    entry_dir = _join_remote_dir(base_upload_path, ENTRY_FOLDER)
+    tiers = build_tiers(base_upload_path, retention, use_folders=True)
 
-    if moves_to_weekly:
-        log(
-            f"Retention folders: promoting {len(moves_to_weekly)} "
-            f"backups to weekly"
-        )
-        client.move_remote_files(moves_to_weekly)
-        for m in moves_to_weekly:
-            item = daily_cache.pop(m["path"], None)
-            if item is not None:
-                weekly_cache[m["path"]] = item
-
-    # ── Phase 4: cleanup — enforce per-folder counts from caches ────────
-    # 守卫：keep_count <= 0 表示"未启用"，跳过对应目录的清理（保留全部）
-    del_daily: List[str] = []
-    del_weekly: List[str] = []
-    del_monthly: List[str] = []
-
-    if daily_n > 0:
-        daily_keep = _select_bucket_keep_paths(
-            list(daily_cache.values()),
-            bucket_key_fn=lambda dt: dt.date(),
-            keep_count=daily_n,
-        )
-        del_daily = _paths_to_delete(list(daily_cache.values()), daily_keep)
+    dirs: List[str] = [base_upload_path, entry_dir]
+    for t in tiers:
+        if t.home not in dirs:
+            dirs.append(t.home)
 
-    if weekly_n > 0:
-        weekly_keep = _select_bucket_keep_paths(
-            list(weekly_cache.values()),
-            bucket_key_fn=lambda dt: (dt.isocalendar().year, dt.isocalendar().week),
-            keep_count=weekly_n,
-        )
-        del_weekly = _paths_to_delete(list(weekly_cache.values()), weekly_keep)
+    catalog = getattr(client, "catalog", None)
+    items: List[Dict[str, Any]] = []
+    with span("list_tiers", cat="retention", dirs=len(dirs)):
+        for d in dirs:
+            # 目录已在 catalog 中列举过 → 必然存在，省掉一次 create 调用
+            if catalog is None or not catalog.is_fresh(d):
+                client.create_remote_dir(d)
+            items.extend(client.list_backup_files(d) or [])
 
-    if monthly_n > 0:
-        monthly_keep = _select_bucket_keep_paths(
-            list(monthly_cache.values()),
-            bucket_key_fn=lambda dt: (dt.year, dt.month),
-            keep_count=monthly_n,
-        )
-        del_monthly = _paths_to_delete(list(monthly_cache.values()), monthly_keep)
-
-    if del_daily:
-        log(f"Retention folders: deleting {len(del_daily)} backups from daily")
-        client.delete_remote_files(del_daily)
-    if del_weekly:
-        log(
-            f"Retention folders: deleting {len(del_weekly)} backups from weekly"
-        )
-        client.delete_remote_files(del_weekly)
-    if del_monthly:
-        log(
-            f"Retention folders: deleting {len(del_monthly)} backups from monthly"
-        )
-        client.delete_remote_files(del_monthly)
+    plan = plan_retention(build_records(items), tiers, entry_dir)
+    plan["dirs"] = dirs
+    _apply_plan(client, plan, retention, "Retention folders")
+    return plan
 
 
 # ============================================================================
@@ -419,6 +497,7 @@ def retention_folder_mode(
 _MIGRATION_FLAG_FILE: str = "/data/migration_done.flag"
 
 
+@traced("migrate_old_dirs", cat="retention")
 def migrate_old_dirs(
     client: "BaiduClient",  # type: ignore[valid-type]
     base_upload_path: str,
@@ -500,106 +579,190 @@ def migrate_old_dirs(
 # ============================================================================
 # 生成备份清单文件
 # ============================================================================
+MANIFEST_NAME: str = "清单文件.txt"
+MANIFEST_JSON_NAME: str = "清单文件.json"
+_MANIFEST_STATE_FILE: str = "/data/manifest_state.json"
+
+
+def _manifest_entry(rec: BackupRecord, path: str, tier: Optional[str]) -> Dict[str, Any]:
+    """Machine-readable manifest row for a backup living at *path*."""
+    return {
+        "path": path,
+        "size": rec.size,
+        "md5": rec.md5,
+        "fs_id": rec.fs_id,
+        "tier": tier,
+        "timestamp": rec.ts,
+    }
+
+
+def _format_size(size: int) -> str:
+    if size >= 1024 * 1024 * 1024:
+        return f"{size / (1024**3):.2f} GB"
+    if size >= 1024 * 1024:
+        return f"{size / (1024**2):.2f} MB"
+    return f"{size / 1024:.2f} KB"
+
+
+def _format_ts(ts: Optional[int]) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts is not None else "无"
+
+
+def _load_manifest_state() -> Dict[str, str]:
+    import json as _json
+
+    try:
+        with open(_MANIFEST_STATE_FILE, "r") as f:
+            data = _json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest_state(state: Dict[str, str]) -> None:
+    import json as _json
+    import os as _os
+
+    try:
+        _os.makedirs(_os.path.dirname(_MANIFEST_STATE_FILE), exist_ok=True)
+        with open(_MANIFEST_STATE_FILE, "w") as f:
+            _json.dump(state, f)
+    except OSError as e:
+        log(f"清单状态写入失败（下次会重新上传）：{e}")
+
+
+def _listed_manifest_entries(
+    client: "BaiduClient",  # type: ignore[valid-type]
+    base_upload_path: str,
+    skip: Iterable[str] = (),
+) -> List[Dict[str, Any]]:
+    """Manifest entries from the catalog / remote listings of tier folders not in *skip*."""
+    skip = set(skip)
+    entries: List[Dict[str, Any]] = []
+    for _, _, folder in TIER_DEFS:
+        if not folder:
+            continue
+        remote_dir = _join_remote_dir(base_upload_path, folder)
+        if remote_dir in skip:
+            continue
+        items = client.list_backup_files(remote_dir) or []
+        tiers = {it.get("path"): it.get("tier") for it in items}
+        for r in build_records(items):
+            entries.append(_manifest_entry(r, r.path, tiers.get(r.path) or folder_tier(remote_dir)))
+    return entries
+
+
+@traced("generate_manifest", cat="retention")
 def generate_manifest(
     client: "BaiduClient",  # type: ignore[valid-type]
     base_upload_path: str,
+    entries: Optional[List[Dict[str, Any]]] = None,
+    listed_dirs: Iterable[str] = (),
 ) -> Optional[Dict[str, Any]]:
     """生成备份清单文件并上传到网盘。
 
-    汇总每日/每周/每月三个子目录的文件数量、总大小和日期范围，
-    写入清单文件.txt 后上传到 upload_path 目录下。
+    汇总各层级子目录（每日/每周/每月/每年）的文件数量、总大小和日期范围，
+    写入清单文件.txt；同时生成机器可读的 清单文件.json（每个备份的
+    path / size / md5 / fs_id / tier / timestamp）。
+
+    *entries* 为本周期 retention 计划中的最终状态（``plan["entries"]``），
+    *listed_dirs* 为该计划列举过的目录（``plan["dirs"]``）；计划未覆盖的层级
+    目录（如已停用层级的 每月/）以及未提供 *entries* 时，从 catalog / 远端
+    列举获取。清单内容（不含生成时间）与上次上传
+    一致时跳过上传并返回 None。
     """
-    import os as _os
-    import shutil as _shutil
-    import tempfile as _tempfile
+    import hashlib as _hashlib
+    import json as _json
 
-    dir_names: List[str] = ["每日", "每周", "每月"]
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if entries is None:
+        entries = _listed_manifest_entries(client, base_upload_path)
+    else:
+        entries = list(entries) + _listed_manifest_entries(
+            client, base_upload_path, skip=listed_dirs
+        )
 
-    lines: List[str] = []
-    lines.append("百度网盘备份清单")
-    lines.append(f"生成时间：{now_str}")
-    lines.append("=" * 50)
-    lines.append("")
+    by_dir: Dict[str, List[Dict[str, Any]]] = {}
+    for e in entries:
+        by_dir.setdefault(_parent_dir(e["path"]), []).append(e)
 
+    # 每日/每周/每月 始终列出；其他层级目录（如 每年/）有备份时才列出
+    dir_names: List[str] = [
+        folder for name, _, folder in reversed(TIER_DEFS)
+        if folder and (
+            name in ("daily", "weekly", "monthly")
+            or _join_remote_dir(base_upload_path, folder) in by_dir
+        )
+    ]
+
+    body: List[str] = []
     total_count: int = 0
     total_size: int = 0
 
     for dir_name in dir_names:
         remote_dir = _join_remote_dir(base_upload_path, dir_name)
-        items = client.list_remote_files(remote_dir) or []
-
-        # 过滤出备份文件（排除目录项和非 tar 文件）
-        files = [
-            item
-            for item in items
-            if item.get("isdir") != 1
-            and item.get("server_filename", "").endswith(".tar")
-        ]
+        files = by_dir.get(remote_dir, [])
 
         count = len(files)
-        dir_size = sum(int(f.get("size", 0)) for f in files)
+        dir_size = sum(int(e.get("size") or 0) for e in files)
         total_count += count
         total_size += dir_size
 
-        # 提取备份日期，找出最早和最晚
-        dates: List[datetime] = []
-        for item in files:
-            dt = _infer_backup_datetime(item)
-            if dt:
-                dates.append(dt)
-
-        earliest = (
-            min(dates).strftime("%Y-%m-%d %H:%M:%S") if dates else "无"
-        )
-        latest = (
-            max(dates).strftime("%Y-%m-%d %H:%M:%S") if dates else "无"
-        )
-
-        # 格式化大小
-        if dir_size >= 1024 * 1024 * 1024:
-            size_str = f"{dir_size / (1024**3):.2f} GB"
-        elif dir_size >= 1024 * 1024:
-            size_str = f"{dir_size / (1024**2):.2f} MB"
-        else:
-            size_str = f"{dir_size / 1024:.2f} KB"
-
-        lines.append(f"目录：{remote_dir}")
-        lines.append(f"  文件数量：{count}")
-        lines.append(f"  总大小：  {size_str}")
-        lines.append(f"  最早备份：{earliest}")
-        lines.append(f"  最晚备份：{latest}")
-        lines.append("")
-
-    # 合计汇总
-    if total_size >= 1024 * 1024 * 1024:
-        total_size_str = f"{total_size / (1024**3):.2f} GB"
-    elif total_size >= 1024 * 1024:
-        total_size_str = f"{total_size / (1024**2):.2f} MB"
-    else:
-        total_size_str = f"{total_size / 1024:.2f} KB"
-
-    lines.append("=" * 50)
-    lines.append(f"合计：{total_count} 个文件，总大小 {total_size_str}")
-
-    content = "\n".join(lines) + "\n"
+        stamps = [e["timestamp"] for e in files if e.get("timestamp") is not None]
+        earliest = _format_ts(min(stamps)) if stamps else "无"
+        latest = _format_ts(max(stamps)) if stamps else "无"
+
+        body.append(f"目录：{remote_dir}")
+        body.append(f"  文件数量：{count}")
+        body.append(f"  总大小：  {_format_size(dir_size)}")
+        body.append(f"  最早备份：{earliest}")
+        body.append(f"  最晚备份：{latest}")
+        body.append("")
+
+    body.append("=" * 50)
+    body.append(f"合计：{total_count} 个文件，总大小 {_format_size(total_size)}")
+
+    backups = sorted(entries, key=lambda e: e["path"])
+    body_text = "\n".join(body)
+    json_body = _json.dumps(backups, ensure_ascii=False, sort_keys=True)
+    digest = _hashlib.sha256(
+        (body_text + "\0" + json_body).encode("utf-8")
+    ).hexdigest()
+
+    manifest_path = _join_remote_dir(base_upload_path, MANIFEST_NAME)
+    state = _load_manifest_state()
+    if state.get(manifest_path) == digest:
+        log("清单内容未变化，跳过上传")
+        return None
 
-    # 在临时目录中创建固定名文件，确保云端文件名为 “清单文件.txt”
-    # （client.upload_file 使用 os.path.basename(local_path) 作为远端文件名，
-    # 因此必须让本地文件名就是目标名，而不能用 mkstemp 的随机名）
-    tmp_dir = _tempfile.mkdtemp(prefix="manifest_")
-    try:
-        temp_path = _os.path.join(tmp_dir, "清单文件.txt")
-        with open(temp_path, "w", encoding="utf-8") as f:
-            f.write(content)
-
-        log(f"清单文件已生成，正在上传到 {base_upload_path}/清单文件.txt")
-        client.upload_file(temp_path, base_upload_path)
-        log("清单文件上传完成")
-        return {
-            "manifest_path": f"{base_upload_path.rstrip('/')}/清单文件.txt",
+    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    header = ["百度网盘备份清单", f"生成时间：{now_str}", "=" * 50, ""]
+    content = "\n".join(header) + "\n" + body_text + "\n"
+    json_content = _json.dumps(
+        {
+            "generated_at": now_str,
+            "upload_path": base_upload_path,
             "file_count": total_count,
             "total_size": total_size,
-        }
-    finally:
-        _shutil.rmtree(tmp_dir, ignore_errors=True)
\ No newline at end of file
+            "backups": backups,
+        },
+        ensure_ascii=False,
+        indent=2,
+    )
+
+    # 清单很小，直接从内存上传（单请求小文件通道，无需临时文件）
+    ok = True
+    for name, text in ((MANIFEST_NAME, content), (MANIFEST_JSON_NAME, json_content)):
+        log(f"清单文件已生成，正在上传到 {_join_remote_dir(base_upload_path, name)}")
+        ok = client.upload_bytes(text.encode("utf-8"), base_upload_path, name) and ok
+    if not ok:
+        log("清单文件上传失败，下次同步时重试")
+        return None
+
+    log("清单文件上传完成")
+    state[manifest_path] = digest
+    _save_manifest_state(state)
+    return {
+        "manifest_path": manifest_path,
+        "file_count": total_count,
+        "total_size": total_size,
+    }
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Interruptible cron scheduler for sync cycles.
+
+A single scheduler thread waits on a ``threading.Condition`` until the next
+cron fire time instead of ``time.sleep()``-ing through it, so it can be woken
+immediately when:
+
+* the configuration is reloaded from the Web UI (``wake()``) — the next fire
+  time is recomputed from the new cron expression;
+* a run is requested (``trigger(reason)``) — e.g. manually or because a new
+  local backup appeared.
+
+Jobs always run on the scheduler thread, one at a time, so cycles never
+overlap.  Triggers that arrive while a job is running are queued (identical
+reasons are collapsed) and run right after it.  A cron fire that falls due
+while another kind of job is running is queued as ``REASON_SCHEDULE`` when
+that job finishes, so an upload-only run never swallows the day's full cycle.
+
+Every run gets a job record (id, reason, status, timestamps, error) so the
+Web UI can start a cycle with ``request_run()`` and poll ``job(id)``; a
+request made while a full cycle is already queued or running joins that job
+instead of scheduling another one.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from client import log
+
+REASON_SCHEDULE: str = "schedule"
+REASON_STARTUP: str = "startup"
+REASON_MANUAL: str = "manual"
+REASON_NEW_BACKUP: str = "new_backup"    # 仅上传新备份，不是完整同步周期
+
+JOB_QUEUED: str = "queued"
+JOB_RUNNING: str = "running"
+JOB_DONE: str = "done"
+JOB_FAILED: str = "failed"
+
+MAX_JOBS: int = 50           # 保留最近 N 条任务记录供查询
+
+
+class Scheduler:
+    """Runs ``run_job(reason)`` on cron fires and on demand, never concurrently.
+
+    ``run_job`` may return a summary dict; it is kept as the job's ``result``
+    (and its ``"error"`` key marks the job failed).
+    """
+
+    def __init__(
+        self,
+        get_cron: Callable[[], Any],
+        run_job: Callable[[str], Optional[Dict[str, Any]]],
+    ) -> None:
+        self._get_cron = get_cron
+        self._run_job = run_job
+        self._cond = threading.Condition()
+        self._pending: List[Dict[str, Any]] = []
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._reschedule: bool = False
+        self._stopped: bool = False
+        self._running: Optional[Dict[str, Any]] = None
+        self._due_fire: Optional[datetime] = None   # 当前任务开始时尚未到点的 cron 触发时间
+        self.next_fire: Optional[datetime] = None
+
+    # ------------------------------------------------------------------
+    # Job records (caller holds self._cond)
+    # ------------------------------------------------------------------
+    def _new_job(self, reason: str, status: str) -> Dict[str, Any]:
+        job = {
+            "id": f"{int(time.time())}-{next(self._ids)}",
+            "reason": reason,
+            "status": status,
+            "queued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None,
+        }
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > MAX_JOBS:
+            self._jobs.popitem(last=False)
+        return job
+
+    def _enqueue(self, reason: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """``(job, created)``; an identical queued reason is reused."""
+        if self._stopped:
+            return None, False
+        for job in self._pending:
+            if job["reason"] == reason:
+                return job, False
+        job = self._new_job(reason, JOB_QUEUED)
+        self._pending.append(job)
+        self._cond.notify_all()
+        return job, True
+
+    # ------------------------------------------------------------------
+    # Wake-ups (safe to call from any thread)
+    # ------------------------------------------------------------------
+    def wake(self) -> None:
+        """Recompute the next fire time now (call after a config reload)."""
+        with self._cond:
+            self._reschedule = True
+            self._cond.notify_all()
+
+    def trigger(self, reason: str = REASON_MANUAL) -> bool:
+        """Queue a run as soon as possible.
+
+        Returns False when a run for the same *reason* is already queued
+        (the request is collapsed into it).
+        """
+        with self._cond:
+            return self._enqueue(reason)[1]
+
+    def request_run(self, reason: str = REASON_MANUAL) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Single-flight full sync cycle for on-demand callers (Web UI).
+
+        Returns ``(job, merged)``: when a full cycle (any reason except
+        ``REASON_NEW_BACKUP``) is already running or queued, that job is
+        returned with ``merged=True`` instead of queueing another one.
+        *job* is None when the scheduler is stopped.
+        """
+        with self._cond:
+            running = self._running
+            if running is not None and running["reason"] != REASON_NEW_BACKUP:
+                return dict(running), True
+            for job in self._pending:
+                if job["reason"] != REASON_NEW_BACKUP:
+                    return dict(job), True
+            job, _ = self._enqueue(reason)
+            return (dict(job) if job else None), False
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job record, or None when unknown / expired."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Recent job records, newest first."""
+        with self._cond:
+            return [dict(j) for j in reversed(self._jobs.values())]
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    @property
+    def running(self) -> Optional[str]:
+        """Reason of the job currently running, or None when idle."""
+        job = self._running
+        return job["reason"] if job else None
+
+    # ------------------------------------------------------------------
+    # Loop
+    # ------------------------------------------------------------------
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """Block until a job is due and mark it running (None when stopped)."""
+        with self._cond:
+            while not self._stopped:
+                if self._pending:
+                    job = self._pending.pop(0)
+                    job["status"] = JOB_RUNNING
+                    job["started_at"] = time.time()
+                    self._running = job
+                    try:
+                        self._due_fire = self._get_cron().next_fire(datetime.now())
+                    except ValueError:
+                        self._due_fire = None
+                    return job
+
+                self._reschedule = False
+                now = datetime.now()
+                try:
+                    target = self._get_cron().next_fire(now)
+                except ValueError as e:
+                    log(f"Scheduler: {e}; waiting for a config change or trigger")
+                    self.next_fire = None
+                    self._cond.wait_for(
+                        lambda: self._stopped or self._pending or self._reschedule
+                    )
+                    continue
+
+                self.next_fire = target
+                wait_s = (target - now).total_seconds()
+                log(
+                    f"Next run: {target.strftime('%Y-%m-%d %H:%M')} "
+                    f"(in {wait_s / 3600:.2f}h)"
+                )
+                # wait() 可能提前返回（通知或超时误差），循环直到到点或被唤醒
+                while not (self._stopped or self._pending or self._reschedule):
+                    remaining = (target - datetime.now()).total_seconds()
+                    if remaining <= 0:
+                        self._enqueue(REASON_SCHEDULE)
+                        break
+                    self._cond.wait(timeout=remaining)
+            return None
+
+    def run_forever(self) -> None:
+        """Scheduler main loop; returns only after :meth:`stop`."""
+        log(f"Entering scheduled mode. Cron: {self._get_cron().expr!r}")
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            reason = job["reason"]
+            log(f"Execution started ({reason}, job {job['id']})")
+            error: Optional[str] = None
+            outcome: Optional[Dict[str, Any]] = None
+            try:
+                outcome = self._run_job(reason)
+            except Exception as e:
+                error = str(e)
+                log(f"Scheduled job error ({reason}): {e}")
+            finally:
+                if error is None and isinstance(outcome, dict):
+                    error = outcome.get("error")
+                with self._cond:
+                    job["status"] = JOB_FAILED if error else JOB_DONE
+                    job["error"] = error
+                    job["result"] = outcome if isinstance(outcome, dict) else None
+                    job["finished_at"] = time.time()
+                    self._running = None
+                    # 运行期间到点的 cron 触发不能丢：非定时任务结束后补跑一次完整周期
+                    due, self._due_fire = self._due_fire, None
+                    if (
+                        reason != REASON_SCHEDULE
+                        and due is not None
+                        and due <= datetime.now()
+                    ):
+                        log(f"Cron fire {due.strftime('%Y-%m-%d %H:%M')} passed during "
+                            f"{reason} job; queueing a scheduled run")
+                        self._enqueue(REASON_SCHEDULE)
+
+    def start(self) -> threading.Thread:
+        """Run :meth:`run_forever` in a daemon thread."""
+        t = threading.Thread(target=self.run_forever, name="scheduler", daemon=True)
+        t.start()
+        return t
@@ -2,7 +2,7 @@
 """Sync local Home Assistant backup files (.tar) to Baidu Netdisk."""
 import os
 import glob
-from typing import Any, Dict, TYPE_CHECKING
+from typing import Any, Dict, List, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from client import BaiduClient  # noqa: F401
@@ -10,10 +10,24 @@ else:
     BaiduClient = object
 
 from client import log
+from logs import debug
+from tracing import traced
 
 BACKUP_DIR: str = "/backup"
 
 
+def find_pending_backups(
+    client: "BaiduClient",  # type: ignore[valid-type]
+    upload_path: str,
+) -> List[str]:
+    """Local ``.tar`` backups not yet known to be in *upload_path* (no network calls)."""
+    return [
+        p for p in glob.glob(f"{BACKUP_DIR}/*.tar")
+        if not client._is_already_uploaded(p, upload_path)
+    ]
+
+
+@traced("sync_all_backups", cat="sync")
 def sync_all_backups(
     client: "BaiduClient",  # type: ignore[valid-type]
     upload_path: str,
@@ -28,6 +42,8 @@ def sync_all_backups(
             "success_count": int,     # 成功上传数（含缓存命中）
             "total_count": int,       # 文件总数
             "skipped_count": int,     # 跳过的文件数（已缓存）
+            "failed_count": int,      # 上传失败的文件数
+            "uploaded_bytes": int,    # 本次实际上传（含秒传）的文件总大小
             "error": str | None,      # 如有致命错误，返回错误信息
         }
     """
@@ -36,6 +52,8 @@ def sync_all_backups(
         "success_count": 0,
         "total_count": 0,
         "skipped_count": 0,
+        "failed_count": 0,
+        "uploaded_bytes": 0,
         "error": None,
     }
 
@@ -62,22 +80,26 @@ def sync_all_backups(
 
     success_count = 0
     skipped_count = 0
+    uploaded_bytes = 0
     for local_path in files:
         try:
             # Issue 12: skip files already known to be uploaded
-            if client._is_already_uploaded(local_path):
-                log(f"Already uploaded (cached): {os.path.basename(local_path)}")
+            if client._is_already_uploaded(local_path, upload_path):
+                debug("Already uploaded (cached): %s", os.path.basename(local_path))
                 success_count += 1
                 skipped_count += 1
                 continue
 
             if client.upload_file(local_path, upload_path):
                 success_count += 1
+                uploaded_bytes += os.path.getsize(local_path)
         except Exception as e:
             log(f"Error syncing {os.path.basename(local_path)}: {e}")
 
     result["success_count"] = success_count
     result["skipped_count"] = skipped_count
+    result["failed_count"] = len(files) - success_count
+    result["uploaded_bytes"] = uploaded_bytes
     result["success"] = success_count > 0
     log(f"Sync completed. {success_count}/{len(files)} files synced.")
     return result
\ No newline at end of file
@@ -0,0 +1,66 @@
+import pytest
+
+from catalog import BackupCatalog
+
+
+def _item(path, size=100):
+    return {"path": path, "server_filename": path.rsplit("/", 1)[-1], "size": size,
+            "isdir": 0, "server_mtime": 1700000000}
+
+
+@pytest.fixture
+def cat(tmp_path):
+    c = BackupCatalog(str(tmp_path / "catalog.db"))
+    yield c
+    c.close()
+
+
+def _listing(cat, remote_dir, *names):
+    cat.record_listing(remote_dir, [_item(f"{remote_dir}/{n}") for n in names])
+
+
+def test_delete_dir_removes_only_its_subtree(cat):
+    _listing(cat, "/apps/a_b", "x.tar")
+    _listing(cat, "/apps/a_b/每日", "y.tar")
+    _listing(cat, "/apps/aXb/每日", "z.tar")
+    _listing(cat, "/apps/A_B", "w.tar")
+    _listing(cat, "/apps/a_bc", "v.tar")
+    cat.record_deletes(["/apps/a_b"])
+    assert cat.items("/apps/a_b") == []
+    assert cat.items("/apps/a_b/每日") == []
+    assert [i["server_filename"] for i in cat.items("/apps/aXb/每日")] == ["z.tar"]
+    assert [i["server_filename"] for i in cat.items("/apps/A_B")] == ["w.tar"]
+    assert [i["server_filename"] for i in cat.items("/apps/a_bc")] == ["v.tar"]
+
+
+def test_delete_file_keeps_siblings(cat):
+    _listing(cat, "/apps/bk", "a.tar", "b.tar")
+    cat.record_deletes(["/apps/bk/a.tar"])
+    assert [i["server_filename"] for i in cat.items("/apps/bk")] == ["b.tar"]
+
+
+def test_percent_in_dir_name_is_literal(cat):
+    _listing(cat, "/apps/100%", "a.tar")
+    _listing(cat, "/apps/100x/sub", "b.tar")
+    cat.record_deletes(["/apps/100%"])
+    assert [i["server_filename"] for i in cat.items("/apps/100x/sub")] == ["b.tar"]
+
+
+def test_browse_base_does_not_match_lookalike_dirs(cat):
+    _listing(cat, "/apps/a_b/每日", "x.tar")
+    _listing(cat, "/apps/aXb/每日", "y.tar")
+    page = cat.browse("/apps/a_b")
+    assert [b["name"] for b in page["backups"]] == ["x.tar"]
+
+
+def test_find_only_trusts_fresh_listing_of_that_dir(cat, monkeypatch):
+    import catalog
+
+    _listing(cat, "/apps/bk/每日", "a.tar")
+    assert cat.find("/apps/bk/每日", "a.tar", 100) is not None
+    assert cat.find("/apps/old/每日", "a.tar", 100) is None
+    assert cat.find("/apps/bk/每日", "a.tar", 101) is None
+
+    now = catalog.time.time()
+    monkeypatch.setattr(catalog.time, "time", lambda: now + catalog.RECONCILE_INTERVAL + 1)
+    assert cat.find("/apps/bk/每日", "a.tar", 100) is None
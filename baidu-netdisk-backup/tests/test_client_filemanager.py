@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+import client
+from mock_xpan import MockXpanServer
+
+
+@pytest.fixture
+def mock_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(client, "TOKEN_FILE", str(tmp_path / "token.json"))
+    monkeypatch.setattr(client, "UPLOAD_CACHE_FILE", str(tmp_path / "upload_cache.json"))
+    monkeypatch.setattr(client, "RETRY_DELAY", 0.05)
+    monkeypatch.setattr(client, "TASK_POLL_INTERVAL", 0.02)
+    with MockXpanServer(task_delay=0.1) as srv:
+        for name in ("OAUTH_BASE", "PAN_BASE", "PCS_BASE"):
+            monkeypatch.setattr(client, name, srv.url)
+        yield srv, client.BaiduClient("rt-test")
+
+
+def _seed(srv, n):
+    acct = srv.account("rt-test")
+    paths = [f"/apps/bk/f{i:04d}.tar" for i in range(n)]
+    for p in paths:
+        acct.put_file(p, 10, "0" * 32, [p])
+    return acct, paths
+
+
+def test_async_batches_wait_for_the_previous_task(mock_client):
+    srv, c = mock_client
+    acct, paths = _seed(srv, 250)
+    assert c.delete_remote_files(paths)
+    assert not [p for p in acct.entries if p.startswith("/apps/bk/f")]
+    # 3 batches, never split and never rejected with errno 111
+    assert len(acct.tasks) == 3
+    assert acct.calls["filemanager"] == 3
+
+
+def test_busy_small_batch_is_not_dropped(mock_client):
+    srv, c = mock_client
+    acct, paths = _seed(srv, 3)
+    srv.task_delay = 0.3
+    acct.tasks["other"] = {"done_at": time.monotonic() + 0.2, "failed": False, "info": []}
+    assert c.delete_remote_files(paths)
+    assert acct.calls["filemanager"] >= 2
+
+
+def test_wait_refreshes_expired_token(mock_client):
+    srv, c = mock_client
+    _, paths = _seed(srv, 1)
+    ok, taskids = c.submit_filemanager(paths, "delete", "Deleted")
+    assert ok and taskids
+    c.access_token = "expired"
+    c.token_expires = 0
+    assert c.wait_filemanager_tasks(taskids)
+    assert c.access_token != "expired"
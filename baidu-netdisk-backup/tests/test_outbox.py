@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from outbox import (
+    BACKOFF_BASE,
+    MAX_ATTEMPTS,
+    RATE_LIMITS,
+    NotificationOutbox,
+    TokenBucket,
+)
+
+
+@pytest.fixture
+def box():
+    return NotificationOutbox(":memory:")
+
+
+def test_status_event_keeps_only_newest(box):
+    first, _ = box.enqueue("wechat", "storage_warning", "t", "used 91%", 1)
+    second, superseded = box.enqueue("wechat", "storage_warning", "t", "used 95%", 2)
+    assert second == first and superseded == 1
+    msg, _ = box.next_due("wechat")
+    assert msg["content"] == "used 95%" and msg["delivery_id"] == 2
+
+
+def test_success_notices_with_different_details_are_kept(box):
+    box.enqueue("wechat", "backup_success", "t", "a.tar 1 GB", 1)
+    _, superseded = box.enqueue("wechat", "backup_success", "t", "b.tar 2 GB", 2)
+    assert superseded is None
+    assert box.pending()["wechat"]["count"] == 2
+
+
+def test_identical_content_collapses_ignoring_time_line(box):
+    box.enqueue("email", "backup_failure", "t", "时间：10:00\nboom", 1)
+    _, superseded = box.enqueue("email", "backup_failure", "t", "时间：10:05\nboom", 2)
+    assert superseded == 1
+    assert box.pending()["email"]["count"] == 1
+
+
+def test_digests_never_collapse(box):
+    box.enqueue("feishu", "digest", "t", "same", 1)
+    _, superseded = box.enqueue("feishu", "digest", "t", "same", 2)
+    assert superseded is None
+    assert box.pending()["feishu"]["count"] == 2
+
+
+def test_collapse_is_per_channel(box):
+    box.enqueue("wechat", "storage_warning", "t", "x", 1)
+    _, superseded = box.enqueue("email", "storage_warning", "t", "x", 1)
+    assert superseded is None
+
+
+def test_delivered_keeps_row_updated_meanwhile(box):
+    box.enqueue("wechat", "storage_warning", "t", "old", 1)
+    msg, _ = box.next_due("wechat")
+    box.enqueue("wechat", "storage_warning", "t", "new", 2)
+    box.delivered(msg)
+    again, _ = box.next_due("wechat")
+    assert again["content"] == "new"
+
+
+def test_fail_backs_off_then_drops(box):
+    box.enqueue("wechat", "backup_failure", "t", "boom", 1)
+    msg, _ = box.next_due("wechat")
+    assert box.fail(msg, "HTTP 500") == BACKOFF_BASE
+    none, wait = box.next_due("wechat")
+    assert none is None and 0 < wait <= BACKOFF_BASE
+    msg["attempts"] = MAX_ATTEMPTS - 1
+    assert box.fail(msg, "HTTP 500") is None
+    assert box.pending() == {}
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(2, 10.0)
+    for _ in range(2):
+        assert bucket.wait_time() == 0
+        bucket.take()
+    wait = bucket.wait_time()
+    assert 0 < wait <= 0.1
+    time.sleep(wait + 0.01)
+    assert bucket.wait_time() == 0
+
+
+@pytest.mark.parametrize("channel", ["wechat", "dingtalk"])
+def test_rate_limits_stay_under_twenty_per_minute(channel):
+    capacity, rate = RATE_LIMITS[channel]
+    assert capacity + rate * 60 <= 20
@@ -0,0 +1,129 @@
+import json
+
+import retention
+from retention import build_records, build_tiers, generate_manifest, plan_retention
+
+BASE = "/apps/backup"
+DAILY = f"{BASE}/每日"
+WEEKLY = f"{BASE}/每周"
+MONTHLY = f"{BASE}/每月"
+
+
+def _item(remote_dir, stamp, name=None):
+    name = name or f"ha_{stamp}_full.tar"
+    return {"path": f"{remote_dir}/{name}", "server_filename": name, "size": 100, "isdir": 0}
+
+
+def _plan(items, use_folders, **retention):
+    tiers = build_tiers(BASE, retention, use_folders)
+    entry_dir = DAILY if use_folders else None
+    return plan_retention(build_records(items), tiers, entry_dir)
+
+
+def _names(paths):
+    return sorted(p.rsplit("/", 1)[-1] for p in paths)
+
+
+def test_flat_keeps_newest_backup_per_day():
+    items = [
+        _item(BASE, "2024-03-08_10.00"),
+        _item(BASE, "2024-03-08_02.00"),
+        _item(BASE, "2024-03-07_02.00"),
+        _item(BASE, "2024-03-06_02.00"),
+        _item(BASE, "2024-03-05_02.00"),
+    ]
+    plan = _plan(items, False, daily=3)
+    assert plan["moves"] == []
+    assert _names(plan["deletes"]) == ["ha_2024-03-05_02.00_full.tar", "ha_2024-03-08_02.00_full.tar"]
+    assert plan["kept"] == {BASE: 3}
+
+
+def test_flat_tiers_overlap_and_credit_the_coarsest():
+    items = [
+        _item(BASE, "2024-03-08_02.00"),
+        _item(BASE, "2024-03-07_02.00"),
+        _item(BASE, "2024-03-06_02.00"),
+        _item(BASE, "2024-03-01_02.00"),
+        _item(BASE, "2024-02-29_02.00"),
+    ]
+    plan = _plan(items, False, daily=2, weekly=2)
+    # weekly keeps the newest of this week and of last week; daily the two newest days
+    assert _names(plan["deletes"]) == ["ha_2024-02-29_02.00_full.tar", "ha_2024-03-06_02.00_full.tar"]
+    assert plan["tiers"][f"{BASE}/ha_2024-03-08_02.00_full.tar"] == "weekly"
+    assert plan["tiers"][f"{BASE}/ha_2024-03-07_02.00_full.tar"] == "daily"
+    assert plan["tiers"][f"{BASE}/ha_2024-03-01_02.00_full.tar"] == "weekly"
+
+
+def test_folder_mode_promotes_newest_without_double_counting():
+    items = [
+        _item(DAILY, "2024-03-08_02.00"),
+        _item(DAILY, "2024-03-07_02.00"),
+        _item(DAILY, "2024-03-06_02.00"),
+        _item(DAILY, "2024-03-05_02.00"),
+    ]
+    plan = _plan(items, True, daily=2, weekly=1)
+    assert plan["moves"] == [
+        {"path": f"{DAILY}/ha_2024-03-08_02.00_full.tar", "dest": WEEKLY, "ondup": "overwrite"}
+    ]
+    # the promoted backup does not also use up a daily slot
+    assert _names(plan["deletes"]) == ["ha_2024-03-05_02.00_full.tar"]
+    assert plan["kept"] == {WEEKLY: 1, DAILY: 2}
+    assert plan["api_calls"] == 2
+
+
+def test_folder_mode_skips_bucket_already_in_tier_home():
+    items = [
+        _item(WEEKLY, "2024-03-04_02.00"),
+        _item(DAILY, "2024-03-08_02.00"),
+        _item(DAILY, "2024-03-07_02.00"),
+        _item(DAILY, "2024-03-06_02.00"),
+    ]
+    plan = _plan(items, True, daily=2, weekly=1)
+    assert plan["moves"] == []
+    assert _names(plan["deletes"]) == ["ha_2024-03-06_02.00_full.tar"]
+    assert plan["kept"] == {WEEKLY: 1, DAILY: 2}
+
+
+def test_folder_mode_sinks_stray_top_level_backups_and_drops_undated():
+    items = [
+        _item(BASE, "2024-03-08_02.00"),
+        _item(DAILY, "2024-03-07_02.00"),
+        _item(DAILY, None, name="notes.tar"),
+    ]
+    plan = _plan(items, True, daily=5)
+    assert plan["moves"] == [
+        {"path": f"{BASE}/ha_2024-03-08_02.00_full.tar", "dest": DAILY, "ondup": "overwrite"}
+    ]
+    assert plan["deletes"] == [f"{DAILY}/notes.tar"]
+    assert plan["kept"] == {DAILY: 2}
+
+
+class _ManifestClient:
+    def __init__(self, listings):
+        self.listings = listings
+        self.listed = []
+        self.uploads = {}
+
+    def list_backup_files(self, remote_dir):
+        self.listed.append(remote_dir)
+        return self.listings.get(remote_dir, [])
+
+    def upload_bytes(self, data, remote_dir, name):
+        self.uploads[name] = data.decode("utf-8")
+        return True
+
+
+def test_manifest_lists_folders_the_plan_did_not_cover(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "_MANIFEST_STATE_FILE", str(tmp_path / "state.json"))
+    client = _ManifestClient({MONTHLY: [_item(MONTHLY, "2024-01-31_02.00")]})
+    entries = [retention._manifest_entry(r, r.path, "daily")
+               for r in build_records([_item(DAILY, "2024-03-08_02.00")])]
+
+    info = generate_manifest(client, BASE, entries, listed_dirs=[BASE, DAILY, WEEKLY])
+    assert sorted(client.listed) == sorted([MONTHLY, f"{BASE}/每年"])
+    assert info["file_count"] == 2
+    backups = json.loads(client.uploads[retention.MANIFEST_JSON_NAME])["backups"]
+    assert [b["path"] for b in backups] == [
+        f"{DAILY}/ha_2024-03-08_02.00_full.tar",
+        f"{MONTHLY}/ha_2024-01-31_02.00_full.tar",
+    ]
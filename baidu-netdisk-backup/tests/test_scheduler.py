@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from scheduler import (
+    JOB_DONE,
+    REASON_MANUAL,
+    REASON_NEW_BACKUP,
+    REASON_SCHEDULE,
+    Scheduler,
+)
+
+
+class FakeCron:
+    """Fires at the given times only (far future afterwards)."""
+
+    expr = "fake"
+
+    def __init__(self, *fires: datetime) -> None:
+        self.fires = sorted(fires)
+
+    def next_fire(self, now: datetime) -> datetime:
+        for t in self.fires:
+            if t > now:
+                return t
+        return now + timedelta(days=365)
+
+
+def _wait_for(pred, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _scheduler(cron, job_seconds=0.0):
+    ran = []
+    release = threading.Event()
+
+    def run_job(reason):
+        ran.append(reason)
+        if job_seconds:
+            release.wait(job_seconds)
+        return {"reason": reason}
+
+    sched = Scheduler(lambda: cron, run_job)
+    return sched, ran, release
+
+
+def test_cron_fire_during_upload_only_job_is_not_lost():
+    cron = FakeCron(datetime.now() + timedelta(seconds=0.3))
+    sched, ran, _ = _scheduler(cron, job_seconds=0.8)
+    sched.trigger(REASON_NEW_BACKUP)
+    sched.start()
+    try:
+        assert _wait_for(lambda: ran == [REASON_NEW_BACKUP, REASON_SCHEDULE])
+    finally:
+        sched.stop()
+
+
+def test_scheduled_run_does_not_requeue_itself():
+    cron = FakeCron(datetime.now() + timedelta(seconds=0.2))
+    sched, ran, _ = _scheduler(cron, job_seconds=0.3)
+    sched.start()
+    try:
+        assert _wait_for(lambda: ran == [REASON_SCHEDULE])
+        assert _wait_for(lambda: sched.running is None)
+        time.sleep(0.3)
+        assert ran == [REASON_SCHEDULE]
+    finally:
+        sched.stop()
+
+
+def test_request_run_joins_running_full_cycle():
+    sched, ran, release = _scheduler(FakeCron(), job_seconds=5)
+    sched.start()
+    try:
+        job, merged = sched.request_run(REASON_MANUAL)
+        assert not merged
+        assert _wait_for(lambda: sched.running == REASON_MANUAL)
+        again, merged = sched.request_run(REASON_MANUAL)
+        assert merged and again["id"] == job["id"]
+        release.set()
+        assert _wait_for(lambda: sched.job(job["id"])["status"] == JOB_DONE)
+        assert ran == [REASON_MANUAL]
+    finally:
+        sched.stop()
+
+
+def test_upload_only_job_does_not_satisfy_request_run():
+    sched, ran, release = _scheduler(FakeCron(), job_seconds=5)
+    sched.trigger(REASON_NEW_BACKUP)
+    sched.start()
+    try:
+        assert _wait_for(lambda: sched.running == REASON_NEW_BACKUP)
+        job, merged = sched.request_run(REASON_MANUAL)
+        assert not merged
+        release.set()
+        assert _wait_for(lambda: ran == [REASON_NEW_BACKUP, REASON_MANUAL])
+    finally:
+        sched.stop()
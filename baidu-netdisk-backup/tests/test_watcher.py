@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+import watcher
+from watcher import BackupWatcher
+
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(watcher, "STABLE_SECONDS", 0.05)
+    monkeypatch.setattr(watcher, "UNCLOSED_STABLE_SECONDS", 0.2)
+    monkeypatch.setattr(watcher, "DEBOUNCE_SECONDS", 0.0)
+
+
+def _watcher(tmp_path):
+    ready = []
+    return BackupWatcher(ready.extend, backup_dir=str(tmp_path)), ready
+
+
+def test_closed_file_reported_after_stable_window(tmp_path, fast):
+    w, ready = _watcher(tmp_path)
+    (tmp_path / "a.tar").write_bytes(b"x" * 10)
+    w._touch("a.tar", closed=True)
+    w._check_pending(need_close=True)
+    assert "a.tar" in w._pending
+    time.sleep(0.06)
+    w._check_pending(need_close=True)
+    w._flush_ready()
+    assert ready == ["a.tar"] and not w._pending
+
+
+def test_unclosed_file_is_reported_and_evicted(tmp_path, fast):
+    w, ready = _watcher(tmp_path)
+    (tmp_path / "b.tar").write_bytes(b"x" * 10)
+    w._touch("b.tar")
+    time.sleep(0.06)
+    w._check_pending(need_close=True)
+    assert ready == [] and "b.tar" in w._pending
+    # past STABLE_SECONDS the next deadline is the unclosed fallback, not "now"
+    assert w._tick_timeout(default=60.0, need_close=True) > 0.1
+    time.sleep(0.16)
+    w._check_pending(need_close=True)
+    w._flush_ready()
+    assert ready == ["b.tar"] and not w._pending
+    assert w._tick_timeout(default=60.0, need_close=True) == 60.0
+
+
+def test_growing_file_is_rearmed(tmp_path, fast):
+    w, ready = _watcher(tmp_path)
+    path = tmp_path / "c.tar"
+    path.write_bytes(b"x")
+    w._touch("c.tar", closed=True)
+    time.sleep(0.06)
+    path.write_bytes(b"xx")
+    w._check_pending(need_close=True)
+    assert "c.tar" in w._pending and not w._ready
+    time.sleep(0.06)
+    w._check_pending(need_close=True)
+    assert w._ready == {"c.tar"}
+
+
+def test_deleted_pending_file_is_dropped(tmp_path, fast):
+    w, _ = _watcher(tmp_path)
+    path = tmp_path / "d.tar"
+    path.write_bytes(b"x")
+    w._touch("d.tar")
+    path.unlink()
+    w._check_pending(need_close=True)
+    assert not w._pending
+    assert w._tick_timeout(default=5.0, need_close=True) == 5.0
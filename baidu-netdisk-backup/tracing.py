@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Lightweight per-cycle tracing spans with Chrome trace-event export.
+
+``trace_cycle()`` opens a trace for one scheduler job; ``span()`` records a
+timed section (hashing, API calls, retention phases, notifications...) into
+the active trace from any thread.  The last ``TRACE_RING`` traces are kept in
+memory and exported as Chrome trace-event JSON (open in ``chrome://tracing``,
+Perfetto or speedscope).
+
+Jobs never overlap (see ``scheduler.Scheduler``), so a single process-wide
+active trace is enough; spans outside a traced job are dropped at the cost of
+one attribute check.
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+TRACE_RING: int = 10         # 保留最近 N 个周期
+MAX_SPANS: int = 50000       # 单个周期的 span 上限（超出后丢弃并计数）
+
+
+class Trace:
+    __slots__ = ("name", "started", "t0", "duration", "spans", "dropped", "args", "_lock")
+
+    def __init__(self, name: str, args: Dict[str, Any]) -> None:
+        self.name: str = name
+        self.started: float = time.time()
+        self.t0: float = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[tuple] = []   # (name, cat, start_us, dur_us, tid, args)
+        self.dropped: int = 0
+        self.args: Dict[str, Any] = args
+        self._lock = threading.Lock()
+
+    def add(self, name: str, cat: str, start: float, end: float, args: Dict[str, Any]) -> None:
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                return
+            self.spans.append((
+                name, cat,
+                (start - self.t0) * 1e6, (end - start) * 1e6,
+                threading.get_ident(), args,
+            ))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "started": self.started,
+            "duration": self.duration,
+            "spans": len(self.spans),
+            "dropped": self.dropped,
+            **self.args,
+        }
+
+
+_active: Optional[Trace] = None
+_traces: Deque[Trace] = deque(maxlen=TRACE_RING)
+_traces_lock = threading.Lock()
+_thread_names: Dict[int, str] = {}
+
+
+@contextmanager
+def trace_cycle(name: str, **args: Any) -> Iterator[Trace]:
+    """Collect every span recorded during the ``with`` block into a new trace."""
+    global _active
+    trace = Trace(name, args)
+    _active = trace
+    try:
+        with span(name, cat="cycle", **args):
+            yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace.t0
+        _active = None
+        with _traces_lock:
+            _traces.append(trace)
+
+
+@contextmanager
+def span(name: str, cat: str = "", **args: Any) -> Iterator[None]:
+    """Time the ``with`` block as a span of the active trace (no-op without one)."""
+    trace = _active
+    if trace is None:
+        yield
+        return
+    tid = threading.get_ident()
+    if tid not in _thread_names:
+        _thread_names[tid] = threading.current_thread().name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, cat, start, time.perf_counter(), args)
+
+
+def traced(name: str, cat: str = "") -> Callable[[F], F]:
+    """Decorator form of :func:`span`."""
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*a: Any, **kw: Any) -> Any:
+            if _active is None:
+                return func(*a, **kw)
+            with span(name, cat):
+                return func(*a, **kw)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def list_traces() -> List[Dict[str, Any]]:
+    """Summaries of the buffered traces, newest first."""
+    with _traces_lock:
+        traces = list(_traces)
+    return [dict(t.summary(), index=i) for i, t in reversed(list(enumerate(traces)))]
+
+
+def export_chrome(index: Optional[int] = None) -> Dict[str, Any]:
+    """Chrome trace-event JSON for one buffered trace (*index*) or all of them.
+
+    Each cycle becomes its own "process" so several cycles can be compared
+    side by side in the viewer.
+    """
+    with _traces_lock:
+        traces = list(_traces)
+    if index is not None:
+        traces = traces[index:index + 1] if 0 <= index < len(traces) else []
+
+    events: List[Dict[str, Any]] = []
+    for pid, trace in enumerate(traces, start=1):
+        label = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(trace.started))
+        events.append({
+            "ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+            "args": {"name": f"{trace.name} @ {label}"},
+        })
+        tids = set()
+        for name, cat, ts, dur, tid, args in list(trace.spans):
+            tids.add(tid)
+            events.append({
+                "name": name, "cat": cat or "default", "ph": "X",
+                "ts": round(ts, 1), "dur": round(dur, 1),
+                "pid": pid, "tid": tid, "args": args,
+            })
+        for tid in tids:
+            events.append({
+                "ph": "M", "name": "thread_name", "pid": pid, "tid": tid,
+                "args": {"name": _thread_names.get(tid, str(tid))},
+            })
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"host_pid": os.getpid(), "traces": len(traces)},
+    }
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Watch the local backup directory and report newly completed ``.tar`` files.
+
+Linux inotify is used through ``ctypes`` (no extra dependency); when it is
+unavailable (non-Linux, exhausted watches, restricted container) the watcher
+falls back to polling the directory with ``os.scandir``.
+
+A new backup is only reported once it is complete:
+
+* inotify mode — ``IN_CLOSE_WRITE`` (written in place) or ``IN_MOVED_TO``
+  (renamed into place) was seen, **and** the size has been stable for
+  ``STABLE_SECONDS``; a file that never gets a close event (the writer died
+  or the event was lost) is reported once size and mtime have been stable
+  for ``UNCLOSED_STABLE_SECONDS``;
+* polling mode — size and mtime have been stable for ``STABLE_SECONDS``.
+
+Completed files are collected for ``DEBOUNCE_SECONDS`` after the last one so
+a burst of backups (e.g. full + partial) results in a single ``on_ready``
+callback.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from client import log
+
+BACKUP_DIR: str = "/backup"
+STABLE_SECONDS: float = 10.0     # size must not change for this long
+UNCLOSED_STABLE_SECONDS: float = 300.0  # ... without a close event (inotify mode)
+DEBOUNCE_SECONDS: float = 30.0   # wait this long after the last completed file
+POLL_INTERVAL: float = 30.0      # scandir interval in polling mode
+
+# <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MOVED_FROM = 0x00000040
+_IN_Q_OVERFLOW = 0x00004000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _open_inotify(path: str) -> Optional[int]:
+    """inotify fd watching *path*, or None when inotify is unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(_IN_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM
+        if libc.inotify_add_watch(fd, path.encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _scan(path: str) -> Dict[str, Tuple[int, float]]:
+    """``{name: (size, mtime)}`` of ``.tar`` files in *path*."""
+    out: Dict[str, Tuple[int, float]] = {}
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.endswith(".tar") and entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    out[entry.name] = (st.st_size, st.st_mtime)
+    except OSError:
+        pass
+    return out
+
+
+class BackupWatcher:
+    """Calls ``on_ready(names)`` when new backups in *backup_dir* are complete."""
+
+    def __init__(
+        self,
+        on_ready: Callable[[List[str]], None],
+        backup_dir: str = BACKUP_DIR,
+    ) -> None:
+        self.on_ready = on_ready
+        self.backup_dir: str = backup_dir
+        # name → (size, mtime, stable_since, closed)
+        self._pending: Dict[str, Tuple[int, float, float, bool]] = {}
+        self._ready: Set[str] = set()
+        self._last_ready: float = 0.0
+        self._known: Dict[str, Tuple[int, float]] = {}
+        self._stop = threading.Event()
+        self.mode: Optional[str] = None
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def start(self) -> Optional[threading.Thread]:
+        if not os.path.isdir(self.backup_dir):
+            log(f"Backup watcher disabled: {self.backup_dir} does not exist")
+            return None
+        t = threading.Thread(target=self.run, name="backup-watcher", daemon=True)
+        t.start()
+        return t
+
+    # ------------------------------------------------------------------
+    # State machine shared by both modes
+    # ------------------------------------------------------------------
+    def _touch(self, name: str, closed: bool = False) -> None:
+        """(Re)start the stability clock for *name*."""
+        path = os.path.join(self.backup_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._pending.pop(name, None)
+            return
+        prev = self._pending.get(name)
+        closed = closed or bool(prev and prev[3])
+        self._pending[name] = (st.st_size, st.st_mtime, time.monotonic(), closed)
+
+    @staticmethod
+    def _deadline(since: float, closed: bool, need_close: bool) -> float:
+        return since + (UNCLOSED_STABLE_SECONDS if need_close and not closed else STABLE_SECONDS)
+
+    def _check_pending(self, need_close: bool) -> None:
+        now = time.monotonic()
+        for name, (size, mtime, since, closed) in list(self._pending.items()):
+            try:
+                st = os.stat(os.path.join(self.backup_dir, name))
+            except OSError:
+                del self._pending[name]
+                continue
+            if st.st_size != size or st.st_mtime != mtime:
+                self._pending[name] = (st.st_size, st.st_mtime, now, closed)
+                continue
+            if now < self._deadline(since, closed, need_close):
+                continue
+            if need_close and not closed:
+                log(f"No close event for {name}; size unchanged for "
+                    f"{UNCLOSED_STABLE_SECONDS:.0f}s, treating it as complete")
+            del self._pending[name]
+            self._known[name] = (st.st_size, st.st_mtime)
+            self._ready.add(name)
+            self._last_ready = now
+            log(f"New backup complete: {name} ({st.st_size / 1024 / 1024:.1f} MB)")
+
+    def _flush_ready(self) -> None:
+        if not self._ready or time.monotonic() - self._last_ready < DEBOUNCE_SECONDS:
+            return
+        names = sorted(self._ready)
+        self._ready.clear()
+        try:
+            self.on_ready(names)
+        except Exception as e:
+            log(f"Backup watcher callback error: {e}")
+
+    def _tick_timeout(self, default: float, need_close: bool) -> float:
+        """Seconds until the next stability / debounce deadline (*default* if none).
+
+        Every pending file is either re-armed or reported once its deadline
+        passes, so no deadline stays in the past and the loop never spins.
+        """
+        now = time.monotonic()
+        deadlines = [
+            self._deadline(since, closed, need_close)
+            for _, _, since, closed in self._pending.values()
+        ]
+        if self._ready:
+            deadlines.append(self._last_ready + DEBOUNCE_SECONDS)
+        if not deadlines:
+            return default
+        return max(0.5, min(min(deadlines) - now, default))
+
+    # ------------------------------------------------------------------
+    # Loops
+    # ------------------------------------------------------------------
+    def run(self) -> None:
+        self._known = _scan(self.backup_dir)
+        fd = _open_inotify(self.backup_dir)
+        if fd is None:
+            self.mode = "poll"
+            log(f"Backup watcher: polling {self.backup_dir} every {POLL_INTERVAL:.0f}s")
+            self._run_poll()
+        else:
+            self.mode = "inotify"
+            log(f"Backup watcher: inotify on {self.backup_dir}")
+            try:
+                self._run_inotify(fd)
+            finally:
+                os.close(fd)
+
+    def _run_inotify(self, fd: int) -> None:
+        while not self._stop.is_set():
+            timeout = self._tick_timeout(default=60.0, need_close=True)
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if readable:
+                buf = os.read(fd, 64 * 1024)
+                off = 0
+                while off + _EVENT_HEADER.size <= len(buf):
+                    _, mask, _, nlen = _EVENT_HEADER.unpack_from(buf, off)
+                    raw = buf[off + _EVENT_HEADER.size: off + _EVENT_HEADER.size + nlen]
+                    off += _EVENT_HEADER.size + nlen
+                    name = raw.rstrip(b"\0").decode("utf-8", "surrogateescape")
+                    if mask & _IN_Q_OVERFLOW:
+                        self._rescan()
+                        continue
+                    if not name.endswith(".tar"):
+                        continue
+                    if mask & (_IN_DELETE | _IN_MOVED_FROM):
+                        self._pending.pop(name, None)
+                        self._known.pop(name, None)
+                    elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                        self._touch(name, closed=True)
+                    elif mask & _IN_CREATE:
+                        self._touch(name)
+            self._check_pending(need_close=True)
+            self._flush_ready()
+
+    def _rescan(self) -> None:
+        """Event queue overflowed: diff against a fresh scan (treated as closed)."""
+        for name, sig in _scan(self.backup_dir).items():
+            if self._known.get(name) != sig and name not in self._pending:
+                self._touch(name, closed=True)
+
+    def _run_poll(self) -> None:
+        while not self._stop.is_set():
+            current = _scan(self.backup_dir)
+            for name, sig in current.items():
+                if self._known.get(name) == sig:
+                    continue
+                prev = self._pending.get(name)
+                if prev is None or prev[:2] != sig:
+                    self._pending[name] = (sig[0], sig[1], time.monotonic(), True)
+            for name in list(self._known):
+                if name not in current:
+                    del self._known[name]
+            self._check_pending(need_close=False)
+            self._flush_ready()
+            self._stop.wait(self._tick_timeout(default=POLL_INTERVAL, need_close=False))
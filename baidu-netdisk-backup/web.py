@@ -1,17 +1,31 @@
 #!/usr/bin/env python3
 """Web UI — 配置编辑 + 通知测试（中文界面）。"""
+import copy
 import json
 import os
 import threading
+import time
+import urllib.parse
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 import requests
 
+from catalog import SORT_KEYS, BackupCatalog
 from client import log
-from notifier import test_notification
+from history import get_history
+from logs import DEBUG, debug, parse_level, tail as log_tail, warning
+from metrics import REGISTRY
+from notifier import dispatcher as notify_dispatcher, test_notification
+from progress import feed as progress_feed
+from scheduler import REASON_MANUAL, Scheduler
+from tracing import export_chrome, list_traces
 
 CONFIG_PATH = "/data/options.json"
+SUPERVISOR_URL = "http://supervisor"
+OPTIONS_TTL = 10.0          # 配置缓存有效期（秒）；保存配置时立即失效
+TOKEN_RETRY_INTERVAL = 60.0  # 未找到 Supervisor Token 时，多久后重新探测
+SSE_KEEPALIVE = 15.0         # SSE 空闲时发送注释行的间隔（秒）
 CHANNELS = ["email", "wechat", "dingtalk", "feishu"]
 CHANNEL_LABELS = {
     "email": "邮箱 (SMTP)",
@@ -38,25 +52,95 @@ def register_config_reload_callback(callback) -> None:
     t.start()
 
 
+# 立即同步：由 main.py 注册调度器，Web 线程只负责排队和查询，不在请求线程中执行
+_scheduler: Optional[Scheduler] = None
+
+
+def register_scheduler(scheduler: Scheduler) -> None:
+    """供 main.py 注册调度器，启用 POST /api/run 与 /api/jobs。"""
+    global _scheduler
+    _scheduler = scheduler
+
+
+# 远端备份浏览：只读本地 catalog 的内存索引，页面加载不会列举网盘目录
+_catalog: Optional[BackupCatalog] = None
+_get_upload_path: Optional[Callable[[], str]] = None
+
+
+def register_catalog(catalog: Optional[BackupCatalog], get_upload_path: Callable[[], str]) -> None:
+    """供 main.py 注册 catalog 与当前 upload_path，启用 GET /api/backups。"""
+    global _catalog, _get_upload_path
+    _catalog = catalog
+    _get_upload_path = get_upload_path
+
+
+# ============================================================================
+# 配置 / Token 缓存 — 页面加载不再每次扫描 env 文件并同步请求 Supervisor
+# ============================================================================
+_cache_lock = threading.Lock()
+_options_cache: Optional[Dict[str, Any]] = None
+_options_cached_at: float = 0.0
+_token_cache: Optional[str] = None
+_token_checked_at: float = 0.0
+_session: Optional[requests.Session] = None
+
+
+def _supervisor_session() -> requests.Session:
+    """Pooled (keep-alive) session for Supervisor API calls."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
+def _cached_supervisor_token() -> str:
+    """SUPERVISOR_TOKEN, looked up once (re-probed every TOKEN_RETRY_INTERVAL if missing)."""
+    global _token_cache, _token_checked_at
+    now = time.monotonic()
+    if _token_cache is None or (
+        not _token_cache and now - _token_checked_at >= TOKEN_RETRY_INTERVAL
+    ):
+        _token_cache = _get_supervisor_token()
+        _token_checked_at = now
+    return _token_cache
+
+
+def _invalidate_options() -> None:
+    global _options_cache
+    with _cache_lock:
+        _options_cache = None
+
+
 def _load_options() -> Dict[str, Any]:
+    """Cached options (``OPTIONS_TTL``); callers get their own copy."""
+    global _options_cache, _options_cached_at
+    with _cache_lock:
+        # 持锁获取：并发的页面请求共用一次 Supervisor 调用
+        if _options_cache is None or time.monotonic() - _options_cached_at >= OPTIONS_TTL:
+            _options_cache = _fetch_options()
+            _options_cached_at = time.monotonic()
+        return copy.deepcopy(_options_cache)
+
+
+def _fetch_options() -> Dict[str, Any]:
     """Load options: Supervisor API first (authoritative), fallback to file."""
-    token = _get_supervisor_token()
+    token = _cached_supervisor_token()
     if token:
         try:
-            r = requests.get(
-                "http://supervisor/addons/self/info",
+            r = _supervisor_session().get(
+                f"{SUPERVISOR_URL}/addons/self/info",
                 headers={"Authorization": f"Bearer {token}"},
                 timeout=5,
             )
-            log(f"[debug] GET /addons/self/info → {r.status_code}")
             if r.status_code == 200:
                 data = r.json()
                 opts = data.get("data", {}).get("options", {})
-                log(f"[debug] API 返回 {len(opts)} 个配置项")
                 if opts:
                     return opts
+            else:
+                debug("GET /addons/self/info → %s", r.status_code)
         except Exception as e:
-            log(f"[debug] API 读取失败: {e}")
+            warning("API 读取失败: %s", e)
     # fallback
     try:
         with open(CONFIG_PATH, "r", encoding="utf-8") as f:
@@ -100,18 +184,20 @@ def _get_supervisor_token() -> str:
 
 def _save_options(opts: Dict[str, Any]) -> None:
     """Save options: try Supervisor API (syncs to HA native UI), fallback to file."""
-    token = _get_supervisor_token()
+    _invalidate_options()
+    token = _cached_supervisor_token()
     if token:
         log(f"Web UI: 检测到 Supervisor Token（{len(token)} 字符），尝试 API 同步")
         try:
-            r = requests.post(
-                "http://supervisor/addons/self/options",
+            r = _supervisor_session().post(
+                f"{SUPERVISOR_URL}/addons/self/options",
                 headers={"Authorization": f"Bearer {token}"},
                 json={"options": opts},
                 timeout=10,
             )
             if r.status_code == 200:
                 log("Web UI: 配置已同步保存（HA 原生设置页已更新）")
+                _invalidate_options()
                 _config_reload_event.set()
                 return
             log(f"Supervisor API 返回 {r.status_code}，改用文件写入")
@@ -126,11 +212,23 @@ def _save_options(opts: Dict[str, Any]) -> None:
         json.dump(opts, f, ensure_ascii=False, indent=2)
     os.replace(tmp, CONFIG_PATH)
     log("Web UI: 配置已保存到文件")
+    _invalidate_options()
     _config_reload_event.set()
 
 
 
 
+# 各页面共用的前端工具函数（插入到每个页面的 <script> 开头）
+_COMMON_JS = r"""function esc(s) { return String(s).replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c])); }
+function fmtBytes(n) {
+  if (n == null) return '-';
+  if (n >= 1073741824) return (n / 1073741824).toFixed(2) + ' GB';
+  if (n >= 1048576) return (n / 1048576).toFixed(1) + ' MB';
+  return (n / 1024).toFixed(1) + ' KB';
+}
+function fmtTime(t) { return t ? new Date(t * 1000).toLocaleString('zh-CN', {hour12: false}) : '-'; }"""
+
+
 _HTML = r"""<!doctype html>
 <html lang="zh-CN"><head>
 <meta charset="utf-8">
@@ -151,7 +249,7 @@ h1{font-size:1.4rem;margin:0 0 4px}
 .field{display:grid;grid-template-columns:160px 1fr;gap:10px;align-items:center;margin-bottom:9px}
 .field label{color:#888;font-size:.88rem}
 .field .desc{color:#888;font-size:.78rem;grid-column:2;margin-top:-4px}
-.field input[type=text],.field input[type=number],.field input[type=password]{
+.field input[type=text],.field input[type=number],.field input[type=password],.field select{
   width:100%;padding:7px 10px;border:1px solid #8884;border-radius:5px;
   background:transparent;color:inherit;font-size:.92rem;font-family:inherit;box-sizing:border-box}
 .field input[type=checkbox]{transform:scale(1.15)}
@@ -176,24 +274,44 @@ code{background:#8884;padding:1px 5px;border-radius:3px}
 .actions .inner{max-width:860px;margin:0 auto;display:flex;gap:10px;align-items:center;flex-wrap:wrap;width:100%}
 .actions .grow{flex:1}
 body{padding-bottom:90px}  /* 给底部按钮栏留空间 */
+#progress-card{display:none}
+.bar{height:8px;border-radius:4px;background:#8883;overflow:hidden;margin:6px 0}
+.bar>div{height:100%;width:0;background:#1f6feb;transition:width .3s}
+.bar.done>div{background:#1f8b4c}.bar.failed>div{background:#d62b2b}
+.pmeta{color:#888;font-size:.85rem}
 @media (max-width:600px){.field{grid-template-columns:1fr}.field label{margin-bottom:2px}}
 </style></head><body>
 <h1>百度网盘备份</h1>
 <div class="sub">所有配置项均可在此修改并保存；通知渠道支持【测试发送】实时验证。</div>
 
+<div class="card" id="progress-card">
+  <div class="section-title"><span>上传进度</span><span class="state" id="p-stage"></span></div>
+  <div id="p-file"></div>
+  <div class="bar" id="p-bar"><div></div></div>
+  <div class="pmeta" id="p-meta"></div>
+</div>
+
+<div class="card" id="notify-card" style="display:none">
+  <div class="section-title"><span>最近通知</span></div>
+  <div id="notify-list" class="pmeta"></div>
+</div>
+
 <div id="config-form"></div>
 
 <div class="actions">
   <div class="inner">
+    <span class="pmeta" id="run-status"></span>
     <div class="grow"></div>
+    <button class="secondary" id="btn-run">立即同步</button>
     <button class="secondary" id="btn-reload">重新加载</button>
     <button class="big" id="btn-save">保存配置</button>
   </div>
 </div>
 <div class="result" id="r-save"></div>
-<div class="foot">保存后配置<strong>立即生效</strong>（无需重启）。测试通知按钮基于<b>当前已保存</b>的配置发送，未保存的修改不影响测试结果。<br>注意：本页面保存的配置不会同步到 HA 原生【配置】标签页；如需一致，请在两个页面分别保存。</div>
+<div class="foot">保存后配置<strong>立即生效</strong>（无需重启）。测试通知按钮基于<b>当前已保存</b>的配置发送，未保存的修改不影响测试结果。<br>注意：本页面保存的配置不会同步到 HA 原生【配置】标签页；如需一致，请在两个页面分别保存。<br><a href="./backups">网盘中的备份</a> · <a href="./logs">实时日志</a> · <a href="./history">运行历史与性能趋势</a> · 性能分析：<a href="./api/trace" download>下载最近同步周期的追踪文件</a>（Chrome trace 格式，可在 <code>chrome://tracing</code> 或 ui.perfetto.dev 中打开）。</div>
 
 <script>
+__COMMON_JS__
 const CHANNELS = __CHANNELS_JSON__;
 const CHANNEL_LABELS = __CHANNEL_LABELS_JSON__;
 
@@ -206,15 +324,20 @@ const FIELDS = [
     {key: 'refresh_token', label: 'refresh_token', type: 'password', desc: '百度 OAuth 授权刷新令牌（必填）'},
     {key: 'upload_path', label: '上传路径', type: 'text', desc: '网盘中的目标目录，例如 /HomeAssistant/Backup'},
     {key: 'schedule', label: '定时任务 (Cron)', type: 'text', desc: '5 字段 Cron，例如 0 5 * * * 表示每天凌晨 5 点'},
+    {key: 'log_level', label: '日志级别', type: 'select', options: ['debug', 'info', 'warning', 'error'], default: 'info', desc: 'debug 会额外输出每个上传分片和网盘文件列表'},
   ]},
   {section: '远端保留策略 (retention)', items: [
-    {key: 'retention.use_folders', label: '启用目录模式', type: 'bool', desc: '开启后按 每日/每周/每月 三个中文目录分类存放'},
+    {key: 'retention.use_folders', label: '启用目录模式', type: 'bool', desc: '开启后按 每日/每周/每月/每年 中文目录分类存放'},
+    {key: 'retention.hourly', label: '每小时保留份数', type: 'number', desc: '同一小时只保留最新（存放在 每日/ 中）；<=0 表示不启用'},
     {key: 'retention.daily', label: '每日保留份数', type: 'number', desc: '同一天多份只保留最新；<=0 表示不启用'},
     {key: 'retention.weekly', label: '每周保留份数', type: 'number', desc: '同一周只保留最新；<=0 表示不启用'},
     {key: 'retention.monthly', label: '每月保留份数', type: 'number', desc: '同一月只保留最新；<=0 表示不启用'},
+    {key: 'retention.yearly', label: '每年保留份数', type: 'number', desc: '同一年只保留最新（目录模式下存放在 每年/）；<=0 表示不启用'},
+    {key: 'retention.dry_run', label: '演练模式', type: 'bool', desc: '只在日志中输出保留计划（移动/删除/请求数），不实际执行'},
   ]},
   {section: '通知 — 全局', items: [
     {key: 'notifications.enabled', label: '启用通知', type: 'bool', desc: '全局开关；关闭后所有渠道都不发送'},
+    {key: 'notifications.digest', label: '汇总模式', type: 'bool', desc: '每个同步周期只发送一条合并通知（备份失败仍立即发送），避免触发机器人频率限制'},
   ]},
   {section: '通知 — 事件开关 (events)', items: [
     {key: 'notifications.events.backup_success', label: '备份成功', type: 'bool'},
@@ -267,7 +390,6 @@ function setPath(obj, path, value) {
   cur[last] = value;
 }
 function inputId(key) { return 'f_' + key.replace(/\./g, '_'); }
-function esc(s) { return String(s).replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c])); }
 
 async function renderConfig() {
   const [cRes, sRes] = await Promise.all([fetch('./api/config'), fetch('./api/state')]);
@@ -300,6 +422,16 @@ async function renderConfig() {
           <div><input type="checkbox" id="${id}" data-key="${f.key}" data-type="bool" ${cur ? 'checked' : ''}></div>
           ${f.desc ? `<div class="desc">${esc(f.desc)}</div>` : ''}
         </div>`;
+      } else if (f.type === 'select') {
+        // 与 config.yaml 中 list(...) 类型一致，只允许 schema 接受的取值
+        const val = f.options.includes(cur) ? cur : f.default;
+        const opts = f.options.map(o =>
+          `<option value="${esc(o)}"${o === val ? ' selected' : ''}>${esc(o)}</option>`).join('');
+        html += `<div class="field">
+          <label for="${id}">${esc(f.label)}</label>
+          <select id="${id}" data-key="${f.key}" data-type="select">${opts}</select>
+          ${f.desc ? `<div class="desc">${esc(f.desc)}</div>` : ''}
+        </div>`;
       } else {
         const t = (f.type === 'number' || f.type === 'percent') ? 'number' : (f.type === 'password' ? 'password' : 'text');
         const step = f.step ? ` step="${f.step}"` : (f.type === 'percent' ? ' step="1" min="0" max="100"' : '');
@@ -384,9 +516,297 @@ document.getElementById('btn-save').addEventListener('click', async () => {
   }
 });
 
+// ============= 立即同步（任务轮询） =============
+const JOB_LABELS = {queued: '排队中', running: '同步中', done: '已完成', failed: '失败'};
+async function pollJob(id) {
+  const st = document.getElementById('run-status');
+  const btn = document.getElementById('btn-run');
+  try {
+    const data = await (await fetch('./api/jobs/' + encodeURIComponent(id))).json();
+    if (!data.ok) { st.textContent = data.message || ''; btn.disabled = false; return; }
+    const job = data.job;
+    st.textContent = `同步任务 ${job.id}：${JOB_LABELS[job.status] || job.status}` + (job.error ? ` — ${job.error}` : '');
+    if (job.status === 'queued' || job.status === 'running') { setTimeout(() => pollJob(id), 2000); return; }
+  } catch (e) {
+    st.textContent = '查询任务状态失败：' + e;
+  }
+  btn.disabled = false;
+}
+document.getElementById('btn-run').addEventListener('click', async () => {
+  const btn = document.getElementById('btn-run');
+  btn.disabled = true;
+  try {
+    const data = await (await fetch('./api/run', {method: 'POST'})).json();
+    if (!data.ok) { document.getElementById('run-status').textContent = data.message || ''; btn.disabled = false; return; }
+    pollJob(data.job.id);
+  } catch (e) {
+    document.getElementById('run-status').textContent = '请求失败：' + e;
+    btn.disabled = false;
+  }
+});
+
+// ============= 上传进度（SSE） =============
+const STAGE_LABELS = {hashing: '计算 MD5', precreate: '预创建', uploading: '上传中', merging: '合并中',
+                      done: '已完成', rapid: '秒传完成', failed: '失败'};
+function showProgress(e) {
+  document.getElementById('progress-card').style.display = 'block';
+  document.getElementById('p-stage').textContent = STAGE_LABELS[e.stage] || e.stage;
+  document.getElementById('p-file').textContent = e.file;
+  const bar = document.getElementById('p-bar');
+  bar.className = 'bar' + (e.stage === 'done' || e.stage === 'rapid' ? ' done' : e.stage === 'failed' ? ' failed' : '');
+  bar.firstElementChild.style.width = e.percent + '%';
+  let meta = `${fmtBytes(e.bytes_done)} / ${fmtBytes(e.bytes_total)} (${e.percent}%)`;
+  if (e.stage === 'uploading' && e.speed) meta += ` · ${fmtBytes(e.speed)}/s`;
+  if (e.eta != null) meta += ` · 剩余约 ${Math.ceil(e.eta)} 秒`;
+  if (e.retries) meta += ` · 重试 ${e.retries} 次`;
+  if (e.error) meta += ` · ${e.error}`;
+  document.getElementById('p-meta').textContent = meta;
+}
+if (window.EventSource) {
+  const es = new EventSource('./api/progress/stream');
+  es.addEventListener('progress', ev => showProgress(JSON.parse(ev.data)));
+}
+
+// ============= 最近通知投递结果 =============
+const RESULT_LABELS = {success: '✅', retrying: '🔁 稍后重试', dropped: '❌ 已放弃', collapsed: '↪️ 已合并', pending: '…'};
+async function loadNotifications() {
+  try {
+    const data = await (await fetch('./api/notifications')).json();
+    const list = (data.deliveries || []).slice(0, 5);
+    const pending = Object.entries(data.pending || {});
+    document.getElementById('notify-card').style.display = list.length || pending.length ? 'block' : 'none';
+    document.getElementById('notify-list').innerHTML = pending.map(([ch, p]) =>
+      `<div>⏳ ${esc(CHANNEL_LABELS[ch] || ch)}：${p.count} 条待发送` +
+      (p.last_error ? `（上次失败：${esc(p.last_error)}）` : '') + `</div>`).join('') + list.map(d =>
+      `<div>${new Date(d.queued_at * 1000).toLocaleString('zh-CN', {hour12: false})} · ${esc(d.title)} — ` +
+      Object.entries(d.results).map(([ch, r]) => `${esc(CHANNEL_LABELS[ch] || ch)} ${esc(RESULT_LABELS[r] || r)}`).join('，') +
+      `</div>`).join('');
+  } catch (e) { /* 忽略，下次再试 */ }
+}
+loadNotifications();
+setInterval(loadNotifications, 15000);
+
 renderConfig();
 </script></body></html>
-"""
+""".replace("__COMMON_JS__", _COMMON_JS)
+
+
+_HISTORY_HTML = r"""<!doctype html>
+<html lang="zh-CN"><head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>运行历史 — 百度网盘备份</title>
+<style>
+:root{color-scheme:light dark}
+body{font-family:-apple-system,BlinkMacSystemFont,"Segoe UI","PingFang SC","Microsoft YaHei",sans-serif;
+     max-width:980px;margin:20px auto;padding:0 16px;line-height:1.55}
+h1{font-size:1.4rem;margin:0 0 4px}
+.sub{color:#888;margin-bottom:18px;font-size:.9rem}
+.card{border:1px solid #4443;border-radius:10px;padding:14px 18px;margin-bottom:14px}
+.charts{display:grid;grid-template-columns:repeat(auto-fit,minmax(280px,1fr));gap:14px}
+.chart h3{font-size:.92rem;margin:0 0 6px;font-weight:600}
+.chart svg{width:100%;height:120px}
+.chart .last{color:#888;font-size:.8rem}
+table{width:100%;border-collapse:collapse;font-size:.83rem}
+th,td{padding:5px 6px;border-bottom:1px solid #4442;text-align:right;white-space:nowrap}
+th:first-child,td:first-child,th:nth-child(2),td:nth-child(2){text-align:left}
+.ok{color:#1f8b4c}.err{color:#d62b2b}
+.pager{display:flex;gap:10px;align-items:center;justify-content:flex-end;margin-top:10px}
+button{padding:6px 12px;border:0;border-radius:6px;background:#1f6feb;color:#fff;cursor:pointer;font-family:inherit}
+button:disabled{background:#888;cursor:default}
+a{color:#1f6feb}
+</style></head><body>
+<h1>运行历史</h1>
+<div class="sub"><a href="./">← 返回配置</a> · 每次同步周期 / 新备份即时上传各记录一行</div>
+<div class="card"><div class="charts" id="charts"></div></div>
+<div class="card">
+  <table><thead><tr>
+    <th>开始时间</th><th>类型</th><th>耗时</th><th>上传</th><th>跳过</th><th>失败</th>
+    <th>上传量</th><th>吞吐</th><th>API 请求</th><th>移动/删除</th><th>容量</th><th>结果</th>
+  </tr></thead><tbody id="rows"></tbody></table>
+  <div class="pager"><span id="page-info"></span>
+    <button id="prev">上一页</button><button id="next">下一页</button></div>
+</div>
+<script>
+__COMMON_JS__
+const LIMIT = 50;
+let offset = 0;
+function fmtDur(s) { return s >= 60 ? (s / 60).toFixed(1) + ' 分' : s.toFixed(1) + ' 秒'; }
+function sparkline(title, points, fmt) {
+  const W = 300, H = 110, P = 4;
+  const vals = points.map(p => p[1]).filter(v => v != null);
+  if (!vals.length) return `<div class="chart"><h3>${title}</h3><div class="last">暂无数据</div></div>`;
+  const max = Math.max(...vals) || 1;
+  const n = points.length;
+  const xy = points.map((p, i) => p[1] == null ? null :
+    [P + (n > 1 ? i * (W - 2 * P) / (n - 1) : (W - 2 * P) / 2), H - P - p[1] / max * (H - 2 * P)]);
+  const path = xy.filter(Boolean).map((q, i) => (i ? 'L' : 'M') + q[0].toFixed(1) + ',' + q[1].toFixed(1)).join(' ');
+  const dots = xy.filter(Boolean).map(q => `<circle cx="${q[0].toFixed(1)}" cy="${q[1].toFixed(1)}" r="2" fill="#1f6feb"/>`).join('');
+  const last = vals[vals.length - 1];
+  return `<div class="chart"><h3>${title}</h3>
+    <svg viewBox="0 0 ${W} ${H}" preserveAspectRatio="none"><path d="${path}" fill="none" stroke="#1f6feb" stroke-width="1.5"/>${dots}</svg>
+    <div class="last">最近：${fmt(last)} · 峰值：${fmt(max)}</div></div>`;
+}
+async function load() {
+  const resp = await fetch(`./api/history?limit=${LIMIT}&offset=${offset}`);
+  const data = await resp.json();
+  const runs = data.runs || [];
+  const chron = runs.slice().reverse();
+  const cycles = chron.filter(r => r.kind === 'sync_cycle');
+  document.getElementById('charts').innerHTML = [
+    sparkline('同步周期耗时', cycles.map(r => [r.started_at, r.duration]), fmtDur),
+    sparkline('上传吞吐', chron.map(r => [r.started_at, r.throughput]), v => fmtBytes(v) + '/s'),
+    sparkline('上传量', chron.map(r => [r.started_at, r.bytes_uploaded]), fmtBytes),
+    sparkline('API 请求数', cycles.map(r => [r.started_at, r.api_calls]), v => String(v)),
+    sparkline('网盘已用容量', cycles.map(r => [r.started_at, r.quota_used]), fmtBytes),
+  ].join('');
+  document.getElementById('rows').innerHTML = runs.map(r => `<tr>
+    <td>${fmtTime(r.started_at)}</td>
+    <td>${r.kind === 'sync_cycle' ? '同步周期' : '即时上传'} (${esc(r.reason || '')})</td>
+    <td>${fmtDur(r.duration)}</td><td>${r.files_uploaded}</td><td>${r.files_skipped}</td><td>${r.files_failed}</td>
+    <td>${fmtBytes(r.bytes_uploaded)}</td><td>${r.throughput ? fmtBytes(r.throughput) + '/s' : '-'}</td>
+    <td>${r.api_calls}${r.api_errors ? ` <span class="err">(${r.api_errors} 错误)</span>` : ''}</td>
+    <td>${r.retention_moves}/${r.retention_deletes}</td>
+    <td>${r.quota_total ? (r.quota_used / r.quota_total * 100).toFixed(1) + '%' : '-'}</td>
+    <td class="${r.success ? 'ok' : 'err'}" title="${esc(r.error || '')}">${r.success ? '成功' : '失败'}</td>
+  </tr>`).join('') || '<tr><td colspan="12">暂无记录</td></tr>';
+  const page = Math.floor(offset / LIMIT) + 1, pages = Math.max(1, Math.ceil(data.total / LIMIT));
+  document.getElementById('page-info').textContent = `第 ${page} / ${pages} 页，共 ${data.total} 条`;
+  document.getElementById('prev').disabled = offset <= 0;
+  document.getElementById('next').disabled = offset + LIMIT >= data.total;
+}
+document.getElementById('prev').addEventListener('click', () => { offset = Math.max(0, offset - LIMIT); load(); });
+document.getElementById('next').addEventListener('click', () => { offset += LIMIT; load(); });
+load();
+</script></body></html>
+""".replace("__COMMON_JS__", _COMMON_JS)
+
+
+_LOGS_HTML = r"""<!doctype html>
+<html lang="zh-CN"><head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>实时日志 — 百度网盘备份</title>
+<style>
+:root{color-scheme:light dark}
+body{font-family:-apple-system,BlinkMacSystemFont,"Segoe UI","PingFang SC","Microsoft YaHei",sans-serif;
+     max-width:1100px;margin:20px auto;padding:0 16px;line-height:1.55}
+h1{font-size:1.4rem;margin:0 0 4px}
+.sub{color:#888;margin-bottom:14px;font-size:.9rem}
+.filters{display:flex;gap:10px;align-items:center;margin-bottom:8px;font-size:.88rem}
+select{padding:5px 8px;border-radius:6px;border:1px solid #8886;background:transparent;color:inherit;font-family:inherit}
+#log{font-family:ui-monospace,SFMono-Regular,Menlo,Consolas,monospace;font-size:.78rem;white-space:pre-wrap;
+     border:1px solid #4443;border-radius:10px;padding:10px 12px;height:70vh;overflow:auto}
+.debug{color:#888}.warning{color:#c58a00}.error{color:#d62b2b}
+a{color:#1f6feb}
+</style></head><body>
+<h1>实时日志</h1>
+<div class="sub"><a href="./">← 返回配置</a> · 内存中保留最近 1000 行；当前输出级别：<b id="cur-level"></b>（可在配置中修改 log_level）</div>
+<div class="filters">显示级别：<select id="level">
+  <option value="debug">debug</option><option value="info" selected>info</option>
+  <option value="warning">warning</option><option value="error">error</option>
+</select><label><input type="checkbox" id="follow" checked> 自动滚动</label></div>
+<div id="log"></div>
+<script>
+__COMMON_JS__
+let since = 0;
+const box = document.getElementById('log');
+async function poll() {
+  try {
+    const level = document.getElementById('level').value;
+    const data = await (await fetch(`./api/logs?since=${since}&level=${level}&limit=500`)).json();
+    document.getElementById('cur-level').textContent = data.level;
+    since = data.last_seq;
+    if (data.lines.length) {
+      box.insertAdjacentHTML('beforeend', data.lines.map(l =>
+        `<div class="${l.level}">[${fmtTime(l.time)}] ${esc(l.msg)}</div>`).join(''));
+      while (box.childElementCount > 2000) box.firstElementChild.remove();
+      if (document.getElementById('follow').checked) box.scrollTop = box.scrollHeight;
+    }
+  } catch (e) { /* 下次再试 */ }
+  setTimeout(poll, 2000);
+}
+document.getElementById('level').addEventListener('change', () => { since = 0; box.innerHTML = ''; });
+poll();
+</script></body></html>
+""".replace("__COMMON_JS__", _COMMON_JS)
+
+
+_BACKUPS_HTML = r"""<!doctype html>
+<html lang="zh-CN"><head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>网盘中的备份 — 百度网盘备份</title>
+<style>
+:root{color-scheme:light dark}
+body{font-family:-apple-system,BlinkMacSystemFont,"Segoe UI","PingFang SC","Microsoft YaHei",sans-serif;
+     max-width:980px;margin:20px auto;padding:0 16px;line-height:1.55}
+h1{font-size:1.4rem;margin:0 0 4px}
+.sub{color:#888;margin-bottom:18px;font-size:.9rem}
+.card{border:1px solid #4443;border-radius:10px;padding:14px 18px;margin-bottom:14px}
+.filters{display:flex;gap:10px;align-items:center;flex-wrap:wrap;margin-bottom:10px;font-size:.88rem}
+select{padding:5px 8px;border-radius:6px;border:1px solid #8886;background:transparent;color:inherit;font-family:inherit}
+table{width:100%;border-collapse:collapse;font-size:.83rem}
+th,td{padding:5px 6px;border-bottom:1px solid #4442;text-align:left;white-space:nowrap}
+td.num,th.num{text-align:right}
+th[data-sort]{cursor:pointer}
+.pager{display:flex;gap:10px;align-items:center;justify-content:flex-end;margin-top:10px}
+button{padding:6px 12px;border:0;border-radius:6px;background:#1f6feb;color:#fff;cursor:pointer;font-family:inherit}
+button:disabled{background:#888;cursor:default}
+.muted{color:#888;font-size:.8rem}
+a{color:#1f6feb}
+</style></head><body>
+<h1>网盘中的备份</h1>
+<div class="sub"><a href="./">← 返回配置</a> · 数据来自本地备份目录索引（上传、归档、清理后即时更新，每次同步周期按需重新列举网盘）</div>
+<div class="card">
+  <div class="filters">
+    层级：<select id="tier"><option value="">全部</option></select>
+    <span class="muted" id="indexed"></span>
+  </div>
+  <table><thead><tr>
+    <th data-sort="name">文件名</th><th data-sort="tier">层级</th><th data-sort="time">备份时间</th>
+    <th class="num" data-sort="size">大小</th><th data-sort="path">路径</th>
+  </tr></thead><tbody id="rows"></tbody></table>
+  <div class="pager"><span id="page-info"></span>
+    <button id="prev">上一页</button><button id="next">下一页</button></div>
+</div>
+<script>
+__COMMON_JS__
+const LIMIT = 50;
+const TIER_LABELS = {yearly: '每年', monthly: '每月', weekly: '每周', daily: '每日', hourly: '每小时', none: '未分层'};
+let offset = 0, sort = 'time', order = 'desc';
+async function load() {
+  const tier = document.getElementById('tier').value;
+  const q = `limit=${LIMIT}&offset=${offset}&sort=${sort}&order=${order}` + (tier ? `&tier=${encodeURIComponent(tier)}` : '');
+  const data = await (await fetch('./api/backups?' + q)).json();
+  if (!data.ok) { document.getElementById('rows').innerHTML = `<tr><td colspan="5">${esc(data.message || '加载失败')}</td></tr>`; return; }
+  const sel = document.getElementById('tier');
+  const known = new Set([...sel.options].map(o => o.value));
+  Object.keys(data.tiers).forEach(t => {
+    if (!known.has(t)) sel.add(new Option(TIER_LABELS[t] || t, t));
+  });
+  [...sel.options].forEach(o => { if (o.value) o.textContent = `${TIER_LABELS[o.value] || o.value} (${data.tiers[o.value] || 0})`; });
+  document.getElementById('indexed').textContent = '索引时间：' + fmtTime(data.indexed_at);
+  document.getElementById('rows').innerHTML = data.backups.map(b => `<tr>
+    <td>${esc(b.name)}</td><td>${esc(TIER_LABELS[b.tier || 'none'] || b.tier)}</td>
+    <td>${fmtTime(b.ts || b.server_mtime)}</td><td class="num">${fmtBytes(b.size)}</td>
+    <td class="muted">${esc(b.dir)}</td>
+  </tr>`).join('') || '<tr><td colspan="5">暂无记录（首次同步完成后显示）</td></tr>';
+  const page = Math.floor(offset / LIMIT) + 1, pages = Math.max(1, Math.ceil(data.total / LIMIT));
+  document.getElementById('page-info').textContent = `第 ${page} / ${pages} 页，共 ${data.total} 个备份`;
+  document.getElementById('prev').disabled = offset <= 0;
+  document.getElementById('next').disabled = offset + LIMIT >= data.total;
+}
+document.querySelectorAll('th[data-sort]').forEach(th => th.addEventListener('click', () => {
+  order = sort === th.dataset.sort && order === 'desc' ? 'asc' : 'desc';
+  sort = th.dataset.sort; offset = 0; load();
+}));
+document.getElementById('tier').addEventListener('change', () => { offset = 0; load(); });
+document.getElementById('prev').addEventListener('click', () => { offset = Math.max(0, offset - LIMIT); load(); });
+document.getElementById('next').addEventListener('click', () => { offset += LIMIT; load(); });
+load();
+</script></body></html>
+""".replace("__COMMON_JS__", _COMMON_JS)
 
 
 def _build_state() -> Dict[str, Dict[str, Any]]:
@@ -424,21 +844,54 @@ class _Handler(BaseHTTPRequestHandler):
         self.wfile.write(body)
 
     def log_message(self, fmt: str, *args: Any) -> None:
-        log(f"web {self.address_string()} - {fmt % args}")
+        # 访问日志只在 debug 级别输出（页面轮询会产生大量请求）
+        debug("web %s - %s", self.address_string(), fmt % args)
 
     def _route(self) -> str:
         return self.path.split("?", 1)[0].rstrip("/")
 
+    def _params(self) -> Dict[str, str]:
+        query = self.path.split("?", 1)[1] if "?" in self.path else ""
+        return {k: v[-1] for k, v in urllib.parse.parse_qs(query).items()}
+
+    def _int_param(self, name: str, default: Optional[int]) -> Optional[int]:
+        try:
+            return int(self._params()[name])
+        except (KeyError, ValueError):
+            return default
+
+    def _send_html(self, body: bytes) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_GET(self) -> None:
         path = self._route() or "/"
         if path == "/" or path.endswith("/index.html"):
-            body = _render_html()
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Content-Length", str(len(body)))
-            self.send_header("Cache-Control", "no-store")
-            self.end_headers()
-            self.wfile.write(body)
+            self._send_html(_render_html())
+            return
+        if path.endswith("/api/history"):
+            store = get_history()
+            if store is None:
+                self._send_json(503, {"ok": False, "message": "运行历史不可用"})
+                return
+            self._send_json(200, store.page(
+                limit=self._int_param("limit", 50) or 50,
+                offset=self._int_param("offset", 0) or 0,
+                kind=self._params().get("kind") or None,
+            ))
+            return
+        if path.endswith("/history"):
+            self._send_html(_HISTORY_HTML.encode("utf-8"))
+            return
+        if path.endswith("/api/backups"):
+            self._send_backups()
+            return
+        if path.endswith("/backups"):
+            self._send_html(_BACKUPS_HTML.encode("utf-8"))
             return
         if path.endswith("/api/state"):
             self._send_json(200, _build_state())
@@ -446,8 +899,123 @@ class _Handler(BaseHTTPRequestHandler):
         if path.endswith("/api/config"):
             self._send_json(200, _load_options())
             return
+        if path.endswith("/metrics"):
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path.endswith("/api/traces"):
+            self._send_json(200, {"traces": list_traces()})
+            return
+        if path.endswith("/api/trace"):
+            index = self._int_param("index", None)
+            body = json.dumps(export_chrome(index)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Disposition", 'attachment; filename="baidu-backup-trace.json"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path.endswith("/api/progress/stream"):
+            self._stream_progress()
+            return
+        if path.endswith("/api/progress"):
+            self._send_json(200, {"latest": progress_feed.latest()})
+            return
+        if path.endswith("/api/logs"):
+            params = self._params()
+            self._send_json(200, dict(log_tail(
+                since=self._int_param("since", 0) or 0,
+                min_level=parse_level(params.get("level"), DEBUG),
+                limit=self._int_param("limit", 200) or 200,
+            ), ok=True))
+            return
+        if path.endswith("/logs"):
+            self._send_html(_LOGS_HTML.encode("utf-8"))
+            return
+        if path.endswith("/api/notifications"):
+            self._send_json(200, {
+                "ok": True,
+                "deliveries": notify_dispatcher.recent(),
+                "pending": notify_dispatcher.pending(),
+            })
+            return
+        # GET /api/jobs 与 /api/jobs/<id>
+        parts = path.split("/")
+        if parts[-1] == "jobs" or (len(parts) >= 2 and parts[-2] == "jobs"):
+            if _scheduler is None:
+                self._send_json(503, {"ok": False, "message": "调度器尚未就绪"})
+                return
+            if parts[-1] == "jobs":
+                self._send_json(200, {"ok": True, "running": _scheduler.running, "jobs": _scheduler.jobs()})
+                return
+            job = _scheduler.job(parts[-1])
+            if job is None:
+                self._send_json(404, {"ok": False, "message": "任务不存在或已过期"})
+                return
+            self._send_json(200, {"ok": True, "job": job})
+            return
         self._send_json(404, {"ok": False, "message": "not found"})
 
+    def _send_backups(self) -> None:
+        """GET /api/backups?limit=&offset=&sort=time|size|name|tier|path&order=asc|desc&tier="""
+        if _catalog is None or _get_upload_path is None:
+            self._send_json(503, {"ok": False, "message": "备份目录索引不可用"})
+            return
+        params = self._params()
+        sort = params.get("sort") or "time"
+        if sort not in SORT_KEYS:
+            self._send_json(400, {"ok": False, "message": f"未知排序字段：{sort}"})
+            return
+        page = _catalog.browse(
+            _get_upload_path(),
+            tier=params.get("tier") or None,
+            sort=sort,
+            desc=params.get("order", "desc") != "asc",
+            limit=self._int_param("limit", 50) or 50,
+            offset=self._int_param("offset", 0) or 0,
+        )
+        self._send_json(200, dict(page, ok=True))
+
+    def _stream_progress(self) -> None:
+        """SSE: push upload progress events until the browser disconnects.
+
+        Each connection only reads from the shared ring buffer, so a slow
+        client falls behind (and skips to the oldest buffered event) instead
+        of slowing down the upload.
+        """
+        try:
+            last_seq = int(self.headers.get("Last-Event-ID") or 0)
+        except ValueError:
+            last_seq = 0
+        if not last_seq:
+            # 新连接：先补发最新一条，之后只推送新事件
+            latest = progress_feed.latest()
+            last_seq = latest["seq"] - 1 if latest else 0
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("X-Accel-Buffering", "no")
+        self.end_headers()
+        try:
+            while True:
+                events, last_seq = progress_feed.wait_since(last_seq, SSE_KEEPALIVE)
+                if not events:
+                    self.wfile.write(b": keepalive\n\n")
+                for ev in events:
+                    data = json.dumps(ev, ensure_ascii=False)
+                    self.wfile.write(
+                        f"id: {ev['seq']}\nevent: progress\ndata: {data}\n\n".encode("utf-8")
+                    )
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            return
+
     def do_POST(self) -> None:
         path = self._route()
         parts = path.split("/")
@@ -470,6 +1038,23 @@ class _Handler(BaseHTTPRequestHandler):
             self._send_json(200, {"ok": bool(ok), "message": "测试通知已发送" if ok else "发送失败，请查看加载项日志"})
             return
 
+        # POST /api/run — 立即执行一次完整同步（已有周期在运行/排队时合并到该任务）
+        if path.endswith("/api/run"):
+            if _scheduler is None:
+                self._send_json(503, {"ok": False, "message": "调度器尚未就绪"})
+                return
+            job, merged = _scheduler.request_run(REASON_MANUAL)
+            if job is None:
+                self._send_json(503, {"ok": False, "message": "调度器已停止"})
+                return
+            self._send_json(202, {
+                "ok": True,
+                "job": job,
+                "merged": merged,
+                "message": "已合并到正在进行的同步任务" if merged else "同步任务已排队",
+            })
+            return
+
         # POST /api/config — 保存并重启
         if path.endswith("/api/config"):
             try: